@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple
+
+
+class AccountSnapshot(NamedTuple):
+    address: str
+    round: int
+    amount: int  # microAlgos
+    min_balance: int
+    assets: Dict[int, int]  # asset id -> amount in base units
+
+    def asset_amount(self, asset_id):
+        """Base units of an ASA held, or None if the account is not opted in."""
+        return self.assets.get(asset_id)
+
+
+class AccountSnapshotCache:
+    """Fetches many accounts concurrently and caches them per round.
+
+    Holdings are indexed by asset id, so balance lookups are dictionary hits
+    rather than scans of the ``assets`` list. A snapshot taken in round R is
+    reused until the ledger moves past R; the current round comes from a
+    ``status()`` call made at most once per ``status_ttl`` seconds, or from
+    ``observe_round`` (e.g. fed by the confirmation tracker).
+    """
+
+    def __init__(self, client, max_workers=16, status_ttl=1.0):
+        self.client = client
+        self.max_workers = max_workers
+        self.status_ttl = status_ttl
+        self.hits = 0
+        self.misses = 0
+        self._snapshots = {}
+        self._round = 0
+        self._round_checked = 0.0
+        self._lock = threading.Lock()
+
+    def observe_round(self, round_number):
+        with self._lock:
+            if round_number > self._round:
+                self._round = round_number
+                self._round_checked = time.monotonic()
+
+    def current_round(self):
+        if time.monotonic() - self._round_checked > self.status_ttl:
+            self.observe_round(self.client.status()['last-round'])
+            self._round_checked = time.monotonic()
+        return self._round
+
+    def invalidate(self, addresses=None):
+        """Drops cached snapshots (all of them by default), e.g. after sending from an account."""
+        with self._lock:
+            if addresses is None:
+                self._snapshots.clear()
+            else:
+                for address in addresses:
+                    self._snapshots.pop(address, None)
+
+    def _fetch(self, address):
+        info = self.client.account_info(address)
+        return AccountSnapshot(
+            address,
+            info.get('round', self._round),
+            info.get('amount', 0),
+            info.get('min-balance', 0),
+            {asset['asset-id']: asset['amount'] for asset in info.get('assets', [])},
+        )
+
+    def snapshot(self, addresses):
+        """Returns {address: AccountSnapshot}, fetching only accounts not cached for the current round."""
+        addresses = list(dict.fromkeys(addresses))
+        current_round = self.current_round()
+        with self._lock:
+            result = {}
+            missing = []
+            for address in addresses:
+                cached = self._snapshots.get(address)
+                if cached is not None and cached.round >= current_round:
+                    result[address] = cached
+                else:
+                    missing.append(address)
+        self.hits += len(result)
+        self.misses += len(missing)
+
+        if len(missing) == 1:
+            fetched = [self._fetch(missing[0])]
+        elif missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                fetched = list(executor.map(self._fetch, missing))
+        else:
+            fetched = []
+
+        with self._lock:
+            for snap in fetched:
+                self._snapshots[snap.address] = snap
+                result[snap.address] = snap
+        return {address: result[address] for address in addresses}
+
+    def get(self, address):
+        return self.snapshot([address])[address]
+
+    def algo_balances(self, addresses):
+        """{address: microAlgos} for many accounts in one parallel fetch."""
+        return {address: snap.amount for address, snap in self.snapshot(addresses).items()}
+
+    def asset_balances(self, addresses, asset_id):
+        """{address: base units or None if not opted in} for many accounts in one parallel fetch."""
+        return {address: snap.asset_amount(asset_id) for address, snap in self.snapshot(addresses).items()}
@@ -0,0 +1,138 @@
+import base64
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from algosdk import constants, encoding, error, mnemonic, transaction
+from nacl.signing import SigningKey
+
+PROCESS_POOL_THRESHOLD = 5_000  # Below this, process start-up costs more than it saves
+
+
+def _signing_bytes(txn):
+    return constants.txid_prefix + base64.b64decode(encoding.msgpack_encode(txn))
+
+
+class Keyring:
+    """Holds signing keys, derived once, and signs by address.
+
+    Mnemonics and base64 private keys are decoded the first time they are seen;
+    after that, signing a transaction is a dictionary lookup plus one Ed25519
+    signature.
+    """
+
+    def __init__(self):
+        self._signing_keys = {}  # address -> nacl SigningKey
+        self._private_keys = {}  # address -> base64 private key, as algosdk expects
+        self._addresses = {}  # mnemonic or private key string -> address
+
+    @classmethod
+    def from_mnemonics(cls, mnemonics):
+        keyring = cls()
+        for phrase in mnemonics:
+            keyring.add_mnemonic(phrase)
+        return keyring
+
+    @classmethod
+    def from_private_keys(cls, private_keys):
+        keyring = cls()
+        for private_key in private_keys:
+            keyring.add_private_key(private_key)
+        return keyring
+
+    def add_private_key(self, private_key):
+        """Registers a base64 private key and returns its address."""
+        address = self._addresses.get(private_key)
+        if address is None:
+            raw_key = base64.b64decode(private_key)
+            address = encoding.encode_address(raw_key[constants.key_len_bytes:])
+            self._signing_keys[address] = SigningKey(raw_key[:constants.key_len_bytes])
+            self._private_keys[address] = private_key
+            self._addresses[private_key] = address
+        return address
+
+    def add_mnemonic(self, phrase):
+        """Registers a 25-word mnemonic and returns its address."""
+        address = self._addresses.get(phrase)
+        if address is None:
+            address = self.add_private_key(mnemonic.to_private_key(phrase))
+            self._addresses[phrase] = address
+        return address
+
+    def __contains__(self, address):
+        return address in self._signing_keys
+
+    def __len__(self):
+        return len(self._signing_keys)
+
+    @property
+    def addresses(self):
+        return list(self._signing_keys)
+
+    def private_key(self, address):
+        return self._private_keys[address]
+
+    def _resolve(self, signer):
+        """Maps an address or a private key to a registered address."""
+        if signer in self._signing_keys or encoding.is_valid_address(signer):
+            return signer
+        return self.add_private_key(signer)
+
+    def _signing_key(self, address):
+        try:
+            return self._signing_keys[address]
+        except KeyError:
+            raise error.InvalidSecretKeyError from None
+
+    def sign(self, txn, signer=None):
+        """Signs a transaction with the key of ``signer`` (an address or private key), or of its sender."""
+        signer = txn.sender if signer is None else self._resolve(signer)
+        signature = self._signing_key(signer).sign(_signing_bytes(txn)).signature
+        authorizing_address = signer if signer != txn.sender else None
+        return transaction.SignedTransaction(txn, base64.b64encode(signature).decode(), authorizing_address)
+
+    def sign_multisig(self, msig_txn, addresses):
+        """Adds signatures from each address in ``addresses`` to a MultisigTransaction."""
+        message = _signing_bytes(msig_txn.transaction)
+        subsigs = {subsig.public_key: subsig for subsig in msig_txn.multisig.subsigs}
+        for address in addresses:
+            subsig = subsigs.get(encoding.decode_address(address))
+            if subsig is None:
+                raise error.InvalidSecretKeyError
+            subsig.signature = self._signing_key(address).sign(message).signature
+        return msig_txn
+
+    def sign_many(self, txns, signers=None, processes=None):
+        """Signs many transactions at once.
+
+        signers optionally gives an address or private key per transaction. Large
+        batches are split across a process pool when ``processes`` is set, or left
+        as None on a multi-core machine and the batch exceeds PROCESS_POOL_THRESHOLD.
+        """
+        txns = list(txns)
+        signers = [txn.sender for txn in txns] if signers is None else [self._resolve(s) for s in signers]
+
+        use_pool = processes is not None and processes > 1 or (
+            processes is None and len(txns) >= PROCESS_POOL_THRESHOLD and (os.cpu_count() or 1) > 1)
+        if not use_pool:
+            return [self.sign(txn, signer) for txn, signer in zip(txns, signers)]
+
+        needed = {address: self._private_keys[address] for address in set(signers)}
+        chunk = max(1, len(txns) // ((processes or 4) * 4))
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(list(needed.values()),)) as executor:
+            signatures = executor.map(_worker_sign, zip(txns, signers), chunksize=chunk)
+            return [transaction.SignedTransaction(txn, signature, signer if signer != txn.sender else None)
+                    for txn, signer, signature in zip(txns, signers, signatures)]
+
+
+_worker_keyring = None
+
+
+def _init_worker(private_keys):
+    global _worker_keyring
+    _worker_keyring = Keyring.from_private_keys(private_keys)
+
+
+def _worker_sign(item):
+    txn, signer = item
+    return _worker_keyring.sign(txn, signer).signature
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from algosdk import transaction
+
+from instrumentation import metrics
+
+# Rounds are estimated from wall-clock time between fetches. The estimate uses a
+# block time slightly above the network's so it lags rather than leads the chain:
+# a first-valid round in the past is accepted, one in the future is not.
+DEFAULT_BLOCK_TIME = 3.3
+DEFAULT_REFRESH_MARGIN = 100  # Rounds before last-valid at which a refresh starts
+
+
+class SuggestedParamsCache:
+    """Caches suggested transaction params and re-derives them per round.
+
+    The network-dependent fields (fee, min fee, genesis, consensus version) are
+    fetched once and reused until the validity window of that fetch is close to
+    expiring. Each call hands out params whose first/last valid rounds follow the
+    current round, so transactions built in different rounds still differ exactly
+    as they would with a fresh ``suggested_params()`` call. When the node charges
+    no per-byte fee the params say flat ``min_fee``, which is the fee algosdk
+    would compute anyway, without its per-transaction size estimate.
+    """
+
+    def __init__(self, client, block_time=DEFAULT_BLOCK_TIME,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN, validity_rounds=1000):
+        self.client = client
+        self.block_time = block_time
+        self.refresh_margin = refresh_margin
+        self.validity_rounds = validity_rounds
+        self.hits = 0
+        self.misses = 0
+        self.background_refreshes = 0
+        self._base = None  # SuggestedParams from the last fetch
+        self._base_round = 0  # Last round reported by the node at fetch/observe time
+        self._base_time = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def _fetch(self):
+        with metrics.stage("algod.suggested_params"):
+            params = self.client.suggested_params()
+        with self._lock:
+            # Never move the round estimate backwards (e.g. a lagging node behind a load balancer)
+            known_round = self.current_round() if self._base is not None else 0
+            self._base = params
+            self._base_round = max(params.first, known_round)
+            self._base_time = time.monotonic()
+        return params
+
+    def _refresh_in_background(self):
+        def run():
+            try:
+                self._fetch()
+                self.background_refreshes += 1
+            except Exception as e:
+                print(f"Background params refresh failed: {e}")
+            finally:
+                self._refresh_thread = None
+
+        if self._refresh_thread is None:
+            self._refresh_thread = threading.Thread(target=run, daemon=True)
+            self._refresh_thread.start()
+
+    def current_round(self):
+        """Conservative estimate of the current round, without a network call."""
+        elapsed = time.monotonic() - self._base_time
+        return self._base_round + int(elapsed / self.block_time)
+
+    def observe_round(self, round_number):
+        """Records a round seen elsewhere (e.g. a confirmation) to correct the estimate."""
+        with self._lock:
+            if self._base is not None and round_number > self.current_round():
+                self._base_round = round_number
+                self._base_time = time.monotonic()
+
+    def get(self):
+        """Returns suggested params for the current round, fetching only when needed."""
+        if self._base is None or self.current_round() >= self._base.last:
+            self.misses += 1
+            base = self._fetch()
+        else:
+            self.hits += 1
+            base = self._base
+            if base.last - self.current_round() <= self.refresh_margin:
+                self._refresh_in_background()
+
+        first = max(base.first, self.current_round())
+        fee, flat_fee = base.fee, base.flat_fee
+        if not flat_fee and not fee and base.min_fee:
+            # No per-byte fee means every transaction pays min_fee; saying so up front spares
+            # algosdk estimating each transaction's size, which costs a throwaway signature
+            fee, flat_fee = base.min_fee, True
+        return transaction.SuggestedParams(
+            fee,
+            first,
+            first + self.validity_rounds,
+            base.gh,
+            base.gen,
+            flat_fee,
+            base.consensus_version,
+            base.min_fee,
+        )
+
+    def invalidate(self):
+        """Drops the cached params so the next call fetches fresh ones."""
+        with self._lock:
+            self._base = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "background_refreshes": self.background_refreshes,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
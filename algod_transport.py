@@ -0,0 +1,238 @@
+import http.client
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+from urllib import parse
+
+import msgpack
+from algosdk import constants, encoding, error
+from algosdk.v2client import algod
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+SUBMIT_ENDPOINT = "POST /v2/transactions"
+_ALREADY_SUBMITTED = re.compile(r"already in (the )?(ledger|pool)", re.IGNORECASE)
+_ID_SEGMENT = re.compile(r"^(\d+|[A-Z2-7]{52,58})$")  # Rounds, txids, addresses
+
+
+def endpoint_name(method, path):
+    """Groups requests by endpoint, e.g. 'GET /v2/accounts/{}'."""
+    path = path.split("?", 1)[0]
+    return method + " " + "/".join("{}" if _ID_SEGMENT.match(part) else part for part in path.split("/"))
+
+
+def first_txid(data):
+    """Txid of the first signed transaction in a raw (msgpack) submission body."""
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(data)
+    return encoding.msgpack_decode(next(unpacker)).get_txid()
+
+
+class EndpointStats:
+    def __init__(self, samples=1024):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._recent = deque(maxlen=samples)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self._recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self._recent)
+
+        def percentile(fraction):
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] if recent else 0.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "mean_ms": 1000 * self.total_seconds / self.count if self.count else 0.0,
+            "p50_ms": 1000 * percentile(0.50),
+            "p99_ms": 1000 * percentile(0.99),
+            "max_ms": 1000 * self.max_seconds,
+        }
+
+
+class PooledAlgodClient(algod.AlgodClient):
+    """AlgodClient that reuses keep-alive connections instead of opening one per request.
+
+    At most ``max_connections`` requests are in flight at once; further callers
+    wait for a free connection. Connection failures are retried for GETs, and
+    for other methods only if the connection could not be opened, so the
+    request provably never left. Transaction submissions are also retried after
+    a failure mid-request: the same signed bytes can't be applied twice, and a
+    retry rejected because they are already in the pool or ledger returns the
+    first txid as if it had succeeded. 429/5xx responses are retried for GETs.
+    Retries back off exponentially. Latency is recorded per endpoint in ``stats``.
+    """
+
+    def __init__(self, algod_token, algod_address, headers=None, max_connections=8,
+                 retries=3, backoff=0.2, timeout=30):
+        super().__init__(algod_token, algod_address, headers)
+        url = parse.urlsplit(algod_address)
+        self._connection_class = (http.client.HTTPSConnection if url.scheme == "https"
+                                  else http.client.HTTPConnection)
+        self._host = url.netloc
+        self._base_path = url.path.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle = queue.LifoQueue()  # Most recently used first, so warm connections get reused
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self):
+        with self._stats_lock:
+            return {name: entry.summary() for name, entry in self._stats.items()}
+
+    def _endpoint_stats(self, name):
+        with self._stats_lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = EndpointStats()
+            return entry
+
+    def _connection(self, timeout):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connection_class(self._host, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def close(self):
+        """Closes every idle pooled connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def algod_request(self, method, requrl, params=None, data=None, headers=None,
+                      response_format="json", timeout=None):
+        header = {"User-Agent": "py-algorand-sdk", "Connection": "keep-alive"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+        if requrl not in constants.unversioned_paths:
+            requrl = algod.api_version_path_prefix + requrl
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+
+        name = endpoint_name(method, requrl)
+        stats = self._endpoint_stats(name)
+        timeout = self.timeout if timeout is None else timeout  # The SDK's methods never pass one
+        attempt = 0
+        resubmitted = False  # A submission that may already have reached the node was sent again
+        while True:
+            start = time.perf_counter()
+            sent = False
+            with self._slots:
+                conn = self._connection(timeout)
+                try:
+                    if conn.sock is None:
+                        conn.connect()  # Failing here means the request never left
+                    sent = True
+                    conn.request(method, self._base_path + requrl, body=data, headers=header)
+                    resp = conn.getresponse()
+                    body = resp.read()
+                except (http.client.HTTPException, OSError) as e:
+                    conn.close()
+                    failure = e
+                    status = None
+                else:
+                    failure = None
+                    status = resp.status
+                    if resp.will_close:
+                        conn.close()
+                    else:
+                        self._idle.put(conn)
+            stats.record(time.perf_counter() - start)
+
+            if failure is not None:
+                retryable = not sent or method == "GET" or name == SUBMIT_ENDPOINT
+            else:
+                retryable = status in RETRYABLE_STATUS and method == "GET"
+            if retryable and attempt < self.retries:
+                attempt += 1
+                resubmitted = resubmitted or (failure is not None and sent and name == SUBMIT_ENDPOINT)
+                stats.retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            break
+
+        if failure is not None:
+            stats.errors += 1
+            raise error.AlgodHTTPError(f"Request to {requrl} failed: {failure}")
+        if status >= 400:
+            message, payload = body.decode("utf-8", errors="replace"), {}
+            try:
+                payload = json.loads(message)
+                message = payload["message"]
+            except (ValueError, KeyError, TypeError):
+                pass
+            if resubmitted and _ALREADY_SUBMITTED.search(message):
+                return {"txId": first_txid(data)}  # The attempt that failed had got through
+            stats.errors += 1
+            raise error.AlgodHTTPError(message, status, payload.get("data") if isinstance(payload, dict) else None)
+
+        if response_format == "json":
+            if not body:
+                return {}  # Some algod endpoints answer 200 OK with an empty body
+            try:
+                return json.loads(body)
+            except ValueError as e:
+                raise error.AlgodResponseError("Failed to parse JSON response from algod") from e
+        return body
+
+
+class AlgodConfig(NamedTuple):
+    """Where to reach algod. Building one does no I/O; ``client()`` returns the shared pooled client."""
+    algod_address: str = "https://testnet-api.algonode.cloud"
+    algod_token: str = ""  # No token needed for public nodes like Algonode
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """Defaults overridden by ALGOD_ADDRESS and ALGOD_TOKEN when set."""
+        environ = os.environ if environ is None else environ
+        return cls(environ.get("ALGOD_ADDRESS", cls._field_defaults["algod_address"]),
+                   environ.get("ALGOD_TOKEN", cls._field_defaults["algod_token"]))
+
+    def client(self, **kwargs):
+        return get_client(self.algod_token, self.algod_address, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(algod_token, algod_address, **kwargs):
+    """Returns the process-wide pooled client for an endpoint, creating it on first use.
+
+    Every module asking for the same node shares one connection pool, one
+    concurrency limit and one set of latency stats.
+    """
+    key = (algod_address, algod_token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = PooledAlgodClient(algod_token, algod_address, **kwargs)
+        return client
@@ -0,0 +1,77 @@
+"""Submits many transactions at once and confirms them with one wait.
+
+In "atomic" mode transactions are packed into groups of up to MAX_GROUP_SIZE
+that succeed or fail together; in "concurrent" mode each is submitted on its
+own. Either way submissions go out in parallel on up to ``max_workers``
+threads, which is a matter of how many requests the algod client should have
+in flight and has nothing to do with the group size.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from algosdk import constants, transaction
+
+from instrumentation import metrics
+
+MAX_GROUP_SIZE = constants.tx_group_limit  # Most transactions an atomic group may hold
+BATCH_MODES = ("atomic", "concurrent")
+DEFAULT_SUBMIT_WORKERS = 8  # Matches PooledAlgodClient's default max_connections
+
+
+def check_batch_mode(batch_mode):
+    if batch_mode not in BATCH_MODES:
+        raise ValueError(f"Unknown batch mode: {batch_mode}")
+
+
+def group_batches(txns, batch_mode):
+    """Splits unsigned transactions into submissions: atomic groups with their group id set, or one per transaction."""
+    check_batch_mode(batch_mode)
+    txns = list(txns)
+    if batch_mode == "concurrent":
+        return [[txn] for txn in txns]
+    groups = [txns[start:start + MAX_GROUP_SIZE] for start in range(0, len(txns), MAX_GROUP_SIZE)]
+    return [transaction.assign_group_id(group) if len(group) > 1 else group for group in groups]
+
+
+def submit_batches(client, tracker, keyring, txns, signers=None, batch_mode="atomic", wait_rounds=4,
+                   max_workers=DEFAULT_SUBMIT_WORKERS, op=None):
+    """Signs and submits txns, then waits once for all of them.
+
+    signers optionally gives an address or private key per transaction (see
+    Keyring.sign_many). Returns one {'txid', 'confirmed-round', 'error'} dict
+    per transaction, in order. ``op`` is the metrics operation to record the
+    sign, submit and confirm stages under.
+    """
+    if op is None:
+        op = metrics.operation(f"submit_{batch_mode}")
+    batches = group_batches(txns, batch_mode)
+    signed = keyring.sign_many([txn for batch in batches for txn in batch], signers)
+    results = [{'txid': stxn.get_txid(), 'confirmed-round': 0, 'error': None} for stxn in signed]
+    spans = []
+    for batch in batches:
+        start = spans[-1].stop if spans else 0
+        spans.append(range(start, start + len(batch)))
+    op.lap("sign")
+
+    rejected = "Group rejected" if batch_mode == "atomic" else "Submission rejected"
+
+    def submit(span):
+        try:
+            client.send_transactions(signed[span.start:span.stop])
+        except Exception as e:
+            for i in span:
+                results[i]['error'] = f"{rejected}: {e}"
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(spans)) or 1) as executor:
+        list(executor.map(submit, spans))
+    op.lap("submit")
+
+    confirmed = tracker.wait_all([r['txid'] for r in results if r['error'] is None], wait_rounds)
+    op.lap("confirm")
+    for result in results:
+        if result['error'] is not None:
+            continue
+        if result['txid'] in confirmed:
+            result['confirmed-round'] = confirmed[result['txid']]['confirmed-round']
+        else:
+            result['error'] = "Not confirmed within the wait window"
+    return results
@@ -0,0 +1,272 @@
+"""Benchmark suite for the liquidity pool and stokvel flows.
+
+Everything runs offline against LocalLedger, so results measure this code rather
+than public-node latency. Each benchmark case produces one record with a stable
+set of fields (see RECORD_FIELDS) so runs can be compared over time:
+
+    python benchmarks.py                      # JSON lines on stdout
+    python benchmarks.py --format csv --output bench_output.txt
+    python benchmarks.py --quick --only swap
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from algosdk import encoding, mnemonic, transaction
+from algosdk.account import generate_account
+
+from algo_keyring import Keyring
+from instrumentation import metrics
+from local_ledger import LocalLedger
+from lp_ledger import LPTokenLedger
+
+import liquiditypool_defi
+import stokvel_algorand
+
+SCHEMA_VERSION = 1
+RECORD_FIELDS = [
+    "schema", "benchmark", "case", "ops", "items_per_op", "seconds", "throughput_ops_s",
+    "throughput_items_s", "p50_us", "p99_us", "alloc_peak_bytes", "alloc_retained_bytes_per_op",
+]
+
+POOL_SIZES = [10, 10_000, 10_000_000]  # ALGO reserves; UCTZAR reserves are twice that
+PROVIDER_COUNTS = [10, 1_000, 100_000]
+QUOTE_BATCH_SIZES = [1, 1_000, 100_000]
+STOKVEL_MEMBER_COUNTS = [5, 50, 200]
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(benchmark, case, op, ops, items_per_op=1, alloc_ops=None):
+    """Runs op(i) ops times and returns a benchmark record.
+
+    Latencies come from an untraced pass; allocations from a second, shorter pass
+    under tracemalloc so tracing overhead does not distort the timings.
+    """
+    latencies = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for i in range(ops):
+            t0 = time.perf_counter_ns()
+            op(i)
+            latencies.append(time.perf_counter_ns() - t0)
+        seconds = time.perf_counter() - start
+
+        alloc_ops = alloc_ops or max(1, min(ops, 100))
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for i in range(ops, ops + alloc_ops):
+            op(i)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "schema": SCHEMA_VERSION,
+        "benchmark": benchmark,
+        "case": case,
+        "ops": ops,
+        "items_per_op": items_per_op,
+        "seconds": round(seconds, 6),
+        "throughput_ops_s": round(ops / seconds, 2) if seconds else 0.0,
+        "throughput_items_s": round(ops * items_per_op / seconds, 2) if seconds else 0.0,
+        "p50_us": round(_percentile(latencies, 0.50) / 1000, 3),
+        "p99_us": round(_percentile(latencies, 0.99) / 1000, 3),
+        "alloc_peak_bytes": peak - baseline,
+        "alloc_retained_bytes_per_op": round((current - baseline) / alloc_ops, 1),
+    }
+
+
+def _provider_addresses(count):
+    """Distinct, valid addresses for synthetic providers."""
+    return [encoding.encode_address(i.to_bytes(32, "big")) for i in range(1, count + 1)]
+
+
+def _pool_with_providers(algo_reserves, providers):
+    pool = liquiditypool_defi.LiquidityPool("POOL", None)
+    pool.algo_reserves = float(algo_reserves)
+    pool.uctzar_reserves = float(algo_reserves * 2)
+    pool.total_liquidity_tokens = providers * 1000
+    pool.liquidity_providers = LPTokenLedger.from_arrays(_provider_addresses(providers), [1000] * providers)
+    return pool
+
+
+# -- pure pool math ----------------------------------------------------------
+
+def bench_calculate_liquidity_tokens(ops):
+    for size in POOL_SIZES:
+        pool = _pool_with_providers(size, 10)
+        yield measure("calculate_liquidity_tokens", f"reserves={size}",
+                      lambda i: pool.calculate_liquidity_tokens(1.0 + i % 7, 2.0), ops)
+
+
+def bench_quote_swaps(ops):
+    import numpy as np
+    pool = _pool_with_providers(10_000, 10)
+    for batch in QUOTE_BATCH_SIZES:
+        amounts = np.linspace(0.01, 100.0, batch)
+        directions = np.arange(batch) % 2
+        calls = max(1, ops // max(1, batch // 100))
+        yield measure("quote_swaps", f"batch={batch}",
+                      lambda i: pool.quote_swaps(amounts, directions), calls, items_per_op=batch)
+
+
+def bench_liquidity_bookkeeping(ops):
+    for providers in PROVIDER_COUNTS:
+        pool = _pool_with_providers(10_000, providers)
+        addresses = _provider_addresses(providers)
+        yield measure("record_add_liquidity", f"providers={providers}",
+                      lambda i: pool.record_add_liquidity(addresses[i % providers], 1.0, 2.0), ops)
+
+        def withdraw_and_redeposit(i):
+            address = addresses[i % providers]
+            tokens, algo_amount, uctzar_amount = pool.calculate_withdrawal(address)
+            pool.record_withdrawal(address, tokens, algo_amount, uctzar_amount)
+            pool.record_add_liquidity(address, algo_amount, uctzar_amount)  # Keep the pool populated
+
+        yield measure("record_withdrawal", f"providers={providers}", withdraw_and_redeposit, ops)
+        yield measure("redeemable_by_all", f"providers={providers}", lambda i: pool.redeemable_by_all(),
+                      max(1, ops // providers), items_per_op=providers)
+
+
+def bench_keyring_signing(ops):
+    """Signing contribution-style payments with keys the keyring derived once."""
+    keyring = Keyring()
+    senders = [keyring.add_private_key(key) for key, _ in (generate_account() for _ in range(16))]
+    params = transaction.SuggestedParams(0, 1, 1001, LocalLedger().genesis_hash, "local-v1", False, "local", 1000)
+    txns = [transaction.PaymentTxn(sender, params, senders[0], 100_000) for sender in senders]
+    yield measure("keyring_sign_many", "batch=16", lambda i: keyring.sign_many(txns), max(1, ops // 16),
+                  items_per_op=len(txns))
+
+
+# -- full on-ledger paths ----------------------------------------------------
+
+def _funded_accounts(ledger, count, microalgos=1_000_000_000):
+    accounts = [generate_account() for _ in range(count)]
+    for _, address in accounts:
+        ledger.fund(address, microalgos)
+    return accounts
+
+
+def bench_swap_path(ops):
+    """Build, sign, submit and confirm swaps through LiquidityPool on a LocalLedger."""
+    ledger = LocalLedger()
+    liquiditypool_defi.use_client(ledger)
+    (creator_key, creator), (pool_key, pool_address), (trader_key, trader) = _funded_accounts(ledger, 3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        liquiditypool_defi.uctzar_id = liquiditypool_defi.create_uctzar_asa(creator_key, creator)
+        for key, address in ((pool_key, pool_address), (trader_key, trader)):
+            liquiditypool_defi.opt_in_to_asa(key, address, liquiditypool_defi.uctzar_id)
+        liquiditypool_defi.distribute_uctzar(creator_key, creator, trader, 1_000)
+        pool = liquiditypool_defi.LiquidityPool(pool_address, pool_key)
+        pool.add_liquidity(creator_key, creator, 500, 1_000)
+
+    def swap(i):
+        if i % 2:
+            pool.swap_uctzar_for_algo(trader_key, trader, 1 + (i % 5) / 100)
+        else:
+            pool.swap_algo_for_uctzar(trader_key, trader, 0.5 + (i % 5) / 100)
+
+    yield measure("swap_path", "local_ledger", swap, ops, alloc_ops=min(ops, 20))
+
+
+def bench_stokvel_cycle(ops):
+    """One contribution day (batched) plus one 4-of-5 multisig payout per op."""
+    for members in STOKVEL_MEMBER_COUNTS:
+        ledger = LocalLedger()
+        stokvel_algorand.use_client(ledger)
+        accounts = _funded_accounts(ledger, members)
+        mnemonics = {address: mnemonic.from_private_key(key) for key, address in accounts}
+        trustees = accounts[:5]
+        msig = transaction.Multisig(1, 4, [address for _, address in trustees])
+        msig_address = msig.address()
+        ledger.fund(msig_address, 1_000_000)
+        for key, _ in trustees:
+            stokvel_algorand.keyring.add_private_key(key)
+
+        def cycle(i):
+            stokvel_algorand.process_contributions_batched(mnemonics, msig_address)
+            payout = transaction.PaymentTxn(
+                sender=msig_address,
+                sp=stokvel_algorand.params_cache.get(),
+                receiver=accounts[i % members][1],
+                amt=int(stokvel_algorand.CONTRIBUTION_AMOUNT * members * 0.6),
+                note=f"Stokvel Payout {i}".encode("utf-8"),
+            )
+            msig_txn = transaction.MultisigTransaction(payout, msig)
+            stokvel_algorand.keyring.sign_multisig(msig_txn, [address for _, address in trustees[:4]])
+            stokvel_algorand.tracker.wait(stokvel_algorand.algod_client.send_transaction(msig_txn), 4)
+
+        cycles = max(1, ops // max(1, members // 5))
+        yield measure("stokvel_cycle", f"members={members}", cycle, cycles,
+                      items_per_op=members, alloc_ops=min(cycles, 3))
+
+
+BENCHMARKS = {
+    "calculate_liquidity_tokens": (bench_calculate_liquidity_tokens, 100_000),
+    "quote_swaps": (bench_quote_swaps, 2_000),
+    "liquidity_bookkeeping": (bench_liquidity_bookkeeping, 100_000),
+    "keyring_signing": (bench_keyring_signing, 20_000),
+    "swap_path": (bench_swap_path, 500),
+    "stokvel_cycle": (bench_stokvel_cycle, 50),
+}
+
+
+def run(only=None, quick=False):
+    for name, (bench, ops) in BENCHMARKS.items():
+        if only and only not in name:
+            continue
+        yield from bench(max(1, ops // 20) if quick else ops)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this string")
+    parser.add_argument("--quick", action="store_true", help="run 1/20th of the operations")
+    parser.add_argument("--stage-metrics", metavar="PATH",
+                        help="enable per-stage instrumentation and write its JSON snapshot to PATH")
+    args = parser.parse_args(argv)
+    if args.stage_metrics:
+        metrics.enable()  # Otherwise leave STOKVEL_METRICS in charge
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            writer = csv.DictWriter(out, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+        else:
+            meta = {"schema": SCHEMA_VERSION, "benchmark": "_environment",
+                    "python": platform.python_version(), "machine": platform.machine()}
+            out.write(json.dumps(meta, sort_keys=True) + "\n")
+        for record in run(args.only, args.quick):
+            if args.format == "csv":
+                writer.writerow(record)
+            else:
+                out.write(json.dumps(record, sort_keys=True) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.stage_metrics:
+        with open(args.stage_metrics, "w") as f:
+            metrics.export(f)
+
+
+if __name__ == "__main__":
+    main()
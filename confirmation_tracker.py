@@ -0,0 +1,166 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from algosdk import error
+
+from instrumentation import metrics
+
+DEFAULT_WAIT_ROUNDS = 1000  # Same default as algosdk's transaction.wait_for_confirmation
+
+
+class _PendingTxn:
+    def __init__(self, wait_rounds):
+        self.future = Future()
+        self.wait_rounds = wait_rounds
+        self.deadline_round = None  # Set by the tracker on the first round it checks the txid
+
+
+class ConfirmationTracker:
+    """Follows rounds once and checks every registered pending txid each round.
+
+    Callers register txids with ``track`` and get a ``concurrent.futures.Future``
+    that resolves to the confirmed transaction info, so any number of
+    transactions can be kept in flight without one polling loop each. The
+    background thread only runs while there is something pending.
+    """
+
+    def __init__(self, client, default_wait_rounds=DEFAULT_WAIT_ROUNDS):
+        self.client = client
+        self.default_wait_rounds = default_wait_rounds
+        self.rounds_followed = 0
+        self._pending = {}
+        self._round_listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_round_listener(self, listener):
+        """Registers a callable invoked with each new round the tracker observes."""
+        self._round_listeners.append(listener)
+
+    def track(self, txid, callback=None, wait_rounds=None):
+        """Registers a txid and returns a Future for its confirmed transaction info.
+
+        The Future fails with TransactionRejectedError if the node drops the
+        transaction from its pool, or ConfirmationTimeoutError once wait_rounds
+        have passed. ``callback`` is called with the Future when it completes.
+        """
+        with self._lock:
+            entry = self._pending.get(txid)
+            if entry is None:
+                entry = _PendingTxn(wait_rounds or self.default_wait_rounds)
+                self._pending[txid] = entry
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        if callback is not None:
+            entry.future.add_done_callback(callback)
+        return entry.future
+
+    def wait(self, txid, wait_rounds=None):
+        """Blocks until a single transaction is confirmed and returns its info."""
+        return self.track(txid, wait_rounds=wait_rounds).result()
+
+    def wait_all(self, txids, wait_rounds=None):
+        """Waits for many transactions at once.
+
+        Returns {txid: transaction info} for the confirmed ones; rejected or
+        timed-out txids are left out.
+        """
+        futures = {txid: self.track(txid, wait_rounds=wait_rounds) for txid in txids}
+        confirmed = {}
+        for txid, future in futures.items():
+            try:
+                confirmed[txid] = future.result()
+            except Exception:
+                pass
+        return confirmed
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _settle(self, txid, entry, result=None, exception=None):
+        with self._lock:
+            self._pending.pop(txid, None)
+        if exception is not None:
+            entry.future.set_exception(exception)
+        else:
+            entry.future.set_result(result)
+
+    def _check(self, txid, entry, current_round):
+        if entry.deadline_round is None:
+            entry.deadline_round = current_round + entry.wait_rounds
+        try:
+            txinfo = self.client.pending_transaction_info(txid)
+        except Exception:
+            # May 404 briefly if the node behind a load balancer has not seen the txid yet, or the
+            # connection dropped: either way check again next round, until the deadline
+            txinfo = {}
+        if txinfo.get('pool-error'):
+            metrics.increment("confirmation.rejected")
+            self._settle(txid, entry, exception=error.TransactionRejectedError(
+                "Transaction rejected: " + txinfo['pool-error']))
+        elif txinfo.get('confirmed-round', 0) > 0:
+            metrics.observe("confirmation.rounds_waited", current_round - entry.deadline_round + entry.wait_rounds)
+            self._settle(txid, entry, result=txinfo)
+        elif current_round >= entry.deadline_round:
+            metrics.increment("confirmation.timeouts")
+            self._settle(txid, entry, exception=error.ConfirmationTimeoutError(
+                f"Wait for transaction id {txid} timed out"))
+
+    def _run(self):
+        try:
+            self._follow()
+        except Exception as e:
+            print(f"Confirmation tracker stopped: {e!r}")
+        finally:
+            # If the loop died, fail what it was tracking rather than leave waiters hanging,
+            # and let the next track() start a fresh thread
+            with self._lock:
+                orphaned = []
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                    orphaned = list(self._pending.items())
+                    self._pending.clear()
+            for txid, entry in orphaned:
+                entry.future.set_exception(RuntimeError(f"Confirmation tracker stopped while tracking {txid}"))
+
+    def _follow(self):
+        try:
+            last_round = self.client.status()['last-round']
+        except Exception as e:
+            with self._lock:
+                entries = list(self._pending.items())
+                self._thread = None
+            for txid, entry in entries:
+                self._settle(txid, entry, exception=e)
+            return
+
+        while True:
+            with self._lock:
+                entries = list(self._pending.items())
+            for txid, entry in entries:
+                try:
+                    self._check(txid, entry, last_round)
+                except Exception as e:
+                    print(f"Error checking transaction {txid}: {e}")  # Checked again next round
+
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+
+            try:
+                status = self.client.status_after_block(last_round)
+            except Exception as e:
+                print(f"Error waiting for round {last_round + 1}: {e}")
+                time.sleep(1)
+                continue
+            last_round = max(last_round + 1, status.get('last-round', 0) if status else 0)
+            self.rounds_followed += 1
+            for listener in self._round_listeners:
+                try:
+                    listener(last_round)
+                except Exception as e:
+                    print(f"Round listener {listener!r} failed: {e}")
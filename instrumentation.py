@@ -0,0 +1,219 @@
+"""Stage timers, histograms and counters for the transaction hot path.
+
+Pool operations and stokvel transfers time each stage (fetching params,
+building, signing, submitting, confirming, booking) through the module-wide
+``metrics`` object:
+
+    op = metrics.operation("swap_algo_for_uctzar")
+    params = params_cache.get()
+    op.lap("params")
+    ...
+    op.done()
+
+With metrics disabled (the default) ``operation`` hands back a shared no-op
+object, so an instrumented call costs a few attribute lookups. Enable with
+``metrics.enable()`` or STOKVEL_METRICS=1. ``snapshot()`` returns everything as
+a dict, ``export`` writes JSON or Prometheus text, and ``subscribe`` registers
+a profiling hook called with (name, seconds) for every timed stage.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+BUCKETS = 32  # Bucket i holds values in [2**(i-1), 2**i) units; the last one is open-ended
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Log2-bucketed histogram; quantiles are reported as their bucket's upper bound."""
+
+    def __init__(self, unit=1e-6):
+        self.unit = unit
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = min(BUCKETS - 1, int(value / self.unit).bit_length())
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            self.buckets[index] += 1
+
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(self.max, self.unit * 2 ** index)
+        return self.max
+
+    def summary(self):
+        with self._lock:
+            summary = {
+                "count": self.count,
+                "sum": self.total,
+                "mean": self.total / self.count if self.count else 0.0,
+                "min": self.min if self.count else 0.0,
+                "max": self.max,
+            }
+            for fraction in QUANTILES:
+                summary[f"p{round(fraction * 100)}"] = self.quantile(fraction)
+            summary["buckets"] = {repr(self.unit * 2 ** i): n for i, n in enumerate(self.buckets) if n}
+        return summary
+
+
+class _Operation:
+    __slots__ = ("metrics", "name", "start", "last")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        """Records the time since the previous lap (or the start) as ``<operation>.<stage>``."""
+        now = time.perf_counter()
+        self.metrics.record(f"{self.name}.{stage}", now - self.last)
+        self.last = now
+
+    def done(self):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+
+    def failed(self):
+        self.metrics.increment(f"{self.name}.errors")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.done()
+        else:
+            self.failed()
+
+
+class _NullOperation:
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+    def done(self):
+        pass
+
+    def failed(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_OPERATION = _NullOperation()
+
+
+class Instrumentation:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}
+        self._counters = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def subscribe(self, callback):
+        """Profiling hook: callback(name, seconds) runs for every timed stage while enabled."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def _histogram(self, name, unit):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(unit))
+        return histogram
+
+    # -- recording -----------------------------------------------------------
+
+    def operation(self, name):
+        """Starts timing one operation; use lap(stage) after each stage and done() at the end."""
+        return _Operation(self, name) if self.enabled else _NULL_OPERATION
+
+    def stage(self, name):
+        """Times a block as one stage: ``with metrics.stage("algod.status"): ...``."""
+        return _Operation(self, name) if self.enabled else _NULL_OPERATION
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        self._histogram(name, 1e-6).observe(seconds)
+        for callback in self._subscribers:
+            callback(name, seconds)
+
+    def observe(self, name, value, unit=1):
+        """Adds a non-time sample, e.g. confirmation rounds waited."""
+        if self.enabled:
+            self._histogram(name, unit).observe(value)
+
+    def increment(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    # -- export --------------------------------------------------------------
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "histograms": {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def export(self, fp, format="json"):
+        """Writes the snapshot to a file object as JSON or Prometheus text exposition."""
+        snapshot = self.snapshot()
+        if format == "json":
+            json.dump(snapshot, fp, indent=2, sort_keys=True)
+            fp.write("\n")
+            return
+        if format != "prometheus":
+            raise ValueError(f"Unknown metrics format: {format}")
+        for name, summary in snapshot["histograms"].items():
+            metric = "stokvel_" + name.replace(".", "_")
+            fp.write(f"# TYPE {metric} histogram\n")
+            cumulative = 0
+            for bound, count in summary["buckets"].items():
+                cumulative += count
+                fp.write(f'{metric}_bucket{{le="{bound}"}} {cumulative}\n')
+            fp.write(f'{metric}_bucket{{le="+Inf"}} {summary["count"]}\n')
+            fp.write(f"{metric}_sum {summary['sum']}\n{metric}_count {summary['count']}\n")
+        for name, value in snapshot["counters"].items():
+            metric = "stokvel_" + name.replace(".", "_") + "_total"
+            fp.write(f"# TYPE {metric} counter\n{metric} {value}\n")
+
+
+metrics = Instrumentation(enabled=os.environ.get("STOKVEL_METRICS", "") not in ("", "0"))
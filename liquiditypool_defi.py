@@ -1,50 +1,96 @@
+import argparse
+import hashlib
+import itertools
+import math
+import threading
+from typing import NamedTuple
+
+import numpy as np
 from algosdk import mnemonic
-from algosdk.v2client import algod
 from algosdk.transaction import (
     AssetConfigTxn, AssetTransferTxn, PaymentTxn,
     calculate_group_id
 )
 from algosdk.account import generate_account
 
+from account_snapshots import AccountSnapshotCache
+from algo_keyring import Keyring
+from algod_params import SuggestedParamsCache
+from algod_transport import AlgodConfig
+from batch_submit import DEFAULT_SUBMIT_WORKERS, MAX_GROUP_SIZE, check_batch_mode, submit_batches
+from confirmation_tracker import ConfirmationTracker
+from instrumentation import metrics
+from lp_ledger import LPTokenLedger
+
 # Algorand connection and utility functions
-algod_address = "https://testnet-api.algonode.cloud"
-algod_token = ""
-client = algod.AlgodClient(algod_token, algod_address)
+config = AlgodConfig.from_env()  # Nothing connects until the first operation needs the client
+_LAZY_CLIENT_STATE = ("client", "params_cache", "tracker", "snapshots")
+
+def configure(new_config):
+    """Switches to another algod endpoint; the client is created on next use."""
+    global config
+    config = new_config
+    for name in _LAZY_CLIENT_STATE:
+        globals().pop(name, None)
+
+def use_client(new_client):
+    """Points every operation in this module at an algod client, or a stand-in such as LocalLedger."""
+    global client, params_cache, tracker, snapshots
+    client = new_client
+    params_cache = SuggestedParamsCache(client)  # Shared by every operation below
+    tracker = ConfirmationTracker(client)  # Follows rounds once for every in-flight transaction
+    tracker.add_round_listener(params_cache.observe_round)
+    snapshots = AccountSnapshotCache(client)  # Account info cached per round
+    tracker.add_round_listener(snapshots.observe_round)
+
+def _ensure_client():
+    if "client" not in globals():
+        use_client(config.client())
+
+def __getattr__(name):
+    # Keeps liquiditypool_defi.client and friends working while deferring their creation
+    if name in _LAZY_CLIENT_STATE:
+        _ensure_client()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+keyring = Keyring()  # Decodes each private key once, however many transactions it signs
 
 def wait_for_confirmation(client, txid):
     """Utility function to wait for a transaction to be confirmed."""
-    last_round = client.status().get('last-round')
-    while True:
-        txinfo = client.pending_transaction_info(txid)
-        if txinfo.get('confirmed-round', 0) > 0:
-            print(f"Transaction {txid} confirmed in round {txinfo.get('confirmed-round')}.")
-            break
-        else:
-            print("Waiting for confirmation...")
-            last_round += 1
-            client.status_after_block(last_round)
+    _ensure_client()
+    _tracker = tracker if client is tracker.client else ConfirmationTracker(client)
+    txinfo = _tracker.wait(txid)
+    print(f"Transaction {txid} confirmed in round {txinfo.get('confirmed-round')}.")
+    return txinfo
 
 def create_uctzar_asa(sender_private_key, sender_address):
     """Creates the UCTZAR ASA (Algorand Standard Asset)."""
-    params = client.suggested_params()
-    txn = AssetConfigTxn(
-        sender=sender_address,
-        sp=params,
-        total=1_000_000,  # Total supply
-        decimals=2,
-        default_frozen=False,
-        unit_name="UCTZAR",
-        asset_name="UCTZAR Stablecoin",
-        manager=sender_address,
-        reserve=sender_address,
-        freeze=sender_address,
-        clawback=sender_address,
-        strict_empty_address_check=False
-    )
+    _ensure_client()
+    with metrics.operation("create_uctzar_asa") as op:  # Counts an error if any stage raises
+        params = params_cache.get()
+        op.lap("params")
+        txn = AssetConfigTxn(
+            sender=sender_address,
+            sp=params,
+            total=1_000_000,  # Total supply
+            decimals=2,
+            default_frozen=False,
+            unit_name="UCTZAR",
+            asset_name="UCTZAR Stablecoin",
+            manager=sender_address,
+            reserve=sender_address,
+            freeze=sender_address,
+            clawback=sender_address,
+            strict_empty_address_check=False
+        )
 
-    signed_txn = txn.sign(sender_private_key)
-    txid = client.send_transaction(signed_txn)
-    wait_for_confirmation(client, txid)
+        signed_txn = keyring.sign(txn, sender_private_key)
+        op.lap("sign")
+        txid = client.send_transaction(signed_txn)
+        op.lap("submit")
+        wait_for_confirmation(client, txid)
+        op.lap("confirm")
     ptx = client.pending_transaction_info(txid)
     asset_id = ptx["asset-index"]
     print(f"Created UCTZAR ASA with ID: {asset_id}")
@@ -52,59 +98,280 @@ def create_uctzar_asa(sender_private_key, sender_address):
 
 def opt_in_to_asa(account_private_key, account_address, asset_id):
     """Opts an account into an ASA to be able to receive it."""
-    params = client.suggested_params()
-    txn = AssetTransferTxn(
-        sender=account_address,
-        sp=params,
-        receiver=account_address,
-        amt=0,
-        index=asset_id
-    )
-    signed_txn = txn.sign(account_private_key)
-    txid = client.send_transaction(signed_txn)
-    wait_for_confirmation(client, txid)
+    _ensure_client()
+    with metrics.operation("opt_in_to_asa") as op:
+        params = params_cache.get()
+        op.lap("params")
+        txn = AssetTransferTxn(
+            sender=account_address,
+            sp=params,
+            receiver=account_address,
+            amt=0,
+            index=asset_id
+        )
+        signed_txn = keyring.sign(txn, account_private_key)
+        op.lap("sign")
+        txid = client.send_transaction(signed_txn)
+        op.lap("submit")
+        wait_for_confirmation(client, txid)
+        op.lap("confirm")
     print(f"Account {account_address} opted-in to ASA {asset_id}.")
 
 def distribute_uctzar(sender_private_key, sender_address, recipient_address, amount):
     """Distributes UCTZAR tokens from the creator to other accounts."""
-    params = client.suggested_params()
-    txn = AssetTransferTxn(
-        sender=sender_address,
-        receiver=recipient_address,
-        amt=int(amount * 100),  # UCTZAR has decimals=2
-        index=uctzar_id,
-        sp=params
-    )
-    signed_txn = txn.sign(sender_private_key)
-    txid = client.send_transaction(signed_txn)
-    wait_for_confirmation(client, txid)
+    _ensure_client()
+    with metrics.operation("distribute_uctzar") as op:
+        params = params_cache.get()
+        op.lap("params")
+        txn = AssetTransferTxn(
+            sender=sender_address,
+            receiver=recipient_address,
+            amt=int(amount * 100),  # UCTZAR has decimals=2
+            index=uctzar_id,
+            sp=params
+        )
+        signed_txn = keyring.sign(txn, sender_private_key)
+        op.lap("sign")
+        txid = client.send_transaction(signed_txn)
+        op.lap("submit")
+        wait_for_confirmation(client, txid)
+        op.lap("confirm")
     print(f"Sent {amount} UCTZARs from {sender_address} to {recipient_address}.")
 
+def _distribution_lease(asset_id, recipient_address, target):
+    # Same target for the same recipient -> same lease, so the node refuses a
+    # second distribution while an earlier attempt could still be confirmed
+    return hashlib.sha256(f"uctzar-bootstrap:{asset_id}:{recipient_address}:{target}".encode()).digest()
+
+def bootstrap_uctzar(creator_private_key, creator_address, accounts, balances, asset_id=None,
+                     batch_mode="concurrent", wait_rounds=4, max_attempts=3, max_workers=DEFAULT_SUBMIT_WORKERS):
+    """Creates UCTZAR (unless asset_id is given), opts accounts in and tops up balances in a few rounds.
+
+    accounts is a list of (private_key, address) to opt in; balances maps
+    addresses to the UCTZARs each should hold afterwards. Every opt-in is
+    submitted at once and confirmed with one wait, then every distribution, so
+    onboarding takes about three rounds however many accounts there are.
+    batch_mode is "concurrent" (independent submissions) or "atomic" (groups of
+    up to MAX_GROUP_SIZE that succeed or fail together); up to max_workers
+    submissions are in flight at once.
+
+    Holdings are read before each attempt and balances are targets, not
+    increments, so failed accounts are retried up to max_attempts times and the
+    whole call can be rerun without paying anyone twice. Returns
+    (asset_id, {address: status}) where status has 'opted-in', 'opt-in-txid',
+    'balance', 'distribution-txid', 'attempts' and 'error'.
+    """
+    check_batch_mode(batch_mode)
+    _ensure_client()
+    if asset_id is None:
+        asset_id = create_uctzar_asa(creator_private_key, creator_address)
+    op = metrics.operation("bootstrap_uctzar")
+    keys = {address: private_key for private_key, address in accounts}
+    addresses = list(dict.fromkeys([address for _, address in accounts] + list(balances)))
+    status = {address: {'opted-in': False, 'opt-in-txid': None, 'balance': None, 'distribution-txid': None,
+                        'attempts': 0, 'error': None} for address in addresses}
+
+    def refresh():
+        snapshots.invalidate(addresses)
+        for address, held in snapshots.asset_balances(addresses, asset_id).items():
+            status[address]['opted-in'] = held is not None
+            status[address]['balance'] = held / 100 if held is not None else None
+
+    def run_stage(pending, build, txid_key):
+        """Submits build(address, params) for every pending() address, retrying what is still pending."""
+        for _ in range(max_attempts):
+            waiting = pending()
+            if not waiting:
+                return
+            params = params_cache.get()
+            txns, signers = zip(*(build(address, params) for address in waiting))
+            op.lap("build")
+            results = submit_batches(client, tracker, keyring, txns, signers, batch_mode, wait_rounds,
+                                     max_workers, op)
+            for address, result in zip(waiting, results):
+                status[address]['attempts'] += 1
+                status[address][txid_key] = result['txid']
+                status[address]['error'] = result['error']
+            refresh()
+            op.lap("refresh")
+
+    def shortfall(address):
+        held = status[address]['balance']
+        return 0 if held is None else round(balances[address] * 100) - round(held * 100)
+
+    def opt_in(address, params):
+        return AssetTransferTxn(sender=address, sp=params, receiver=address, amt=0, index=asset_id), keys[address]
+
+    def distribution(address, params):
+        return AssetTransferTxn(sender=creator_address, sp=params, receiver=address, amt=shortfall(address),
+                                index=asset_id, lease=_distribution_lease(asset_id, address, balances[address])
+                                ), creator_private_key
+
+    refresh()
+    op.lap("refresh")
+    # First round: every account not opted in yet; next round: top up every opted-in recipient
+    run_stage(lambda: [address for address in keys if not status[address]['opted-in']], opt_in, 'opt-in-txid')
+    run_stage(lambda: [address for address in balances if status[address]['opted-in'] and shortfall(address) > 0],
+              distribution, 'distribution-txid')
+    op.done()
+
+    for address, result in status.items():
+        if result['opted-in'] and (address not in balances or shortfall(address) <= 0):
+            result['error'] = None
+        elif result['error'] is None:
+            result['error'] = "Not opted in" if not result['opted-in'] else "Balance below target"
+    done = sum(1 for result in status.values() if result['error'] is None)
+    print(f"Bootstrapped {done} of {len(status)} accounts for ASA {asset_id}.")
+    for address, result in status.items():
+        if result['error'] is not None:
+            print(f"Account {address} not ready after {result['attempts']} attempts: {result['error']}")
+    return asset_id, status
+
 def check_balance(address):
     """Checks the ALGO balance of an account."""
-    account_info = client.account_info(address)
-    balance = account_info.get('amount') / 1_000_000  # Convert from microAlgos to ALGOs
+    _ensure_client()
+    balance = snapshots.get(address).amount / 1_000_000  # Convert from microAlgos to ALGOs
     print(f"Account {address} has a balance of {balance} ALGOs.")
 
 def check_uctzar_balance(address):
     """Checks the UCTZAR balance of an account."""
-    account_info = client.account_info(address)
-    for asset in account_info.get('assets', []):
-        if asset['asset-id'] == uctzar_id:
-            balance = asset['amount'] / 100  # Convert from base units
-            print(f"Account {address} has a UCTZAR balance of {balance}.")
-            return
-    print(f"Account {address} has no UCTZAR balance.")
+    _ensure_client()
+    amount = snapshots.get(address).asset_amount(uctzar_id)
+    if amount is None:
+        print(f"Account {address} has no UCTZAR balance.")
+        return
+    balance = amount / 100  # Convert from base units
+    print(f"Account {address} has a UCTZAR balance of {balance}.")
+
+def check_balances(addresses):
+    """Checks the ALGO balances of many accounts with one concurrent fetch."""
+    _ensure_client()
+    snapshots.snapshot(addresses)
+    for address in addresses:
+        check_balance(address)
+
+def check_uctzar_balances(addresses):
+    """Checks the UCTZAR balances of many accounts with one concurrent fetch."""
+    _ensure_client()
+    snapshots.snapshot(addresses)
+    for address in addresses:
+        check_uctzar_balance(address)
+
+# Constant-product pricing, shared by on-chain swaps and offline quotes
+SWAP_FEE_PERCENTAGE = 0.003
+ALGO_TO_UCTZAR = 0
+UCTZAR_TO_ALGO = 1
+
+def constant_product_output(amount_in, reserve_in, reserve_out, fee_percentage=SWAP_FEE_PERCENTAGE):
+    """Returns (amount_out, fee) for a swap; works on floats and NumPy arrays alike."""
+    fee = amount_in * fee_percentage
+    net_amount_in = amount_in - fee
+    k = reserve_in * reserve_out
+    new_reserve_out = k / (reserve_in + net_amount_in)
+    return reserve_out - new_reserve_out, fee
+
+class SwapQuote(NamedTuple):
+    """Vectorized quote results, one element per candidate trade."""
+    amount_out: np.ndarray
+    fee: np.ndarray
+    price_impact: np.ndarray  # Fraction by which the fee-free execution price is worse than spot
+    algo_reserves: np.ndarray  # Pool reserves after each trade, each applied on its own
+    uctzar_reserves: np.ndarray
+
+def clear_swap_batch(algo_reserves, uctzar_reserves, amounts, directions, fee_percentage=SWAP_FEE_PERCENTAGE):
+    """Fills a batch of swaps in both directions at one clearing price.
+
+    Opposite-direction flow is netted: with a = net ALGO in and u = net UCTZAR in,
+    the price P (UCTZAR per ALGO) is the one at which paying a*P UCTZAR and u/P
+    ALGO out keeps the constant product unchanged. For a one-sided batch this is
+    exactly the single-swap formula. Returns (price, amounts_out, fees).
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    algo_in = np.asarray(directions) == ALGO_TO_UCTZAR
+    fees = amounts * fee_percentage
+    net = amounts - fees
+    a = net[algo_in].sum()
+    u = net[~algo_in].sum()
+
+    k = algo_reserves * uctzar_reserves
+    spot_price = uctzar_reserves / algo_reserves
+    algo_after, uctzar_after = algo_reserves + a, uctzar_reserves + u
+    if a == 0 and u == 0:
+        price = spot_price
+    elif a == 0:
+        price = uctzar_after / algo_reserves
+    else:
+        # a*(R_a + a)*P^2 - ((R_a + a)(R_u + u) + a*u - k)*P + u*(R_u + u) = 0
+        b = algo_after * uctzar_after + a * u - k
+        root = math.sqrt(max(0.0, b * b - 4 * a * algo_after * u * uctzar_after))
+        roots = ((b - root) / (2 * a * algo_after), (b + root) / (2 * a * algo_after))
+        price = min((r for r in roots if r > 0), key=lambda r: abs(r - spot_price))
+    price = float(price)
+    amounts_out = np.where(algo_in, net * price, net / price)
+    return price, amounts_out, fees
+
+class Reservation(NamedTuple):
+    """A submitted but unconfirmed pool operation, held against the reserves until it settles."""
+    id: int
+    kind: str  # "add", "swap" or "withdraw"
+    provider: str  # Provider address for adds and withdrawals
+    direction: int  # Swap direction
+    amount_in: float  # Swap input, fee included
+    amount_out: float  # Swap output
+    fee: float
+    algo_delta: float  # Change to the ALGO reserves once confirmed
+    uctzar_delta: float
+    liquidity_tokens: int  # Tokens redeemed by a withdrawal
 
 # Liquidity Pool Class with internal LPTOKEN management
 class LiquidityPool:
-    def __init__(self, liquidity_pool_address, liquidity_pool_private_key):
+    """Constant-product pool booked from confirmed transactions; safe to share between threads.
+
+    ``algo_reserves`` and ``uctzar_reserves`` are confirmed state. An on-chain
+    operation first takes a Reservation (reserve_swap, reserve_add,
+    reserve_withdrawal): under the pool lock it is priced against the reserves
+    as they will be once every pending operation confirms, and its amounts are
+    held as pending until confirm() books it or release() rolls it back. The
+    lock is not held while transactions are signed, submitted or confirmed, so
+    traders on many threads (or asyncio tasks via asyncio.to_thread) overlap
+    their confirmation waits without ever quoting against stale reserves, and
+    the pool never commits to pay out more than it holds.
+    """
+
+    def __init__(self, liquidity_pool_address, liquidity_pool_private_key, asset_id=None,
+                 fee_percentage=SWAP_FEE_PERCENTAGE):
         self.algo_reserves = 0
         self.uctzar_reserves = 0
         self.total_liquidity_tokens = 0
-        self.liquidity_providers = {}  # Tracks each provider's liquidity tokens
+        self.liquidity_providers = LPTokenLedger()  # Tracks each provider's liquidity tokens
         self.liquidity_pool_address = liquidity_pool_address
         self.liquidity_pool_private_key = liquidity_pool_private_key
+        self.journal = None  # pool_journal.PoolJournal, when state is persisted
+        self.asset_id = asset_id  # The ASA paired with ALGO; the module's uctzar_id if None
+        self.fee_percentage = fee_percentage  # Charged on every swap input and kept in the pool
+        self._reserve_listeners = []
+        self._lock = threading.RLock()
+        self._reservation_ids = itertools.count(1)
+        self._pending = {}  # reservation id -> Reservation
+        self._pending_algo = 0.0  # Net change to the reserves if every pending operation confirms
+        self._pending_uctzar = 0.0
+        self._pending_algo_out = 0.0  # Committed payouts, which must stay covered by confirmed reserves
+        self._pending_uctzar_out = 0.0
+        self._pending_tokens = 0  # Liquidity tokens being redeemed by pending withdrawals
+        self._withdrawing = set()
+
+    @property
+    def pool_asset_id(self):
+        return self.asset_id if self.asset_id is not None else uctzar_id
+
+    def add_reserves_listener(self, callback):
+        """Calls callback(pool) after every change to the reserves, confirmed or pending, e.g. to drop cached routes."""
+        self._reserve_listeners.append(callback)
+
+    def reserves_changed(self):
+        """Notifies listeners; call after setting the reserves directly rather than through record_*."""
+        for callback in self._reserve_listeners:
+            callback(self)
 
     def calculate_liquidity_tokens(self, algo_amount, uctzar_amount):
         if self.total_liquidity_tokens == 0:
@@ -116,233 +383,615 @@ class LiquidityPool:
             added_value = algo_amount + uctzar_amount
             return int((added_value / total_pool_value) * self.total_liquidity_tokens)
 
-    def add_liquidity(self, provider_private_key, provider_address, algo_amount, uctzar_amount):
-        global uctzar_id  # Assuming this is defined elsewhere
-        # Prepare transactions
-        params = client.suggested_params()
-
-        # Transaction 1: Provider sends ALGOs to liquidity pool
-        txn1 = PaymentTxn(
-            sender=provider_address,
-            receiver=self.liquidity_pool_address,
-            amt=int(algo_amount * 1_000_000),  # Correct conversion
-            sp=params
-        )
-
-        # Transaction 2: Provider sends UCTZAR to liquidity pool
-        txn2 = AssetTransferTxn(
-            sender=provider_address,
-            receiver=self.liquidity_pool_address,
-            amt=int(uctzar_amount * 100),  # UCTZAR has decimals=2
-            index=uctzar_id,
-            sp=params
-        )
-
-        # Group transactions
-        gid = calculate_group_id([txn1, txn2])
-        txn1.group = gid
-        txn2.group = gid
-
-        # Sign transactions
-        stxn1 = txn1.sign(provider_private_key)
-        stxn2 = txn2.sign(provider_private_key)
-
-        # Submit transactions
-        signed_group = [stxn1, stxn2]
-        txid = client.send_transactions(signed_group)
-        wait_for_confirmation(client, txid)
+    def calculate_withdrawal(self, provider_address):
+        """Returns (liquidity_tokens, algo_amount, uctzar_amount) a provider would redeem."""
+        # Calculate provider's share
+        liquidity_tokens = self.liquidity_providers.get(provider_address, 0)
+        share = liquidity_tokens / self.total_liquidity_tokens if self.total_liquidity_tokens else 0
 
+        # Calculate amounts to return
+        return liquidity_tokens, self.algo_reserves * share, self.uctzar_reserves * share
+
+    def reserve_base_units(self):
+        """Reserves as integer (microAlgos, UCTZAR cents)."""
+        return round(self.algo_reserves * 1_000_000), round(self.uctzar_reserves * 100)
+
+    def calculate_withdrawal_base_units(self, provider_address):
+        """Like calculate_withdrawal, but exact in integer base units and rounded down."""
+        return self.liquidity_providers.redeemable_one(provider_address, *self.reserve_base_units(),
+                                                       self.total_liquidity_tokens)
+
+    def redeemable_by_all(self):
+        """(public keys, tokens, microAlgos, UCTZAR cents) arrays for every provider, computed in one pass."""
+        return self.liquidity_providers.redeemable(*self.reserve_base_units(), self.total_liquidity_tokens)
+
+    # Accounting: applied once the matching transactions are confirmed on chain. Each operation is
+    # journaled before it touches the pool, so one whose journal write fails is not booked at all.
+    def record_add_liquidity(self, provider_address, algo_amount, uctzar_amount):
+        """Books a deposit and returns the liquidity tokens issued for it."""
+        with self._lock:
+            liquidity_tokens = self._book_add(provider_address, algo_amount, uctzar_amount)
+            self.reserves_changed()
+        return liquidity_tokens
+
+    def record_swap(self, direction, amount_in, amount_out):
+        """Books a swap; the whole input, fee included, stays in the pool."""
+        with self._lock:
+            self._book_swap(direction, amount_in, amount_out)
+            self.reserves_changed()
+
+    def record_withdrawal(self, provider_address, liquidity_tokens, algo_amount, uctzar_amount):
+        """Books a withdrawal that redeemed liquidity_tokens of a provider's position."""
+        with self._lock:
+            self._book_withdrawal(provider_address, liquidity_tokens, algo_amount, uctzar_amount)
+            self.reserves_changed()
+
+    def _book_add(self, provider_address, algo_amount, uctzar_amount):
         # Calculate and distribute liquidity tokens
         liquidity_tokens = self.calculate_liquidity_tokens(algo_amount, uctzar_amount)
+        if self.journal is not None:
+            self.journal.append_add(provider_address, algo_amount, uctzar_amount, liquidity_tokens)
+        # Update provider's liquidity token balance
+        self.liquidity_providers.add(provider_address, liquidity_tokens)
         self.total_liquidity_tokens += liquidity_tokens
         self.algo_reserves += algo_amount
         self.uctzar_reserves += uctzar_amount
+        return liquidity_tokens
+
+    def _book_swap(self, direction, amount_in, amount_out):
+        if self.journal is not None:
+            self.journal.append_swap(direction == ALGO_TO_UCTZAR, amount_in, amount_out)
+        if direction == ALGO_TO_UCTZAR:
+            self.algo_reserves += amount_in
+            self.uctzar_reserves -= amount_out
+        else:
+            self.uctzar_reserves += amount_in
+            self.algo_reserves -= amount_out
+
+    def _book_withdrawal(self, provider_address, liquidity_tokens, algo_amount, uctzar_amount):
+        if self.journal is not None:
+            self.journal.append_withdraw(provider_address, liquidity_tokens, algo_amount, uctzar_amount)
+        # Update reserves and provider's liquidity tokens; tokens issued since the withdrawal was priced stay
+        self.liquidity_providers.add(provider_address, -liquidity_tokens)
+        self.algo_reserves -= algo_amount
+        self.uctzar_reserves -= uctzar_amount
+        self.total_liquidity_tokens -= liquidity_tokens
 
-        # Update provider's liquidity token balance
-        if provider_address in self.liquidity_providers:
-            self.liquidity_providers[provider_address] += liquidity_tokens
+    def quote_swap(self, direction, amount_in):
+        """(amount_out, fee) for one swap at the pool's fee, against the reserves including pending operations."""
+        algo_reserves, uctzar_reserves = self.effective_reserves()
+        if direction == ALGO_TO_UCTZAR:
+            return constant_product_output(amount_in, algo_reserves, uctzar_reserves, self.fee_percentage)
+        return constant_product_output(amount_in, uctzar_reserves, algo_reserves, self.fee_percentage)
+
+    # Reservations: held from submission until the transactions confirm or fail
+    def effective_reserves(self):
+        """(ALGO, UCTZAR) reserves once every pending operation confirms; what new operations are priced on."""
+        return self.algo_reserves + self._pending_algo, self.uctzar_reserves + self._pending_uctzar
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def _reserve(self, kind, provider=None, direction=None, amount_in=0.0, amount_out=0.0, fee=0.0,
+                 algo_delta=0.0, uctzar_delta=0.0, liquidity_tokens=0):
+        """Records a pending operation; the caller holds the lock and has checked it can be paid."""
+        reservation = Reservation(next(self._reservation_ids), kind, provider, direction, amount_in, amount_out,
+                                  fee, algo_delta, uctzar_delta, liquidity_tokens)
+        self._pending[reservation.id] = reservation
+        self._adjust_pending(reservation, 1)
+        self.reserves_changed()
+        return reservation
+
+    def _adjust_pending(self, reservation, sign):
+        self._pending_algo += sign * reservation.algo_delta
+        self._pending_uctzar += sign * reservation.uctzar_delta
+        self._pending_algo_out += sign * max(0.0, -reservation.algo_delta)
+        self._pending_uctzar_out += sign * max(0.0, -reservation.uctzar_delta)
+        self._pending_tokens += sign * reservation.liquidity_tokens
+        if reservation.kind == "withdraw":
+            (self._withdrawing.add if sign > 0 else self._withdrawing.discard)(reservation.provider)
+        if not self._pending:
+            # Nothing in flight: drop the rounding residue of the running sums
+            self._pending_algo = self._pending_uctzar = self._pending_algo_out = self._pending_uctzar_out = 0.0
+
+    def _can_pay(self, algo_out, uctzar_out):
+        return (algo_out <= self.algo_reserves - self._pending_algo_out
+                and uctzar_out <= self.uctzar_reserves - self._pending_uctzar_out)
+
+    def reserve_swap(self, direction, amount_in, min_amount_out=0.0):
+        """Prices a swap and holds its amounts; None if the pool can't pay or the price fell below min_amount_out.
+
+        A caller can quote_swap() without the lock and pass the result (less any
+        slippage it accepts) as min_amount_out, so the swap only goes ahead if the
+        reserves have not moved against it in the meantime.
+        """
+        with self._lock:
+            algo_reserves, uctzar_reserves = self.effective_reserves()
+            reserve_in, reserve_out = ((algo_reserves, uctzar_reserves) if direction == ALGO_TO_UCTZAR
+                                       else (uctzar_reserves, algo_reserves))
+            if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+                return None
+            amount_out, fee = constant_product_output(amount_in, reserve_in, reserve_out, self.fee_percentage)
+            if amount_out < min_amount_out:
+                return None
+            if not self._can_pay(amount_out if direction == UCTZAR_TO_ALGO else 0.0,
+                                 amount_out if direction == ALGO_TO_UCTZAR else 0.0):
+                return None
+            return self._reserve_swap(direction, amount_in, amount_out, fee)
+
+    def _reserve_swap(self, direction, amount_in, amount_out, fee):
+        if direction == ALGO_TO_UCTZAR:
+            algo_delta, uctzar_delta = amount_in, -amount_out
         else:
-            self.liquidity_providers[provider_address] = liquidity_tokens
+            algo_delta, uctzar_delta = -amount_out, amount_in
+        return self._reserve("swap", direction=direction, amount_in=amount_in, amount_out=amount_out, fee=fee,
+                             algo_delta=algo_delta, uctzar_delta=uctzar_delta)
+
+    def reserve_add(self, provider_address, algo_amount, uctzar_amount):
+        """Holds a deposit as pending; its liquidity tokens are issued when it is confirmed."""
+        with self._lock:
+            return self._reserve("add", provider=provider_address,
+                                 algo_delta=algo_amount, uctzar_delta=uctzar_amount)
+
+    def reserve_withdrawal(self, provider_address):
+        """Holds a provider's whole position for withdrawal; None if it has none or one is already pending.
+
+        Amounts are exact integer base units, rounded down, of the confirmed
+        reserves less pending payouts: deposits and swap inputs that have not
+        confirmed yet are never paid out. The Reservation carries them in
+        ALGOs/UCTZARs.
+        """
+        with self._lock:
+            liquidity_tokens = self.liquidity_providers.get(provider_address, 0)
+            if not liquidity_tokens or provider_address in self._withdrawing:
+                return None
+            algo_reserves = self.algo_reserves - self._pending_algo_out
+            uctzar_reserves = self.uctzar_reserves - self._pending_uctzar_out
+            total_tokens = self.total_liquidity_tokens - self._pending_tokens
+            microalgos = liquidity_tokens * round(algo_reserves * 1_000_000) // total_tokens
+            uctzar_units = liquidity_tokens * round(uctzar_reserves * 100) // total_tokens
+            algo_amount, uctzar_amount = microalgos / 1_000_000, uctzar_units / 100
+            if not self._can_pay(algo_amount, uctzar_amount):
+                return None
+            return self._reserve("withdraw", provider=provider_address, algo_delta=-algo_amount,
+                                 uctzar_delta=-uctzar_amount, liquidity_tokens=liquidity_tokens)
+
+    def confirm(self, reservation):
+        """Books a reservation whose transactions confirmed; returns the tokens issued for an add.
+
+        If the booking fails (the journal write raised) nothing is booked and the
+        reservation stays pending, to be confirmed again. Once booked it is no
+        longer pending, even if a reserves listener then raises.
+        """
+        with self._lock:
+            self._adjust_pending(self._pending.pop(reservation.id), -1)
+            liquidity_tokens = None
+            try:
+                if reservation.kind == "swap":
+                    self._book_swap(reservation.direction, reservation.amount_in, reservation.amount_out)
+                elif reservation.kind == "add":
+                    liquidity_tokens = self._book_add(reservation.provider, reservation.algo_delta,
+                                                      reservation.uctzar_delta)
+                else:
+                    self._book_withdrawal(reservation.provider, reservation.liquidity_tokens,
+                                          -reservation.algo_delta, -reservation.uctzar_delta)
+            except Exception:
+                self._pending[reservation.id] = reservation
+                self._adjust_pending(reservation, 1)
+                raise
+            self.reserves_changed()
+        return liquidity_tokens
+
+    def release(self, reservation):
+        """Rolls back a reservation whose transactions were rejected or never confirmed."""
+        with self._lock:
+            if self._pending.pop(reservation.id, None) is not None:
+                self._adjust_pending(reservation, -1)
+                self.reserves_changed()
+
+    def quote_swaps(self, amounts, directions=ALGO_TO_UCTZAR, fee_percentage=None):
+        """Prices many candidate trades against the current reserves without touching the network.
+
+        amounts are input sizes (ALGOs or UCTZARs); directions is ALGO_TO_UCTZAR or
+        UCTZAR_TO_ALGO per trade, or a single value for all of them. fee_percentage
+        defaults to the pool's own.
+        """
+        if fee_percentage is None:
+            fee_percentage = self.fee_percentage
+        amounts = np.asarray(amounts, dtype=np.float64)
+        directions = np.broadcast_to(np.asarray(directions), amounts.shape)
+        algo_in = directions == ALGO_TO_UCTZAR
+        algo_reserves, uctzar_reserves = self.effective_reserves()
+        reserve_in = np.where(algo_in, algo_reserves, uctzar_reserves).astype(np.float64)
+        reserve_out = np.where(algo_in, uctzar_reserves, algo_reserves).astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            amount_out, fee = constant_product_output(amounts, reserve_in, reserve_out, fee_percentage)
+            net_amount_in = amounts - fee
+            price_impact = net_amount_in / (reserve_in + net_amount_in)
+
+        # The whole input (fee included) stays in the pool, as in the swap methods
+        algo_after = np.where(algo_in, algo_reserves + amounts, algo_reserves - amount_out)
+        uctzar_after = np.where(algo_in, uctzar_reserves - amount_out, uctzar_reserves + amounts)
+        return SwapQuote(amount_out, fee, price_impact, algo_after, uctzar_after)
 
+    def add_liquidity(self, provider_private_key, provider_address, algo_amount, uctzar_amount):
+        _ensure_client()
+        op = metrics.operation("add_liquidity")
+        reservation = self.reserve_add(provider_address, algo_amount, uctzar_amount)
+        try:
+            # Prepare transactions
+            params = params_cache.get()
+            op.lap("params")
+
+            # Transaction 1: Provider sends ALGOs to liquidity pool
+            txn1 = PaymentTxn(
+                sender=provider_address,
+                receiver=self.liquidity_pool_address,
+                amt=int(algo_amount * 1_000_000),  # Correct conversion
+                sp=params
+            )
+
+            # Transaction 2: Provider sends UCTZAR to liquidity pool
+            txn2 = AssetTransferTxn(
+                sender=provider_address,
+                receiver=self.liquidity_pool_address,
+                amt=int(uctzar_amount * 100),  # UCTZAR has decimals=2
+                index=self.pool_asset_id,
+                sp=params
+            )
+
+            # Group transactions
+            gid = calculate_group_id([txn1, txn2])
+            txn1.group = gid
+            txn2.group = gid
+            op.lap("build")
+
+            # Sign transactions
+            stxn1 = keyring.sign(txn1, provider_private_key)
+            stxn2 = keyring.sign(txn2, provider_private_key)
+            op.lap("sign")
+
+            # Submit transactions
+            signed_group = [stxn1, stxn2]
+            txid = client.send_transactions(signed_group)
+            op.lap("submit")
+            wait_for_confirmation(client, txid)
+            op.lap("confirm")
+        except Exception:
+            self.release(reservation)  # Rejected or never confirmed: roll the reservation back
+            op.failed()
+            raise
+
+        liquidity_tokens = self.confirm(reservation)
+        op.lap("book")
+        op.done()
         print(f"{provider_address} added liquidity: {algo_amount} ALGOs, {uctzar_amount} UCTZARs and received {liquidity_tokens} liquidity tokens.")
 
     def swap_algo_for_uctzar(self, trader_private_key, trader_address, algo_amount):
-        global uctzar_id
-        fee_percentage = 0.003
-        fee = algo_amount * fee_percentage
-        net_algo_amount = algo_amount - fee
-
-        # Calculate UCTZAR amount using constant product formula
-        k = self.algo_reserves * self.uctzar_reserves
-        new_algo_reserves = self.algo_reserves + net_algo_amount
-        new_uctzar_reserves = k / new_algo_reserves
-        uctzar_amount = self.uctzar_reserves - new_uctzar_reserves
+        _ensure_client()
+        op = metrics.operation("swap_algo_for_uctzar")
+        # Calculate UCTZAR amount using constant product formula and hold it until the swap settles
+        reservation = self.reserve_swap(ALGO_TO_UCTZAR, algo_amount)
+        op.lap("quote")
 
         # Ensure that pool has enough UCTZAR to fulfill the swap
-        if uctzar_amount > self.uctzar_reserves:
+        if reservation is None:
             print("Not enough UCTZAR in reserves to complete the swap.")
+            op.failed()
             return
-
-        # Prepare transactions
-        params = client.suggested_params()
-
-        # Transaction 1: Trader sends ALGOs to liquidity pool
-        txn1 = PaymentTxn(
-            sender=trader_address,
-            receiver=self.liquidity_pool_address,
-            amt=int(algo_amount * 1_000_000),
-            sp=params
-        )
-
-        # Transaction 2: Liquidity pool sends UCTZAR to trader
-        txn2 = AssetTransferTxn(
-            sender=self.liquidity_pool_address,
-            receiver=trader_address,
-            amt=int(uctzar_amount * 100),
-            index=uctzar_id,
-            sp=params
-        )
-
-        # Group transactions
-        gid = calculate_group_id([txn1, txn2])
-        txn1.group = gid
-        txn2.group = gid
-
-        # Sign transactions
-        stxn1 = txn1.sign(trader_private_key)
-        stxn2 = txn2.sign(self.liquidity_pool_private_key)
-
-        # Submit transactions
-        signed_group = [stxn1, stxn2]
-        txid = client.send_transactions(signed_group)
-        wait_for_confirmation(client, txid)
-
-        # Update reserves
-        self.algo_reserves += net_algo_amount
-        self.uctzar_reserves -= uctzar_amount
-
-        # Add fee to pool reserves
-        self.algo_reserves += fee
+        uctzar_amount, fee = reservation.amount_out, reservation.fee
+
+        try:
+            # Prepare transactions
+            params = params_cache.get()
+            op.lap("params")
+
+            # Transaction 1: Trader sends ALGOs to liquidity pool
+            txn1 = PaymentTxn(
+                sender=trader_address,
+                receiver=self.liquidity_pool_address,
+                amt=int(algo_amount * 1_000_000),
+                sp=params
+            )
+
+            # Transaction 2: Liquidity pool sends UCTZAR to trader
+            txn2 = AssetTransferTxn(
+                sender=self.liquidity_pool_address,
+                receiver=trader_address,
+                amt=int(uctzar_amount * 100),
+                index=self.pool_asset_id,
+                sp=params
+            )
+
+            # Group transactions
+            gid = calculate_group_id([txn1, txn2])
+            txn1.group = gid
+            txn2.group = gid
+            op.lap("build")
+
+            # Sign transactions
+            stxn1 = keyring.sign(txn1, trader_private_key)
+            stxn2 = keyring.sign(txn2, self.liquidity_pool_private_key)
+            op.lap("sign")
+
+            # Submit transactions
+            signed_group = [stxn1, stxn2]
+            txid = client.send_transactions(signed_group)
+            op.lap("submit")
+            wait_for_confirmation(client, txid)
+            op.lap("confirm")
+        except Exception:
+            self.release(reservation)  # Rejected or never confirmed: roll the reservation back
+            op.failed()
+            raise
+
+        self.confirm(reservation)
+        op.lap("book")
+        op.done()
 
         print(f"{trader_address} swapped {algo_amount} ALGOs for {uctzar_amount} UCTZARs and paid {fee} ALGOs in fees.")
 
     def swap_uctzar_for_algo(self, trader_private_key, trader_address, uctzar_amount):
-        global uctzar_id
-        fee_percentage = 0.003
-        fee = uctzar_amount * fee_percentage
-        net_uctzar_amount = uctzar_amount - fee
-
-        # Calculate ALGO amount using constant product formula
-        k = self.algo_reserves * self.uctzar_reserves
-        new_uctzar_reserves = self.uctzar_reserves + net_uctzar_amount
-        new_algo_reserves = k / new_uctzar_reserves
-        algo_amount = self.algo_reserves - new_algo_reserves
+        _ensure_client()
+        op = metrics.operation("swap_uctzar_for_algo")
+        # Calculate ALGO amount using constant product formula and hold it until the swap settles
+        reservation = self.reserve_swap(UCTZAR_TO_ALGO, uctzar_amount)
+        op.lap("quote")
 
         # Ensure that pool has enough ALGO to fulfill the swap
-        if algo_amount > self.algo_reserves:
+        if reservation is None:
             print("Not enough ALGO in reserves to complete the swap.")
+            op.failed()
             return
-
-        # Prepare transactions
-        params = client.suggested_params()
-
-        # Transaction 1: Trader sends UCTZAR to liquidity pool
-        txn1 = AssetTransferTxn(
-            sender=trader_address,
-            receiver=self.liquidity_pool_address,
-            amt=int(uctzar_amount * 100),
-            index=uctzar_id,
-            sp=params
-        )
-
-        # Transaction 2: Liquidity pool sends ALGOs to trader
-        txn2 = PaymentTxn(
-            sender=self.liquidity_pool_address,
-            receiver=trader_address,
-            amt=int(algo_amount * 1_000_000),
-            sp=params
-        )
-
-        # Group transactions
-        gid = calculate_group_id([txn1, txn2])
-        txn1.group = gid
-        txn2.group = gid
-
-        # Sign transactions
-        stxn1 = txn1.sign(trader_private_key)
-        stxn2 = txn2.sign(self.liquidity_pool_private_key)
-
-        # Submit transactions
-        signed_group = [stxn1, stxn2]
-        txid = client.send_transactions(signed_group)
-        wait_for_confirmation(client, txid)
-
-        # Update reserves
-        self.uctzar_reserves += net_uctzar_amount
-        self.algo_reserves -= algo_amount
-
-        # Add fee to pool reserves
-        self.uctzar_reserves += fee
+        algo_amount, fee = reservation.amount_out, reservation.fee
+
+        try:
+            # Prepare transactions
+            params = params_cache.get()
+            op.lap("params")
+
+            # Transaction 1: Trader sends UCTZAR to liquidity pool
+            txn1 = AssetTransferTxn(
+                sender=trader_address,
+                receiver=self.liquidity_pool_address,
+                amt=int(uctzar_amount * 100),
+                index=self.pool_asset_id,
+                sp=params
+            )
+
+            # Transaction 2: Liquidity pool sends ALGOs to trader
+            txn2 = PaymentTxn(
+                sender=self.liquidity_pool_address,
+                receiver=trader_address,
+                amt=int(algo_amount * 1_000_000),
+                sp=params
+            )
+
+            # Group transactions
+            gid = calculate_group_id([txn1, txn2])
+            txn1.group = gid
+            txn2.group = gid
+            op.lap("build")
+
+            # Sign transactions
+            stxn1 = keyring.sign(txn1, trader_private_key)
+            stxn2 = keyring.sign(txn2, self.liquidity_pool_private_key)
+            op.lap("sign")
+
+            # Submit transactions
+            signed_group = [stxn1, stxn2]
+            txid = client.send_transactions(signed_group)
+            op.lap("submit")
+            wait_for_confirmation(client, txid)
+            op.lap("confirm")
+        except Exception:
+            self.release(reservation)  # Rejected or never confirmed: roll the reservation back
+            op.failed()
+            raise
+
+        self.confirm(reservation)
+        op.lap("book")
+        op.done()
 
         print(f"{trader_address} swapped {uctzar_amount} UCTZARs for {algo_amount} ALGOs and paid {fee} UCTZARs in fees.")
 
+    def execute_swap_batch(self, orders, fee_percentage=None):
+        """Settles many swaps in atomic groups, netting opposite directions within each group.
+
+        orders is a list of (trader_private_key, trader_address, direction, amount_in).
+        Settlement is packed into atomic groups of up to 16 transactions (8 orders).
+        Each group is filled at its own clearing price, against the reserves as
+        they will be once the groups before it settle, so a group that fails
+        leaves every other group's price sound. All groups are submitted before
+        waiting once for every group. Returns one result dict per order with its
+        txid, amount_out, fee, price and error (None on success).
+        """
+        if not orders:
+            return []
+        _ensure_client()
+        if fee_percentage is None:
+            fee_percentage = self.fee_percentage
+        op = metrics.operation("execute_swap_batch")
+        orders_per_group = MAX_GROUP_SIZE // 2
+        results, reservations = [], []
+        try:
+            params = params_cache.get()
+            op.lap("params")
+            submitted = []
+            for start in range(0, len(orders), orders_per_group):
+                chunk = range(start, min(start + orders_per_group, len(orders)))
+                group_results, group_reservations = self._reserve_swap_group(
+                    [orders[i] for i in chunk], fee_percentage)
+                results += group_results
+                reservations += group_reservations
+                op.lap("quote")
+                if group_results[0]['error'] is not None:
+                    continue
+                try:
+                    signed_group = self._sign_swap_group([orders[i] for i in chunk],
+                                                         [results[i]['amount_out'] for i in chunk], params)
+                    op.lap("sign")
+                    txid = client.send_transactions(signed_group)
+                    op.lap("submit")
+                except Exception as e:
+                    for i in chunk:
+                        results[i]['error'] = f"Group rejected: {e}"
+                        self.release(reservations[i])
+                    continue
+                for i in chunk:
+                    results[i]['txid'] = txid
+                submitted.append((chunk, tracker.track(txid)))
+
+            # One wait for every group; only what actually settled is booked
+            settled = []
+            for chunk, future in submitted:
+                try:
+                    future.result()
+                except Exception as e:
+                    for i in chunk:
+                        results[i]['error'] = f"Group not confirmed: {e}"
+                        self.release(reservations[i])
+                    continue
+                settled += chunk
+            op.lap("confirm")
+        except Exception:
+            for reservation in reservations:
+                if reservation is not None:
+                    self.release(reservation)  # Nothing is booked yet, so everything still held is rolled back
+            op.failed()
+            raise
+
+        # Settled on chain: a booking that fails stays pending rather than being rolled back
+        try:
+            for i in settled:
+                self.confirm(reservations[i])
+        except Exception:
+            op.failed()
+            raise
+        op.lap("book")
+        op.done()
+
+        print(f"Settled {len(settled)} of {len(orders)} swaps in {len(submitted)} atomic groups.")
+        return results
+
+    def _reserve_swap_group(self, orders, fee_percentage):
+        """Prices one atomic group at its own clearing price and holds its amounts.
+
+        Returns (results, reservations); if the pool can't pay the group every
+        result carries the error and the reservations are None.
+        """
+        with self._lock:
+            price, amounts_out, fees = clear_swap_batch(
+                *self.effective_reserves(), [order[3] for order in orders], [order[2] for order in orders],
+                fee_percentage)
+            results = [{'trader': address, 'direction': direction, 'amount_in': amount,
+                        'amount_out': float(amount_out), 'fee': float(fee), 'price': price, 'txid': None, 'error': None}
+                       for (_, address, direction, amount), amount_out, fee in zip(orders, amounts_out, fees)]
+            algo_out = sum(r['amount_out'] for r in results if r['direction'] == UCTZAR_TO_ALGO)
+            uctzar_out = sum(r['amount_out'] for r in results if r['direction'] == ALGO_TO_UCTZAR)
+            if not self._can_pay(algo_out, uctzar_out):
+                for result in results:
+                    result['error'] = "Not enough reserves to settle the group"
+                return results, [None] * len(results)
+            # Hold every order's amounts until its group settles
+            return results, [self._reserve_swap(r['direction'], r['amount_in'], r['amount_out'], r['fee'])
+                             for r in results]
+
+    def _sign_swap_group(self, orders, amounts_out, params):
+        """Builds and signs one atomic group settling orders: each trader pays the pool, the pool pays the trader."""
+        txns, signers = [], []
+        for (trader_private_key, trader_address, direction, amount), amount_out in zip(orders, amounts_out):
+            if direction == ALGO_TO_UCTZAR:
+                pay_in = PaymentTxn(sender=trader_address, receiver=self.liquidity_pool_address,
+                                    amt=int(amount * 1_000_000), sp=params)
+                pay_out = AssetTransferTxn(sender=self.liquidity_pool_address, receiver=trader_address,
+                                           amt=int(amount_out * 100), index=self.pool_asset_id, sp=params)
+            else:
+                pay_in = AssetTransferTxn(sender=trader_address, receiver=self.liquidity_pool_address,
+                                          amt=int(amount * 100), index=self.pool_asset_id, sp=params)
+                pay_out = PaymentTxn(sender=self.liquidity_pool_address, receiver=trader_address,
+                                     amt=int(amount_out * 1_000_000), sp=params)
+            txns += [pay_in, pay_out]
+            signers += [trader_private_key, self.liquidity_pool_private_key]
+
+        gid = calculate_group_id(txns)
+        for txn in txns:
+            txn.group = gid
+        return keyring.sign_many(txns, signers)
+
     def withdraw_liquidity(self, provider_private_key, provider_address):
-        if provider_address not in self.liquidity_providers or self.liquidity_providers[provider_address] == 0:
-            print(f"{provider_address} has no liquidity tokens.")
+        _ensure_client()
+        op = metrics.operation("withdraw_liquidity")
+        reservation = self.reserve_withdrawal(provider_address)
+        if reservation is None:
+            print(f"{provider_address} has no liquidity tokens to withdraw.")
+            op.failed()
             return
-
-        # Calculate provider's share
-        liquidity_tokens = self.liquidity_providers[provider_address]
-        share = liquidity_tokens / self.total_liquidity_tokens
-
-        # Calculate amounts to return
-        algo_amount = self.algo_reserves * share
-        uctzar_amount = self.uctzar_reserves * share
-
-        # Prepare transactions
-        params = client.suggested_params()
-
-        # Transaction 1: Liquidity pool sends ALGOs back to provider
-        txn1 = PaymentTxn(
-            sender=self.liquidity_pool_address,
-            receiver=provider_address,
-            amt=int(algo_amount * 1_000_000),
-            sp=params
-        )
-
-        # Transaction 2: Liquidity pool sends UCTZARs back to provider
-        txn2 = AssetTransferTxn(
-            sender=self.liquidity_pool_address,
-            receiver=provider_address,
-            amt=int(uctzar_amount * 100),
-            index=uctzar_id,
-            sp=params
-        )
-
-        # Group transactions
-        gid = calculate_group_id([txn1, txn2])
-        txn1.group = gid
-        txn2.group = gid
-
-        # Sign transactions
-        stxn1 = txn1.sign(self.liquidity_pool_private_key)
-        stxn2 = txn2.sign(self.liquidity_pool_private_key)
-
-        # Submit transactions
-        signed_group = [stxn1, stxn2]
-        txid = client.send_transactions(signed_group)
-        wait_for_confirmation(client, txid)
-
-        # Update reserves and provider's liquidity tokens
-        self.algo_reserves -= algo_amount
-        self.uctzar_reserves -= uctzar_amount
-        self.total_liquidity_tokens -= liquidity_tokens
-        self.liquidity_providers[provider_address] = 0
+        algo_amount, uctzar_amount = -reservation.algo_delta, -reservation.uctzar_delta
+        microalgos, uctzar_units = round(algo_amount * 1_000_000), round(uctzar_amount * 100)
+        op.lap("quote")
+
+        try:
+            # Prepare transactions
+            params = params_cache.get()
+            op.lap("params")
+
+            # Transaction 1: Liquidity pool sends ALGOs back to provider
+            txn1 = PaymentTxn(
+                sender=self.liquidity_pool_address,
+                receiver=provider_address,
+                amt=microalgos,
+                sp=params
+            )
+
+            # Transaction 2: Liquidity pool sends UCTZARs back to provider
+            txn2 = AssetTransferTxn(
+                sender=self.liquidity_pool_address,
+                receiver=provider_address,
+                amt=uctzar_units,
+                index=self.pool_asset_id,
+                sp=params
+            )
+
+            # Group transactions
+            gid = calculate_group_id([txn1, txn2])
+            txn1.group = gid
+            txn2.group = gid
+            op.lap("build")
+
+            # Sign transactions
+            stxn1 = keyring.sign(txn1, self.liquidity_pool_private_key)
+            stxn2 = keyring.sign(txn2, self.liquidity_pool_private_key)
+            op.lap("sign")
+
+            # Submit transactions
+            signed_group = [stxn1, stxn2]
+            txid = client.send_transactions(signed_group)
+            op.lap("submit")
+            wait_for_confirmation(client, txid)
+            op.lap("confirm")
+        except Exception:
+            self.release(reservation)  # Rejected or never confirmed: roll the reservation back
+            op.failed()
+            raise
+
+        self.confirm(reservation)
+        op.lap("book")
+        op.done()
 
         print(f"{provider_address} withdrew {algo_amount} ALGOs and {uctzar_amount} UCTZARs.")
 
 # Main Program Execution
-if __name__ == "__main__":
+def main(argv=None):
+    """Runs the testnet demo: create UCTZAR, seed a pool, swap and withdraw."""
+    global uctzar_id
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--algod-address", default=config.algod_address)
+    parser.add_argument("--algod-token", default=config.algod_token)
+    args = parser.parse_args(argv)
+    configure(AlgodConfig(args.algod_address, args.algod_token))
+
     # Replace with your own testnet accounts and private keys
     # Ensure these accounts are funded via the Algorand Testnet Dispenser
 
@@ -374,34 +1023,22 @@ if __name__ == "__main__":
 
     # Check balances before transactions
     print("Initial Balances:")
-    for account in liquidity_providers + traders:
-        check_balance(account['address'])
-    check_balance(liquidity_pool_address)
-
-    # Create UCTZAR ASA using the first liquidity provider
-    uctzar_id = create_uctzar_asa(liquidity_providers[0]['private_key'], liquidity_providers[0]['address'])
-
-    # Opt-in to UCTZAR for all accounts
-    for account in liquidity_providers + traders:
-        opt_in_to_asa(account['private_key'], account['address'], uctzar_id)
-
-    # Liquidity pool account opts in to UCTZAR
-    opt_in_to_asa(liquidity_pool_private_key, liquidity_pool_address, uctzar_id)
-
-    # Distribute UCTZARs to other accounts
-    print("\nDistributing UCTZARs to other accounts...")
-    for account in liquidity_providers[1:] + traders:
-        distribute_uctzar(
-            liquidity_providers[0]['private_key'],
-            liquidity_providers[0]['address'],
-            account['address'],
-            10  # Adjust the amount as needed
-        )
+    check_balances([account['address'] for account in liquidity_providers + traders] + [liquidity_pool_address])
+
+    # Create UCTZAR, opt every account (and the pool) in and give each 10 UCTZARs, in about three rounds
+    print("\nCreating UCTZAR and onboarding accounts...")
+    creator = liquidity_providers[0]
+    uctzar_id, _ = bootstrap_uctzar(
+        creator['private_key'],
+        creator['address'],
+        [(account['private_key'], account['address']) for account in liquidity_providers + traders]
+        + [(liquidity_pool_private_key, liquidity_pool_address)],
+        {account['address']: 10 for account in liquidity_providers[1:] + traders},  # Adjust the amount as needed
+    )
 
     # Check UCTZAR balances
     print("\nUCTZAR Balances After Distribution:")
-    for account in liquidity_providers + traders:
-        check_uctzar_balance(account['address'])
+    check_uctzar_balances([account['address'] for account in liquidity_providers + traders])
 
     # Initialize Liquidity Pool
     pool = LiquidityPool(liquidity_pool_address, liquidity_pool_private_key)
@@ -412,9 +1049,7 @@ if __name__ == "__main__":
 
     # Check balances after adding liquidity
     print("\nBalances after adding liquidity:")
-    for account in liquidity_providers + traders:
-        check_balance(account['address'])
-    check_balance(liquidity_pool_address)
+    check_balances([account['address'] for account in liquidity_providers + traders] + [liquidity_pool_address])
 
     # Traders perform swaps with smaller amounts
     pool.swap_algo_for_uctzar(traders[0]['private_key'], traders[0]['address'], 0.5)
@@ -422,9 +1057,7 @@ if __name__ == "__main__":
 
     # Check balances after swaps
     print("\nBalances after swaps:")
-    for account in liquidity_providers + traders:
-        check_balance(account['address'])
-    check_balance(liquidity_pool_address)
+    check_balances([account['address'] for account in liquidity_providers + traders] + [liquidity_pool_address])
 
     # Providers withdraw liquidity
     for provider in liquidity_providers:
@@ -432,6 +1065,8 @@ if __name__ == "__main__":
 
     # Check final balances
     print("\nFinal Balances:")
-    for account in liquidity_providers + traders:
-        check_balance(account['address'])
-    check_balance(liquidity_pool_address)
+    check_balances([account['address'] for account in liquidity_providers + traders] + [liquidity_pool_address])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+import base64
+import copy
+import hashlib
+import threading
+import time
+
+from algosdk import constants, encoding, error, transaction
+from nacl.exceptions import BadSignatureError
+from nacl.signing import VerifyKey
+
+MIN_BALANCE = 100_000  # Base minimum balance in microAlgos
+ASSET_MIN_BALANCE = 100_000  # Extra minimum balance per ASA held
+MIN_FEE = 1_000
+
+
+class _Account:
+    __slots__ = ("amount", "assets", "created_assets", "auth_addr")
+
+    def __init__(self, amount=0):
+        self.amount = amount
+        self.assets = {}  # asset id -> amount held
+        self.created_assets = set()
+        self.auth_addr = None  # Address the account is rekeyed to, if any
+
+    def clone(self):
+        other = _Account(self.amount)
+        other.assets = dict(self.assets)
+        other.created_assets = set(self.created_assets)
+        other.auth_addr = self.auth_addr
+        return other
+
+    def min_balance(self):
+        return MIN_BALANCE + ASSET_MIN_BALANCE * len(self.assets)
+
+
+class LocalLedger:
+    """In-process stand-in for ``AlgodClient`` for offline benchmarking and testing.
+
+    Implements the subset of the algod API the pool and stokvel code use, and
+    tracks ALGO balances, ASA holdings, atomic groups, rekeys (every transaction
+    must be signed by the sender's current authorizing address) and leases (a
+    sender can't reuse a lease until the last transaction holding it has
+    expired). Transactions are validated and applied when submitted, and reported as confirmed in the next
+    block. With ``block_interval`` > 0 rounds follow the wall clock; with 0 a new
+    block is produced whenever someone waits on one, so nothing ever sleeps.
+    """
+
+    def __init__(self, block_interval=0.0, genesis_id="local-v1", verify_signatures=True,
+                 validity_rounds=1000):
+        self.block_interval = block_interval
+        self.genesis_id = genesis_id
+        self.genesis_hash = base64.b64encode(hashlib.sha256(genesis_id.encode()).digest()).decode()
+        self.verify_signatures = verify_signatures
+        self.validity_rounds = validity_rounds
+        self.transactions_applied = 0
+        self.transactions_rejected = 0
+        self._round = 1
+        self._round_time = time.monotonic()
+        self._accounts = {}
+        self._assets = {}  # asset id -> asset params
+        self._next_asset_id = 1000
+        self._txns = {}  # txid -> pending transaction info
+        self._blocks = {}  # round -> signed transactions in the block, as algod returns them
+        self._leases = {}  # (sender, lease) -> last valid round of the transaction holding it
+        self._leases_pruned = 0  # Round expired leases were last dropped in
+        self._lock = threading.RLock()
+
+    # -- ledger management -------------------------------------------------
+
+    def fund(self, address, microalgos):
+        """Credits an account out of thin air (the dispenser of this ledger)."""
+        with self._lock:
+            self._accounts.setdefault(address, _Account()).amount += microalgos
+
+    def advance(self, rounds=1):
+        """Produces blocks immediately, regardless of the block interval."""
+        with self._lock:
+            self._sync_clock()
+            self._round += rounds
+            self._round_time = time.monotonic()
+            return self._round
+
+    def _sync_clock(self):
+        if self.block_interval > 0:
+            elapsed_rounds = int((time.monotonic() - self._round_time) / self.block_interval)
+            if elapsed_rounds:
+                self._round += elapsed_rounds
+                self._round_time += elapsed_rounds * self.block_interval
+
+    def _current_round(self):
+        with self._lock:
+            self._sync_clock()
+            return self._round
+
+    # -- algod API ---------------------------------------------------------
+
+    def suggested_params(self, **kwargs):
+        last_round = self._current_round()
+        return transaction.SuggestedParams(
+            0,
+            last_round,
+            last_round + self.validity_rounds,
+            self.genesis_hash,
+            self.genesis_id,
+            False,
+            "local",
+            MIN_FEE,
+        )
+
+    def status(self, **kwargs):
+        last_round = self._current_round()
+        since = int((time.monotonic() - self._round_time) * 1e9)
+        return {"last-round": last_round, "time-since-last-round": since, "catchup-time": 0,
+                "last-version": "local", "stopped-at-unsupported-round": False}
+
+    def status_after_block(self, block_num, **kwargs):
+        """Returns once a round after ``block_num`` exists, as algod does."""
+        if self.block_interval > 0:
+            while self._current_round() <= block_num:
+                with self._lock:
+                    next_block = self._round_time + self.block_interval
+                time.sleep(max(0.0, next_block - time.monotonic()))
+        else:
+            with self._lock:
+                if self._round <= block_num:
+                    self._round = block_num + 1
+                    self._round_time = time.monotonic()
+        return self.status()
+
+    def send_transaction(self, txn, **kwargs):
+        return self.send_transactions([txn])
+
+    def send_transactions(self, txns, **kwargs):
+        """Validates and applies a list of signed transactions; groups are all-or-nothing."""
+        txns = list(txns)
+        with self._lock:
+            current_round = self._current_round()
+            for group in self._split_groups(txns):
+                self._check_group(group)
+            undo = {}
+            asset_undo = {}
+            leases = {}
+            extras = []
+            try:
+                for stxn in txns:
+                    self._check_signed(stxn, current_round, leases)
+                    extras.append(self._apply(stxn.transaction, undo, asset_undo))
+            except error.AlgodHTTPError:
+                self._accounts.update(undo)
+                for asset_id, params in asset_undo.items():
+                    if params is None:
+                        self._assets.pop(asset_id, None)
+                    else:
+                        self._assets[asset_id] = params
+                self.transactions_rejected += len(txns)
+                raise
+            self._record_leases(leases, current_round)
+
+            block = self._blocks.setdefault(current_round + 1, [])
+            for stxn, extra in zip(txns, extras):
+                self._txns[stxn.get_txid()] = {
+                    "txn": stxn.dictify(),
+                    "confirmed-round": current_round + 1,
+                    "pool-error": "",
+                    **extra,
+                }
+                entry = stxn.dictify()
+                if "closing-amount" in extra:
+                    entry["ca"] = extra["closing-amount"]
+                if "asset-closing-amount" in extra:
+                    entry["aca"] = extra["asset-closing-amount"]
+                block.append(entry)
+            self.transactions_applied += len(txns)
+            return txns[0].get_txid()
+
+    def pending_transaction_info(self, transaction_id, **kwargs):
+        with self._lock:
+            info = self._txns.get(transaction_id)
+            if info is None:
+                raise error.AlgodHTTPError("txn does not exist", 404)
+            result = dict(info)
+            if result["confirmed-round"] > self._current_round():
+                result["confirmed-round"] = 0
+            return result
+
+    def block_info(self, block=None, round_num=None, **kwargs):
+        """Returns {"block": {"rnd", "txns"}} for a past round; addresses in txns are raw bytes, as in msgpack."""
+        round_number = block if block is not None else round_num
+        with self._lock:
+            if round_number > self._current_round():
+                raise error.AlgodHTTPError(f"ledger does not have entry {round_number}", 404)
+            return {"block": {"rnd": round_number, "txns": list(self._blocks.get(round_number, []))}}
+
+    def account_info(self, address, **kwargs):
+        with self._lock:
+            acct = self._accounts.get(address, _Account())
+            info = {
+                "address": address,
+                "amount": acct.amount,
+                "amount-without-pending-rewards": acct.amount,
+                "min-balance": acct.min_balance() if acct.amount or acct.assets else 0,
+                "assets": [{"asset-id": asset_id, "amount": amount, "is-frozen": False}
+                           for asset_id, amount in acct.assets.items()],
+                "created-assets": [{"index": asset_id, "params": dict(self._assets[asset_id])}
+                                   for asset_id in acct.created_assets if asset_id in self._assets],
+                "total-assets-opted-in": len(acct.assets),
+                "round": self._round,
+                "status": "Offline",
+            }
+            if acct.auth_addr is not None:
+                info["auth-addr"] = acct.auth_addr
+            return info
+
+    def asset_info(self, asset_id, **kwargs):
+        with self._lock:
+            if asset_id not in self._assets:
+                raise error.AlgodHTTPError("asset does not exist", 404)
+            return {"index": asset_id, "params": dict(self._assets[asset_id])}
+
+    # -- validation --------------------------------------------------------
+
+    @staticmethod
+    def _reject(message):
+        raise error.AlgodHTTPError(f"TransactionPool.Remember: {message}", 400)
+
+    @staticmethod
+    def _split_groups(txns):
+        groups = {}
+        for stxn in txns:
+            key = stxn.transaction.group or id(stxn)
+            groups.setdefault(key, []).append(stxn)
+        return groups.values()
+
+    def _check_group(self, group):
+        gid = group[0].transaction.group
+        if gid is None:
+            return
+        if len(group) > constants.tx_group_limit:
+            self._reject("group size exceeds limit")
+        unsigned = []
+        for stxn in group:
+            txn = copy.copy(stxn.transaction)
+            txn.group = None
+            unsigned.append(txn)
+        if transaction.calculate_group_id(unsigned) != gid:
+            self._reject("incomplete group or group id mismatch")
+        if sum(stxn.transaction.fee for stxn in group) < MIN_FEE * len(group):
+            self._reject("group fees below minimum")
+
+    def _check_signed(self, stxn, current_round, leases):
+        """Validates one signed transaction; leases collects the (sender, lease) pairs taken by this submission."""
+        txn = stxn.transaction
+        if stxn.get_txid() in self._txns:
+            self._reject("transaction already in ledger")
+        if txn.genesis_hash != self.genesis_hash:
+            self._reject("genesis hash mismatch")
+        if not txn.first_valid_round <= current_round + 1 <= txn.last_valid_round:
+            self._reject(f"txn dead: round {current_round + 1} outside of "
+                         f"{txn.first_valid_round}--{txn.last_valid_round}")
+        if txn.group is None and txn.fee < MIN_FEE:
+            self._reject("fee below minimum")
+        if txn.lease:
+            key = (txn.sender, bytes(txn.lease))
+            if key in leases or self._leases.get(key, 0) >= current_round + 1:
+                self._reject(f"transaction {stxn.get_txid()} using an overlapping lease")
+            leases[key] = txn.last_valid_round
+
+        # Checked as each transaction is applied, so a rekey earlier in the group already counts
+        acct = self._accounts.get(txn.sender)
+        expected = (acct.auth_addr if acct is not None else None) or txn.sender
+        if isinstance(stxn, transaction.SignedTransaction):
+            signer = stxn.authorizing_address or txn.sender
+            if signer != expected:
+                self._reject(f"should have been authorized by {expected} but was actually authorized by {signer}")
+            if stxn.signature is None:
+                self._reject("missing signature")
+            if self.verify_signatures:
+                try:
+                    VerifyKey(encoding.decode_address(signer)).verify(
+                        self._signing_bytes(txn), base64.b64decode(stxn.signature))
+                except BadSignatureError:
+                    self._reject("invalid signature")
+        elif isinstance(stxn, transaction.MultisigTransaction):
+            if stxn.multisig.address() != expected:
+                self._reject(f"should have been authorized by {expected} but was actually authorized by "
+                             f"{stxn.multisig.address()}")
+            signed = sum(subsig.signature is not None for subsig in stxn.multisig.subsigs)
+            if signed < stxn.multisig.threshold:
+                self._reject("multisig threshold not met")
+            if self.verify_signatures and not stxn.multisig.verify(self._signing_bytes(txn)):
+                self._reject("invalid multisig signature")
+        else:
+            self._reject(f"unsupported signed transaction type {type(stxn).__name__}")
+
+    def _record_leases(self, leases, current_round):
+        self._leases.update(leases)
+        if current_round > self._leases_pruned:
+            self._leases_pruned = current_round
+            self._leases = {key: last_valid for key, last_valid in self._leases.items() if last_valid > current_round}
+
+    @staticmethod
+    def _signing_bytes(txn):
+        return constants.txid_prefix + base64.b64decode(encoding.msgpack_encode(txn))
+
+    # -- state transitions -------------------------------------------------
+
+    def _account(self, address, undo):
+        acct = self._accounts.get(address)
+        if address not in undo:
+            undo[address] = acct.clone() if acct is not None else _Account()
+        if acct is None:
+            acct = self._accounts[address] = _Account()
+        return acct
+
+    def _debit(self, acct, microalgos):
+        if acct.amount < microalgos:
+            self._reject("overspend")
+        acct.amount -= microalgos
+
+    def _check_min_balance(self, address, acct):
+        if acct.amount and acct.amount < acct.min_balance():
+            self._reject(f"account {address} balance {acct.amount} below min {acct.min_balance()}")
+
+    def _apply(self, txn, undo, asset_undo):
+        """Applies one transaction and returns extra fields for its pending info."""
+        extra = {}
+        sender = self._account(txn.sender, undo)
+        self._debit(sender, txn.fee)
+
+        if isinstance(txn, transaction.PaymentTxn):
+            receiver = self._account(txn.receiver, undo)
+            self._debit(sender, txn.amt)
+            receiver.amount += txn.amt
+            if txn.close_remainder_to:
+                if sender.assets:
+                    self._reject("cannot close account holding assets")
+                self._account(txn.close_remainder_to, undo).amount += sender.amount
+                extra["closing-amount"] = sender.amount
+                sender.amount = 0
+                sender.auth_addr = None  # A closed account starts over unrekeyed
+        elif isinstance(txn, transaction.AssetConfigTxn):
+            extra = self._apply_asset_config(txn, sender, undo, asset_undo)
+        elif isinstance(txn, transaction.AssetTransferTxn):
+            extra = self._apply_asset_transfer(txn, undo)
+        else:
+            self._reject(f"unsupported transaction type {txn.type}")
+
+        if txn.rekey_to and not (txn.close_remainder_to and isinstance(txn, transaction.PaymentTxn)):
+            sender.auth_addr = txn.rekey_to if txn.rekey_to != txn.sender else None
+        self._check_min_balance(txn.sender, sender)
+        return extra
+
+    def _apply_asset_config(self, txn, sender, undo, asset_undo):
+        if not txn.index:
+            asset_id = self._next_asset_id
+            self._next_asset_id += 1
+            asset_undo[asset_id] = None
+            self._assets[asset_id] = {
+                "creator": txn.sender, "total": txn.total, "decimals": txn.decimals,
+                "default-frozen": bool(txn.default_frozen), "unit-name": txn.unit_name,
+                "name": txn.asset_name, "manager": txn.manager, "reserve": txn.reserve,
+                "freeze": txn.freeze, "clawback": txn.clawback,
+            }
+            sender.assets[asset_id] = txn.total
+            sender.created_assets.add(asset_id)
+            return {"asset-index": asset_id}  # Reported by pending_transaction_info, like algod
+
+        params = self._assets.get(txn.index)
+        if params is None:
+            self._reject(f"asset {txn.index} does not exist")
+        if params["manager"] != txn.sender:
+            self._reject("only the manager can reconfigure an asset")
+        asset_undo.setdefault(txn.index, dict(params))
+        if not any((txn.manager, txn.reserve, txn.freeze, txn.clawback)):
+            if sender.assets.get(txn.index) != params["total"]:
+                self._reject("cannot destroy asset while units are held by others")
+            del self._assets[txn.index]
+            del sender.assets[txn.index]
+            sender.created_assets.discard(txn.index)
+        else:
+            params.update(manager=txn.manager, reserve=txn.reserve,
+                          freeze=txn.freeze, clawback=txn.clawback)
+        return {}
+
+    def _apply_asset_transfer(self, txn, undo):
+        asset_id = txn.index
+        params = self._assets.get(asset_id)
+        if params is None:
+            self._reject(f"asset {asset_id} does not exist")
+
+        source_address = txn.sender
+        if txn.revocation_target:
+            if params["clawback"] != txn.sender:
+                self._reject("only the clawback address can revoke")
+            source_address = txn.revocation_target
+        source = self._account(source_address, undo)
+        receiver = self._account(txn.receiver, undo)
+
+        if txn.sender == txn.receiver and txn.amount == 0 and asset_id not in source.assets:
+            source.assets[asset_id] = 0  # Opt-in
+            return {}
+        if asset_id not in source.assets:
+            self._reject(f"{source_address} is not opted in to asset {asset_id}")
+        if asset_id not in receiver.assets:
+            self._reject(f"{txn.receiver} is not opted in to asset {asset_id}")
+        if source.assets[asset_id] < txn.amount:
+            self._reject(f"underflow on asset {asset_id}")
+        source.assets[asset_id] -= txn.amount
+        receiver.assets[asset_id] += txn.amount
+        if txn.close_assets_to:
+            remainder = source.assets.pop(asset_id)
+            closer = self._account(txn.close_assets_to, undo)
+            if asset_id not in closer.assets:
+                self._reject(f"{txn.close_assets_to} is not opted in to asset {asset_id}")
+            closer.assets[asset_id] += remainder
+            return {"asset-closing-amount": remainder}
+        return {}
@@ -0,0 +1,412 @@
+"""Array-backed LP token ledger for pools with very many providers.
+
+LPTokenLedger is a mapping of provider address to liquidity tokens, so it
+drops in where LiquidityPool used a dict. Each address is stored as its 32-byte
+public key in one fixed-width bytes array, with balances in one int64 array and
+a live flag, all indexed by slot: 41 bytes a slot. Slot capacity grows by half
+when full. A linear probing table of int32 slots, kept at most three quarters
+full and sized by providers rather than capacity, maps keys to slots. Measured
+adding 1.1M addresses one at a time, that is 47 to 72 bytes per provider as the
+arrays grow, 59 on average (64 at 1M providers), against well over 200 for a
+dict of str to int. Because balances sit in one array, every provider's
+redeemable amounts can be computed in a single vectorized pass with exact
+integer arithmetic.
+
+Providers may also be keyed by any other non-empty string, e.g. an account id
+in a replay file. Such an id is stored under a 32-byte hash of it and kept in a
+side table so iteration gives it back; only strings that look like an address
+but fail its checksum are refused.
+"""
+import hashlib
+import re
+import struct
+from collections.abc import MutableMapping
+
+import numpy as np
+from algosdk import constants, encoding
+
+KEY_WIDTH = constants.key_len_bytes  # An address is stored as its 32-byte public key
+EMPTY = -1
+_MASK = (1 << 64) - 1
+_WORDS = struct.Struct("<4Q")
+_COEFFICIENTS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+_MIX1 = 0xFF51AFD7ED558CCD
+_MIX2 = 0xC4CEB9FE1A85EC53
+_BASE32_DIGITS = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", "0123456789abcdefghijklmnopqrstuv")
+_CHECKSUM_MASK = (1 << 8 * constants.check_sum_len_bytes) - 1
+_ADDRESS_LIKE = re.compile(f"[A-Z2-7]{{{constants.address_len}}}", re.IGNORECASE)
+
+try:
+    hashlib.new("sha512_256")
+
+    def _checksum(key):
+        return int.from_bytes(hashlib.new("sha512_256", key).digest()[-constants.check_sum_len_bytes:], "big")
+except ValueError:  # OpenSSL without SHA-512/256
+    def _checksum(key):
+        return int.from_bytes(encoding.checksum(key)[-constants.check_sum_len_bytes:], "big")
+
+
+def _hash(key):
+    """64-bit hash of one key; must match _hash_many bit for bit."""
+    a, b, c, d = _WORDS.unpack(key.ljust(KEY_WIDTH, b"\0"))
+    k0, k1, k2, k3 = _COEFFICIENTS
+    h = (a * k0 + b * k1 + c * k2 + d * k3) & _MASK
+    h ^= h >> 33
+    h = (h * _MIX1) & _MASK
+    h ^= h >> 33
+    h = (h * _MIX2) & _MASK
+    return h ^ (h >> 33)
+
+
+def _hash_many(keys):
+    keys = np.ascontiguousarray(keys, dtype=f"S{KEY_WIDTH}")
+    words = keys.view("<u8").reshape(len(keys), KEY_WIDTH // 8)
+    shift = np.uint64(33)
+    with np.errstate(over="ignore"):
+        h = words @ np.array(_COEFFICIENTS, dtype=np.uint64)  # Wraps mod 2**64, like _hash
+        h ^= h >> shift
+        h *= np.uint64(_MIX1)
+        h ^= h >> shift
+        h *= np.uint64(_MIX2)
+    return h ^ (h >> shift)
+
+
+def _mul_div(tokens, reserve, total):
+    """floor(tokens * reserve / total) elementwise, exactly, for int64 tokens <= total."""
+    if total <= 0 or tokens.size == 0:
+        return np.zeros(tokens.shape, dtype=np.int64)
+    largest = int(tokens.max())
+    if largest * reserve < 2 ** 63:
+        return tokens * reserve // total
+    quotient, remainder = divmod(reserve, total)
+    if largest * remainder < 2 ** 63:
+        return tokens * quotient + tokens * remainder // total
+    return np.array([t * reserve // total for t in tokens.tolist()], dtype=object)
+
+
+def _parse(address):
+    """(key, is_address): the public key behind an address, or the hash of another provider id.
+
+    Keys lose their trailing zero bytes, as numpy's S dtype hands them back. An
+    address gives the same key as encoding.decode_address, several times faster:
+    the base32 text is read as one base-32 integer of key, checksum and two zero
+    bits.
+    """
+    if not isinstance(address, str) or not address:
+        raise ValueError(f"Not a provider address or id: {address!r}")
+    if len(address) != constants.address_len or not _ADDRESS_LIKE.fullmatch(address):
+        return _id_key(address), False
+    try:
+        value = int(address.translate(_BASE32_DIGITS), 32)
+    except ValueError:  # Lower case
+        value = 1
+    if not value & 3:
+        key = (value >> 2 + 8 * constants.check_sum_len_bytes).to_bytes(KEY_WIDTH, "big")
+        if (value >> 2) & _CHECKSUM_MASK == _checksum(key):
+            return key.rstrip(b"\0"), True
+    raise ValueError(f"Not an Algorand address: {address!r}")
+
+
+def _key(address):
+    return _parse(address)[0]
+
+
+_BASE32_VALUES = np.full(256, 32, dtype=np.uint8)  # 32: not a base32 digit
+_BASE32_VALUES[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", dtype=np.uint8)] = np.arange(32)
+_CHECKED_BITS = 8 * (KEY_WIDTH + constants.check_sum_len_bytes)
+
+
+def _parse_many(addresses, verify=True):
+    """(S32 keys, {key: id} for the providers that are not addresses) for a sequence of addresses or ids.
+
+    Addresses are decoded in one vectorized pass; ids go through _parse.
+    verify=False skips the address checksums, for addresses already checked
+    when they were first booked.
+    """
+    addresses = np.asarray(addresses)
+    if addresses.dtype.kind != "S":
+        addresses = np.array([address.encode() for address in addresses.tolist()], dtype="S")
+    count = len(addresses)
+    keys = np.zeros(count, dtype=f"S{KEY_WIDTH}")
+    decoded = np.zeros(count, dtype=bool)
+    if count and addresses.itemsize == constants.address_len:
+        values = _BASE32_VALUES[addresses.view(np.uint8).reshape(count, constants.address_len)]
+        decoded = (values < 32).all(axis=1)
+        # Five bits a digit: the key, its checksum, then two zero bits
+        bits = np.unpackbits(values[decoded, :, None], axis=2)[:, :, 3:].reshape(-1, 5 * constants.address_len)
+        raw = np.packbits(bits[:, :_CHECKED_BITS], axis=1)
+        keys[decoded] = np.ascontiguousarray(raw[:, :KEY_WIDTH]).view(f"S{KEY_WIDTH}").ravel()
+        invalid = bits[:, _CHECKED_BITS:].any(axis=1)
+        if verify:
+            checksums = np.ascontiguousarray(raw[:, KEY_WIDTH:]).view(">u4").ravel().tolist()
+            invalid |= [checksum != _checksum(key.ljust(KEY_WIDTH, b"\0"))
+                        for key, checksum in zip(keys[decoded].tolist(), checksums)]
+        if invalid.any():
+            raise ValueError(f"Not an Algorand address: {addresses[decoded][invalid][0].decode()!r}")
+    ids = {}
+    for i in np.flatnonzero(~decoded).tolist():
+        address = addresses[i].decode()
+        key, is_address = _parse(address)
+        keys[i] = key
+        if not is_address:
+            ids[key] = address
+    return keys, ids
+
+
+def _id_key(provider_id):
+    return hashlib.sha256(b"lp-ledger-id:" + provider_id.encode()).digest().rstrip(b"\0")
+
+
+def _address(key):
+    return encoding.encode_address(key.ljust(KEY_WIDTH, b"\0"))
+
+
+def _table_size(slots):
+    """Smallest power of two keeping ``slots`` entries at most three quarters of the table."""
+    return max(16, 1 << (-(-4 * slots // 3) - 1).bit_length())
+
+
+class LPTokenLedger(MutableMapping):
+    def __init__(self, providers=None, capacity=16):
+        self._allocate(capacity)
+        self._table = np.full(_table_size(0), EMPTY, dtype=np.int32)
+        self._size = 0  # Slots used, including deleted ones
+        self._count = 0  # Live providers
+        self._ids = {}  # key -> provider id, for providers that are not addresses
+        if providers:
+            self.update(providers)
+
+    def _allocate(self, capacity):
+        self._addresses = np.zeros(capacity, dtype=f"S{KEY_WIDTH}")  # Public keys
+        self._tokens = np.zeros(capacity, dtype=np.int64)
+        self._live = np.zeros(capacity, dtype=bool)
+
+    @classmethod
+    def from_arrays(cls, addresses, tokens, ids=None):
+        """Builds a ledger from unique addresses or ids (str) or keys (bytes) and balances in one vectorized pass.
+
+        ids maps the keys of providers that are not addresses back to their ids,
+        as ``ids()`` returns them.
+        """
+        addresses = np.asarray(addresses)
+        ids = dict(ids or {})
+        if addresses.dtype.kind in "UO":
+            addresses, parsed_ids = _parse_many(addresses)
+            ids.update(parsed_ids)
+        count = len(addresses)
+        ledger = cls(capacity=max(16, count))
+        ledger._addresses[:count] = addresses
+        ledger._tokens[:count] = tokens
+        ledger._live[:count] = True
+        ledger._size = ledger._count = count
+        ledger._ids = ids
+        ledger._rebuild_table(_table_size(count))
+        return ledger
+
+    def copy(self):
+        return LPTokenLedger.from_arrays(*self.arrays(), ids=self._ids)
+
+    def ids(self):
+        """{key: provider id} for the providers keyed by an id rather than an address."""
+        return dict(self._ids)
+
+    # -- slot table ----------------------------------------------------------
+
+    def _rebuild_table(self, table_size):
+        self._table = np.full(table_size, EMPTY, dtype=np.int32)
+        self._place(np.arange(self._size))
+
+    def _place(self, slots):
+        """Writes slots, whose keys are not in the table yet, into it in one vectorized pass."""
+        table = self._table
+        mask = len(table) - 1
+        positions = (_hash_many(self._addresses[slots]) & np.uint64(mask)).astype(np.int64)
+        while slots.size:
+            # Slots probing a free position write themselves there; whichever write
+            # lands keeps the position and the rest move one step on
+            free = table[positions] == EMPTY
+            table[positions[free]] = slots[free]
+            placed = table[positions] == slots
+            slots = slots[~placed]
+            positions = (positions[~placed] + 1) & mask
+
+    def _find_many(self, keys):
+        """Slot of each key, or EMPTY, probing for all of them at once."""
+        table = self._table
+        mask = len(table) - 1
+        found = np.full(len(keys), EMPTY, dtype=np.int64)
+        rows = np.arange(len(keys))
+        positions = (_hash_many(keys) & np.uint64(mask)).astype(np.int64)
+        while rows.size:
+            slots = table[positions]
+            empty = slots == EMPTY
+            match = ~empty
+            match[match] = self._addresses[slots[match]] == keys[rows[match]]
+            found[rows[match]] = slots[match]
+            more = ~(empty | match)
+            rows = rows[more]
+            positions = (positions[more] + 1) & mask
+        return found
+
+    def _find(self, key):
+        """Returns (slot or EMPTY, table position where the probe stopped)."""
+        table = self._table
+        addresses = self._addresses
+        mask = len(table) - 1
+        position = _hash(key) & mask
+        while True:
+            slot = int(table[position])
+            if slot == EMPTY or addresses[slot] == key:
+                return slot, position
+            position = (position + 1) & mask
+
+    def _insert(self, key, position, tokens, address, is_address):
+        if self._size == len(self._tokens):
+            self._grow()
+        if 4 * (self._size + 1) > 3 * len(self._table):
+            self._rebuild_table(2 * len(self._table))
+            position = self._find(key)[1]
+        if not is_address:
+            self._ids[key] = address
+        slot = self._size
+        self._addresses[slot] = key
+        self._tokens[slot] = tokens
+        self._live[slot] = True
+        self._table[position] = slot
+        self._size += 1
+        self._count += 1
+
+    def _grow(self):
+        # Slots keep their numbers, so the table stays valid
+        size = self._size
+        addresses, tokens, live = self._addresses, self._tokens, self._live
+        self._allocate(len(tokens) + len(tokens) // 2)
+        self._addresses[:size] = addresses[:size]
+        self._tokens[:size] = tokens[:size]
+        self._live[:size] = live[:size]
+
+    # -- mapping -------------------------------------------------------------
+
+    def __getitem__(self, address):
+        slot = self._find(_key(address))[0]
+        if slot == EMPTY or not self._live[slot]:
+            raise KeyError(address)
+        return int(self._tokens[slot])
+
+    def get(self, address, default=None):
+        slot = self._find(_key(address))[0]
+        return int(self._tokens[slot]) if slot != EMPTY and self._live[slot] else default
+
+    def __contains__(self, address):
+        slot = self._find(_key(address))[0]
+        return slot != EMPTY and bool(self._live[slot])
+
+    def __setitem__(self, address, tokens):
+        key, is_address = _parse(address)
+        slot, position = self._find(key)
+        if slot == EMPTY:
+            self._insert(key, position, tokens, address, is_address)
+            return
+        if not self._live[slot]:
+            self._live[slot] = True
+            self._count += 1
+        self._tokens[slot] = tokens
+
+    def add(self, address, tokens):
+        """Credits tokens to a provider, creating the entry if needed; returns the new balance."""
+        key, is_address = _parse(address)
+        slot, position = self._find(key)
+        if slot == EMPTY:
+            self._insert(key, position, tokens, address, is_address)
+            return tokens
+        if not self._live[slot]:
+            self._live[slot] = True
+            self._tokens[slot] = 0
+            self._count += 1
+        self._tokens[slot] += tokens
+        return int(self._tokens[slot])
+
+    def add_many(self, addresses, tokens, verify=True):
+        """add() for many providers at once, vectorized; addresses may repeat.
+
+        Providers new to the ledger take slots in the order they first appear,
+        as one add() after another would give them. See _parse_many for verify.
+        """
+        unique, first, inverse = np.unique(np.asarray(addresses), return_index=True, return_inverse=True)
+        totals = np.zeros(len(unique), dtype=np.int64)
+        np.add.at(totals, inverse.ravel(), np.asarray(tokens, dtype=np.int64))
+        order = np.argsort(first, kind="stable")
+        unique, ids = _parse_many(unique[order], verify)
+        totals = totals[order]
+
+        slots = self._find_many(unique)
+        known = slots != EMPTY
+        revived = slots[known][~self._live[slots[known]]]
+        self._tokens[revived] = 0
+        self._live[revived] = True
+        self._count += len(revived)
+        self._tokens[slots[known]] += totals[known]  # Keys are unique, so no slot repeats
+
+        new = unique[~known]
+        if len(new):
+            size = self._size
+            while size + len(new) > len(self._tokens):
+                self._grow()
+            self._addresses[size:size + len(new)] = new
+            self._tokens[size:size + len(new)] = totals[~known]
+            self._live[size:size + len(new)] = True
+            self._size = size + len(new)
+            self._count += len(new)
+            if 4 * self._size > 3 * len(self._table):
+                self._rebuild_table(_table_size(self._size))
+            else:
+                self._place(np.arange(size, self._size))
+        self._ids.update(ids)
+
+    def __delitem__(self, address):
+        slot = self._find(_key(address))[0]
+        if slot == EMPTY or not self._live[slot]:
+            raise KeyError(address)
+        self._live[slot] = False  # The slot stays reserved for the address
+        self._tokens[slot] = 0
+        self._count -= 1
+
+    def __iter__(self):
+        ids = self._ids
+        for key in self.arrays()[0].tolist():
+            yield ids[key] if key in ids else _address(key)
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return f"LPTokenLedger({self._count} providers)"
+
+    # -- bulk access ---------------------------------------------------------
+
+    @property
+    def nbytes(self):
+        return self._addresses.nbytes + self._tokens.nbytes + self._live.nbytes + self._table.nbytes
+
+    def arrays(self):
+        """(32-byte keys, int64 balances) of every provider, in slot order; ids() names keys that are not addresses."""
+        live = self._live[:self._size]
+        return self._addresses[:self._size][live], self._tokens[:self._size][live]
+
+    def redeemable(self, algo_reserves, uctzar_reserves, total_liquidity_tokens):
+        """Every provider's (public keys, tokens, ALGO, UCTZAR) redeemable now, in one pass.
+
+        Reserves are integer base units (microAlgos, UCTZAR cents); amounts are
+        rounded down exactly, so the redemptions together never exceed the pool.
+        """
+        addresses, tokens = self.arrays()
+        return (addresses, tokens, _mul_div(tokens, algo_reserves, total_liquidity_tokens),
+                _mul_div(tokens, uctzar_reserves, total_liquidity_tokens))
+
+    def redeemable_one(self, address, algo_reserves, uctzar_reserves, total_liquidity_tokens):
+        """(tokens, ALGO, UCTZAR) in integer base units for one provider."""
+        tokens = self.get(address, 0)
+        if total_liquidity_tokens <= 0:
+            return tokens, 0, 0
+        return (tokens, tokens * algo_reserves // total_liquidity_tokens,
+                tokens * uctzar_reserves // total_liquidity_tokens)
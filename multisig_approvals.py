@@ -0,0 +1,177 @@
+import base64
+import itertools
+import threading
+from concurrent.futures import Future
+
+from algosdk import constants, encoding, error, transaction
+from nacl.exceptions import BadSignatureError
+from nacl.signing import VerifyKey
+
+PENDING = "pending"
+SUBMITTED = "submitted"
+CONFIRMED = "confirmed"
+REJECTED = "rejected"
+FAILED = "failed"
+
+
+def auto_approve_all(request, address):
+    return True
+
+
+def auto_approve_below(limit):
+    """Policy that approves on every member's behalf when the payout is under ``limit`` microAlgos."""
+    def policy(request, address):
+        return True if request.msig_txn.transaction.amt < limit else None
+    return policy
+
+
+class PayoutRequest:
+    """One multisig transaction collecting approvals; ``future`` resolves to its confirmed info."""
+
+    def __init__(self, request_id, msig_txn):
+        self.request_id = request_id
+        self.msig_txn = msig_txn
+        self.approvals = set()
+        self.rejections = set()
+        self.status = PENDING
+        self.txid = None
+        self.future = Future()
+
+    @property
+    def members(self):
+        return [encoding.encode_address(subsig.public_key) for subsig in self.msig_txn.multisig.subsigs]
+
+    @property
+    def threshold(self):
+        return self.msig_txn.multisig.threshold
+
+
+class ApprovalQueue:
+    """Collects multisig approvals asynchronously and in any order.
+
+    Members approve (when the queue's keyring holds their key) or hand in their
+    own partially signed MultisigTransaction. A policy hook may approve on a
+    member's behalf as soon as a request is created. The moment a request has
+    ``threshold`` signatures they are already merged in one MultisigTransaction,
+    which is submitted without waiting for the remaining members.
+
+    ``requests`` holds only pending requests: one is dropped as soon as it is
+    submitted or can no longer be approved, and its PayoutRequest and future
+    carry the outcome from then on. Approvals, signatures and rejections for a
+    request that is no longer pending are ignored and return None.
+    """
+
+    def __init__(self, client, tracker, multisig=None, keyring=None, policy=None, wait_rounds=4):
+        self.client = client
+        self.tracker = tracker
+        self.multisig = multisig
+        self.keyring = keyring
+        self.policy = policy
+        self.wait_rounds = wait_rounds
+        self.requests = {}  # request id -> PayoutRequest, pending ones only
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def request_payout(self, txn, multisig=None, policy=None):
+        """Opens a request for ``txn`` and applies the policy (or the queue's); returns the PayoutRequest."""
+        # Each request signs its own copy, so concurrent payouts never share signatures
+        multisig = (multisig or self.multisig).get_multisig_account()
+        request = PayoutRequest(next(self._ids), transaction.MultisigTransaction(txn, multisig))
+        with self._lock:
+            self.requests[request.request_id] = request
+        policy = policy or self.policy
+        if policy is not None:
+            for address in request.members:
+                if policy(request, address) and self.keyring is not None and address in self.keyring:
+                    self.approve(request.request_id, address)
+        return request
+
+    def _pending_request(self, request_id):
+        with self._lock:
+            return self.requests.get(request_id)
+
+    def approve(self, request_id, address):
+        """Approves on behalf of a member whose key is in the queue's keyring."""
+        request = self._pending_request(request_id)
+        if request is None:
+            return None  # Already submitted or rejected; extra signatures are not needed
+        if address not in request.members:
+            raise error.InvalidSecretKeyError
+        self.keyring.sign_multisig(request.msig_txn, [address])
+        return self._record(request, address)
+
+    def add_signature(self, request_id, partial_msig_txn):
+        """Merges a member's partially signed copy of the request's MultisigTransaction."""
+        request = self._pending_request(request_id)
+        if request is None:
+            return None
+        if partial_msig_txn.get_txid() != request.msig_txn.get_txid():
+            raise error.MergeKeysMismatchError
+        message = constants.txid_prefix + base64.b64decode(encoding.msgpack_encode(request.msig_txn.transaction))
+        ours = {subsig.public_key: subsig for subsig in request.msig_txn.multisig.subsigs}
+        signers = []
+        for subsig in partial_msig_txn.multisig.subsigs:
+            if subsig.signature is None or subsig.public_key not in ours:
+                continue
+            try:
+                VerifyKey(subsig.public_key).verify(message, subsig.signature)
+            except BadSignatureError:
+                raise error.InvalidSecretKeyError from None
+            ours[subsig.public_key].signature = subsig.signature
+            signers.append(encoding.encode_address(subsig.public_key))
+        for address in signers:
+            self._record(request, address)
+        return request
+
+    def reject(self, request_id, address):
+        with self._lock:
+            request = self.requests.get(request_id)
+            if request is None:
+                return None
+            request.rejections.add(address)
+            unreachable = len(request.members) - len(request.rejections) < request.threshold
+            if unreachable:
+                request.status = REJECTED
+                del self.requests[request_id]
+        if unreachable:
+            request.future.set_exception(error.TransactionRejectedError(
+                f"Payout request {request_id} can no longer reach {request.threshold} approvals"))
+        return request
+
+    def pending(self):
+        with self._lock:
+            return list(self.requests.values())
+
+    def pending_count(self):
+        with self._lock:
+            return len(self.requests)
+
+    def _record(self, request, address):
+        with self._lock:
+            request.approvals.add(address)
+            ready = request.status == PENDING and len(request.approvals) >= request.threshold
+            if ready:
+                request.status = SUBMITTED  # Claimed by this caller; nobody else submits it
+                del self.requests[request.request_id]
+        if ready:
+            self._submit(request)
+        return request
+
+    def _submit(self, request):
+        try:
+            request.txid = self.client.send_transaction(request.msig_txn)
+        except Exception as e:
+            request.status = FAILED
+            request.future.set_exception(e)
+            return
+        self.tracker.track(request.txid, callback=lambda f: self._settle(request, f),
+                           wait_rounds=self.wait_rounds)
+
+    @staticmethod
+    def _settle(request, tracked):
+        if tracked.exception() is not None:
+            request.status = FAILED
+            request.future.set_exception(tracked.exception())
+        else:
+            request.status = CONFIRMED
+            request.future.set_result(tracked.result())
@@ -0,0 +1,219 @@
+"""Incremental indexer that rebuilds a LiquidityPool's state from the blocks themselves.
+
+The indexer walks blocks from the last round it processed, picks out payments
+and UCTZAR transfers to or from the pool address, and books them on its own
+LiquidityPool (the local index) with the same record_* accounting the pool
+uses. Within an atomic group, flows are netted per counterparty:
+
+* ALGO and UCTZAR in          -> add liquidity
+* ALGO and UCTZAR out         -> withdrawal of that provider's position
+* one asset in, the other out -> swap
+* anything else               -> a plain deposit or payout, adjusting reserves only
+
+The last processed round and the index are saved to ``state_path`` after every
+batch, so catching up after downtime only fetches the rounds since then.
+"""
+import base64
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from algosdk import encoding, error
+
+from liquiditypool_defi import ALGO_TO_UCTZAR, UCTZAR_TO_ALGO, LiquidityPool
+from lp_ledger import LPTokenLedger
+
+
+def _address(value):
+    """Block transactions carry raw bytes (msgpack) or base32/base64 strings (JSON)."""
+    if not value:
+        return None
+    if isinstance(value, bytes):
+        return encoding.encode_address(value)
+    if len(value) == 58:
+        return value
+    return encoding.encode_address(base64.b64decode(value))
+
+
+class PoolIndexer:
+    def __init__(self, client, pool_address, asset_id, state_path=None, start_round=1,
+                 asset_decimals=2, max_workers=8, batch_rounds=256):
+        self.client = client
+        self.pool_address = pool_address
+        self.asset_id = asset_id
+        self.state_path = state_path
+        self.asset_scale = 10 ** asset_decimals
+        self.max_workers = max_workers
+        self.batch_rounds = batch_rounds
+        self.last_round = start_round - 1
+        self.events_indexed = 0
+        self.index = LiquidityPool(pool_address, None)
+        if state_path and os.path.exists(state_path):
+            self._load()
+
+    # -- state ---------------------------------------------------------------
+
+    def _load(self):
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state["pool_address"] != self.pool_address or state["asset_id"] != self.asset_id:
+            raise ValueError(f"{self.state_path} indexes a different pool")
+        self.last_round = state["last_round"]
+        self.events_indexed = state["events_indexed"]
+        self.index.algo_reserves = state["algo_reserves"]
+        self.index.uctzar_reserves = state["uctzar_reserves"]
+        self.index.total_liquidity_tokens = state["total_liquidity_tokens"]
+        self.index.liquidity_providers = LPTokenLedger(state["liquidity_providers"])
+
+    def save(self):
+        if not self.state_path:
+            return
+        state = {
+            "pool_address": self.pool_address,
+            "asset_id": self.asset_id,
+            "last_round": self.last_round,
+            "events_indexed": self.events_indexed,
+            "algo_reserves": self.index.algo_reserves,
+            "uctzar_reserves": self.index.uctzar_reserves,
+            "total_liquidity_tokens": self.index.total_liquidity_tokens,
+            "liquidity_providers": dict(self.index.liquidity_providers),
+        }
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    # -- scanning ------------------------------------------------------------
+
+    def _fetch_block(self, round_number):
+        return self.client.block_info(round_number)["block"]
+
+    def catch_up(self, until_round=None):
+        """Indexes every round after the last processed one up to ``until_round`` (default: latest).
+
+        Blocks are fetched concurrently but applied strictly in order. Returns the
+        number of rounds processed.
+        """
+        if until_round is None:
+            until_round = self.client.status()["last-round"]
+        processed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while self.last_round < until_round:
+                rounds = range(self.last_round + 1, min(until_round, self.last_round + self.batch_rounds) + 1)
+                for round_number, block in zip(rounds, executor.map(self._fetch_block, rounds)):
+                    self.apply_block(block)
+                    self.last_round = round_number
+                    processed += 1
+                self.save()
+        return processed
+
+    def follow(self, stop=None, backoff=0.5, max_backoff=30.0):
+        """Keeps the index current, waiting for each new block, until ``stop`` (a threading.Event) is set.
+
+        While algod fails, requests are retried after ``backoff`` seconds,
+        doubling up to ``max_backoff``, rather than hammering a node that is down.
+        """
+        delay = backoff
+        while stop is None or not stop.is_set():
+            try:
+                self.catch_up()
+                self.client.status_after_block(self.last_round)
+            except error.AlgodHTTPError as e:
+                print(f"Pool indexer: algod request failed, retrying in {delay:g}s: {e}")
+                if stop is not None:
+                    stop.wait(delay)
+                else:
+                    time.sleep(delay)
+                delay = min(2 * delay, max_backoff)
+                continue
+            delay = backoff
+
+    def apply_block(self, block):
+        group = []
+        for entry in block.get("txns") or []:
+            gid = entry["txn"].get("grp")
+            if group and (gid is None or gid != group[0]["txn"].get("grp")):
+                self._apply_group(group)
+                group = []
+            group.append(entry)
+        if group:
+            self._apply_group(group)
+
+    def _flows(self, group):
+        """{counterparty: [algo_in, algo_out, asset_in, asset_out]} in base units for one group."""
+        flows = {}
+        for entry in group:
+            txn = entry["txn"]
+            kind = txn.get("type")
+            if kind == "pay":
+                legs = [(_address(txn.get("snd")), _address(txn.get("rcv")), txn.get("amt", 0))]
+                if txn.get("close"):
+                    legs.append((_address(txn.get("snd")), _address(txn["close"]), entry.get("ca", 0)))
+                slots = (0, 1)
+            elif kind == "axfer" and txn.get("xaid") == self.asset_id:
+                source = _address(txn.get("asnd")) or _address(txn.get("snd"))
+                legs = [(source, _address(txn.get("arcv")), txn.get("aamt", 0))]
+                if txn.get("aclose"):
+                    legs.append((source, _address(txn["aclose"]), entry.get("aca", 0)))
+                slots = (2, 3)
+            else:
+                continue
+            for sender, receiver, amount in legs:
+                if not amount or sender == receiver:
+                    continue
+                if receiver == self.pool_address:
+                    flows.setdefault(sender, [0, 0, 0, 0])[slots[0]] += amount
+                elif sender == self.pool_address:
+                    flows.setdefault(receiver, [0, 0, 0, 0])[slots[1]] += amount
+        return flows
+
+    def _apply_group(self, group):
+        index = self.index
+        for counterparty, (algo_in, algo_out, asset_in, asset_out) in self._flows(group).items():
+            self.events_indexed += 1
+            algo_net = (algo_in - algo_out) / 1_000_000
+            asset_net = (asset_in - asset_out) / self.asset_scale
+            if algo_net > 0 and asset_net > 0:
+                index.record_add_liquidity(counterparty, algo_net, asset_net)
+            elif algo_net < 0 and asset_net < 0:
+                index.record_withdrawal(counterparty, index.liquidity_providers.get(counterparty, 0),
+                                        -algo_net, -asset_net)
+            elif algo_net > 0 and asset_net < 0:
+                index.record_swap(ALGO_TO_UCTZAR, algo_net, -asset_net)
+            elif asset_net > 0 and algo_net < 0:
+                index.record_swap(UCTZAR_TO_ALGO, asset_net, -algo_net)
+            else:
+                index.algo_reserves += algo_net
+                index.uctzar_reserves += asset_net
+
+    # -- results -------------------------------------------------------------
+
+    def reserves(self):
+        """(ALGO, UCTZAR) reserves as of ``last_round``."""
+        return self.index.algo_reserves, self.index.uctzar_reserves
+
+    def lp_balances(self):
+        return {address: tokens for address, tokens in self.index.liquidity_providers.items() if tokens}
+
+    def reconcile(self, pool):
+        """Overwrites a live pool's state with the index; returns the drift that was corrected.
+
+        A journaled pool gets a fresh snapshot so the corrected state survives restarts.
+        """
+        index = self.index
+        drift = {
+            "algo_reserves": pool.algo_reserves - index.algo_reserves,
+            "uctzar_reserves": pool.uctzar_reserves - index.uctzar_reserves,
+            "total_liquidity_tokens": pool.total_liquidity_tokens - index.total_liquidity_tokens,
+            "providers": sorted(address for address in set(pool.liquidity_providers) | set(index.liquidity_providers)
+                                if pool.liquidity_providers.get(address, 0) != index.liquidity_providers.get(address, 0)),
+        }
+        pool.algo_reserves = index.algo_reserves
+        pool.uctzar_reserves = index.uctzar_reserves
+        pool.total_liquidity_tokens = index.total_liquidity_tokens
+        pool.liquidity_providers = index.liquidity_providers.copy()
+        pool.reserves_changed()
+        if pool.journal is not None:
+            pool.journal.write_snapshot(pool)
+        return drift
@@ -0,0 +1,169 @@
+"""Append-only journal and compact snapshots for LiquidityPool state.
+
+Every booked add, swap and withdrawal is appended to ``journal.bin`` as a
+fixed-size binary record. Every ``snapshot_every`` records the whole pool is
+written to ``snapshot.bin``: a small header followed by the providers' public
+keys and LP token balances as raw arrays, which recovery memory-maps, and then
+the ids of any providers that are not addresses. Recovery loads the latest
+snapshot and applies the journal records written after it in one vectorized
+pass, so it stays fast however far the journal is past the snapshot.
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from lp_ledger import KEY_WIDTH, LPTokenLedger
+
+OP_ADD = 1
+OP_SWAP_ALGO_IN = 2
+OP_SWAP_UCTZAR_IN = 3
+OP_WITHDRAW = 4
+
+ADDRESS_WIDTH = 58  # Length of a base32 Algorand address, as journal records carry it
+
+RECORD = struct.Struct(f"<B{ADDRESS_WIDTH}sddq")  # op, provider, amount a, amount b, liquidity tokens
+RECORD_DTYPE = np.dtype([("op", "u1"), ("provider", f"S{ADDRESS_WIDTH}"), ("a", "<f8"), ("b", "<f8"),
+                         ("tokens", "<i8")])
+SNAPSHOT_MAGIC = b"LPSNAP03"  # 02: providers stored as 32-byte public keys; 03: provider ids
+SNAPSHOT_HEADER = struct.Struct("<8sqddqqq")  # magic, records covered, reserves, total tokens, providers, ids
+
+assert RECORD.size == RECORD_DTYPE.itemsize
+
+
+class PoolJournal:
+    def __init__(self, directory, snapshot_every=100_000, fsync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.journal_path = os.path.join(directory, "journal.bin")
+        self.snapshot_path = os.path.join(directory, "snapshot.bin")
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.pool = None
+        self._file = open(self.journal_path, "ab")
+        # A crash mid-append can leave a partial record at the end; drop it
+        size = self._file.tell()
+        if size % RECORD.size:
+            self._file.truncate(size - size % RECORD.size)
+            self._file.seek(0, os.SEEK_END)
+        self.records = self._file.tell() // RECORD.size
+        self._snapshot_records = self._read_snapshot_header()[1] if os.path.exists(self.snapshot_path) else 0
+
+    def attach(self, pool):
+        """Makes the pool journal every booking from now on."""
+        self.pool = pool
+        pool.journal = self
+        # Records are written ahead of the booking, so snapshot once the pool has applied them
+        pool.add_reserves_listener(self._snapshot_if_due)
+
+    def close(self):
+        self._file.close()
+
+    # -- writing -----------------------------------------------------------
+
+    def _append(self, op, provider, a, b, tokens):
+        self._file.write(RECORD.pack(op, provider.encode() if provider else b"", a, b, tokens))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.records += 1
+
+    def _snapshot_if_due(self, pool):
+        if pool is self.pool and self.records - self._snapshot_records >= self.snapshot_every:
+            self.write_snapshot(pool)
+
+    def append_add(self, provider_address, algo_amount, uctzar_amount, liquidity_tokens):
+        self._append(OP_ADD, provider_address, algo_amount, uctzar_amount, liquidity_tokens)
+
+    def append_swap(self, algo_in, amount_in, amount_out):
+        self._append(OP_SWAP_ALGO_IN if algo_in else OP_SWAP_UCTZAR_IN, None, amount_in, amount_out, 0)
+
+    def append_withdraw(self, provider_address, liquidity_tokens, algo_amount, uctzar_amount):
+        self._append(OP_WITHDRAW, provider_address, algo_amount, uctzar_amount, liquidity_tokens)
+
+    def write_snapshot(self, pool):
+        """Writes the pool's full state atomically, covering every record journaled so far."""
+        addresses, tokens = pool.liquidity_providers.arrays()
+        ids = pool.liquidity_providers.ids()
+        names = [provider_id.encode() for provider_id in ids.values()]
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.records, pool.algo_reserves, pool.uctzar_reserves,
+                                         int(pool.total_liquidity_tokens), len(tokens), len(ids)))
+            f.write(addresses.tobytes())
+            f.write(tokens.astype("<i8").tobytes())
+            f.write(np.array(list(ids), dtype=f"S{KEY_WIDTH}").tobytes())
+            f.write(np.array([len(name) for name in names], dtype="<i4").tobytes())
+            f.write(b"".join(names))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_records = self.records
+
+    # -- recovery ----------------------------------------------------------
+
+    def _read_snapshot_header(self):
+        with open(self.snapshot_path, "rb") as f:
+            header = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+        if header[0] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.snapshot_path} is not a pool snapshot")
+        return header
+
+    def _load_snapshot(self, pool):
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        _, covered, algo_reserves, uctzar_reserves, total_tokens, count, id_count = self._read_snapshot_header()
+        with open(self.snapshot_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = SNAPSHOT_HEADER.size
+                addresses = np.frombuffer(mm, dtype=f"S{KEY_WIDTH}", count=count, offset=offset)
+                offset += addresses.nbytes
+                tokens = np.frombuffer(mm, dtype="<i8", count=count, offset=offset)
+                offset += tokens.nbytes
+                id_keys = np.frombuffer(mm, dtype=f"S{KEY_WIDTH}", count=id_count, offset=offset).tolist()
+                offset += id_count * KEY_WIDTH
+                lengths = np.frombuffer(mm, dtype="<i4", count=id_count, offset=offset).tolist()
+                offset += id_count * 4
+                ids = {}
+                for key, length in zip(id_keys, lengths):
+                    ids[key] = mm[offset:offset + length].decode()
+                    offset += length
+                # Copies out of the map
+                pool.liquidity_providers = LPTokenLedger.from_arrays(addresses, tokens, ids)
+                del addresses, tokens  # Release the buffer views before the map closes
+        pool.algo_reserves = algo_reserves
+        pool.uctzar_reserves = uctzar_reserves
+        pool.total_liquidity_tokens = total_tokens
+        return covered
+
+    def recover(self, pool):
+        """Restores pool state from the latest snapshot plus the journal tail; returns records replayed."""
+        start = self._load_snapshot(pool)
+        tail = np.fromfile(self.journal_path, dtype=RECORD_DTYPE, count=self.records - start,
+                           offset=start * RECORD.size)
+        op, a, b = tail["op"], tail["a"], tail["b"]
+        # Each record's change to the reserves, summed left to right as booking them one by one would
+        algo_delta = np.select([op == OP_ADD, op == OP_SWAP_ALGO_IN, op == OP_SWAP_UCTZAR_IN, op == OP_WITHDRAW],
+                               [a, a, -b, -a], 0.0)
+        uctzar_delta = np.select([op == OP_ADD, op == OP_SWAP_ALGO_IN, op == OP_SWAP_UCTZAR_IN, op == OP_WITHDRAW],
+                                 [b, -b, a, -b], 0.0)
+        pool.algo_reserves = float(np.cumsum(np.concatenate(([pool.algo_reserves], algo_delta)))[-1])
+        pool.uctzar_reserves = float(np.cumsum(np.concatenate(([pool.uctzar_reserves], uctzar_delta)))[-1])
+        booked = (op == OP_ADD) | (op == OP_WITHDRAW)
+        tokens = np.where(op == OP_ADD, tail["tokens"], -tail["tokens"])[booked]
+        pool.total_liquidity_tokens += int(tokens.sum())
+        pool.liquidity_providers.add_many(tail["provider"][booked], tokens, verify=False)  # Checked when booked
+        self._snapshot_records = max(self._snapshot_records, start)
+        pool.reserves_changed()
+        return len(tail)
+
+
+def open_pool(directory, liquidity_pool_address, liquidity_pool_private_key, **journal_options):
+    """Creates a LiquidityPool whose state is recovered from, and journaled to, ``directory``."""
+    from liquiditypool_defi import LiquidityPool
+
+    journal = PoolJournal(directory, **journal_options)
+    pool = LiquidityPool(liquidity_pool_address, liquidity_pool_private_key)
+    journal.recover(pool)
+    journal.attach(pool)
+    return pool
@@ -0,0 +1,193 @@
+"""Constant-product pools over any number of asset pairs, with cached multi-hop routing.
+
+Each pool is a LiquidityPool whose ``algo_reserves`` side holds the pair's first
+asset and ``uctzar_reserves`` side its second. Pools paired with ALGO can trade
+on chain through their own methods; pools between two ASAs are booked with
+record_* only, because those methods send ALGO for the first leg.
+"""
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+from liquiditypool_defi import ALGO_TO_UCTZAR, SWAP_FEE_PERCENTAGE, UCTZAR_TO_ALGO, LiquidityPool, constant_product_output
+
+ALGO = 0  # Asset id standing for ALGO in pair keys and routes
+
+
+def pair_key(asset_a, asset_b):
+    return (asset_a, asset_b) if asset_a < asset_b else (asset_b, asset_a)
+
+
+class Route(NamedTuple):
+    assets: Tuple[int, ...]  # Input asset, intermediate assets, output asset
+    pools: Tuple[Tuple[int, int], ...]  # Pair key of each hop
+    amount_in: float
+    amounts: Tuple[float, ...]  # Amount received after each hop
+
+    @property
+    def amount_out(self):
+        return self.amounts[-1]
+
+
+class PoolRegistry:
+    """Pools keyed by asset pair, and a router that finds the best path for an input amount.
+
+    Routes are searched hop by hop (up to ``max_hops``), keeping the largest
+    amount that reaches each asset, and cached per (input asset, output asset,
+    amount). Hops are priced like the pools' own swaps, at each pool's fee and
+    against its reserves including pending operations. Each cached route
+    remembers which pools its search priced, and is dropped as soon as one of
+    those pools' reserves change or an operation on it is reserved or released;
+    other routes stay cached. Adding or removing a pool clears the whole cache.
+    Pools notify the registry from whichever thread books on them, so the cache
+    is guarded by a lock, held while a route is searched.
+    """
+
+    def __init__(self, fee_percentage=SWAP_FEE_PERCENTAGE, max_hops=3, cache_size=4096):
+        self.fee_percentage = fee_percentage  # For pools made by create_pool; each pool quotes at its own
+        self.max_hops = max_hops
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._pools = {}  # pair key -> (asset on the algo_reserves side, pool)
+        self._neighbours = {}  # asset -> {paired asset: pair key}
+        self._routes = OrderedDict()  # (asset in, asset out, amount, max hops) -> (Route or None, pair keys priced)
+        self._dependents = {}  # pair key -> cache keys of routes that priced that pool
+        self._lock = threading.RLock()
+
+    # -- pools ---------------------------------------------------------------
+
+    def add_pool(self, asset_a, asset_b, pool):
+        """Registers ``pool``, whose algo_reserves hold asset_a and uctzar_reserves asset_b."""
+        key = pair_key(asset_a, asset_b)
+        with self._lock:
+            if asset_a == asset_b or key in self._pools:
+                raise ValueError(f"Cannot add a pool for pair {key}")
+            self._pools[key] = (asset_a, pool)
+            self._neighbours.setdefault(asset_a, {})[asset_b] = key
+            self._neighbours.setdefault(asset_b, {})[asset_a] = key
+            self.clear_cache()  # A new pool can improve any route
+        pool.add_reserves_listener(lambda changed, key=key: self._invalidate(key))
+        return pool
+
+    def create_pool(self, asset_a, asset_b, reserve_a=0.0, reserve_b=0.0,
+                    liquidity_pool_address=None, liquidity_pool_private_key=None):
+        """Creates and registers a pool for a pair, putting ALGO (if present) on the ALGO side."""
+        if asset_b == ALGO:
+            asset_a, asset_b, reserve_a, reserve_b = asset_b, asset_a, reserve_b, reserve_a
+        pool = LiquidityPool(liquidity_pool_address, liquidity_pool_private_key, asset_id=asset_b,
+                             fee_percentage=self.fee_percentage)
+        pool.algo_reserves = reserve_a
+        pool.uctzar_reserves = reserve_b
+        return self.add_pool(asset_a, asset_b, pool)
+
+    def remove_pool(self, asset_a, asset_b):
+        key = pair_key(asset_a, asset_b)
+        with self._lock:
+            side, pool = self._pools.pop(key)
+            other = key[1] if side == key[0] else key[0]
+            del self._neighbours[side][other]
+            del self._neighbours[other][side]
+            self.clear_cache()
+        return pool
+
+    def get(self, asset_a, asset_b):
+        return self._pools[pair_key(asset_a, asset_b)][1]
+
+    def pairs(self):
+        return list(self._pools)
+
+    def __len__(self):
+        return len(self._pools)
+
+    # -- pricing -------------------------------------------------------------
+
+    def _direction(self, key, asset_in):
+        return ALGO_TO_UCTZAR if self._pools[key][0] == asset_in else UCTZAR_TO_ALGO
+
+    def quote_hop(self, key, asset_in, amount_in):
+        """Output of selling ``amount_in`` of asset_in into the pool for ``key``, after its pending operations."""
+        side, pool = self._pools[key]
+        algo_reserves, uctzar_reserves = pool.effective_reserves()
+        if side == asset_in:
+            reserve_in, reserve_out = algo_reserves, uctzar_reserves
+        else:
+            reserve_in, reserve_out = uctzar_reserves, algo_reserves
+        if reserve_in <= 0 or reserve_out <= 0:
+            return 0.0
+        return constant_product_output(amount_in, reserve_in, reserve_out, pool.fee_percentage)[0]
+
+    def best_route(self, asset_in, asset_out, amount_in, max_hops=None):
+        """Returns the Route giving the most ``asset_out`` for ``amount_in``, or None if unreachable."""
+        max_hops = max_hops or self.max_hops
+        cache_key = (asset_in, asset_out, amount_in, max_hops)
+        with self._lock:
+            cached = self._routes.get(cache_key)
+            if cached is not None:
+                self._routes.move_to_end(cache_key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+            route, priced = self._search(asset_in, asset_out, amount_in, max_hops)
+            self._routes[cache_key] = (route, priced)
+            for key in priced:
+                self._dependents.setdefault(key, set()).add(cache_key)
+            if len(self._routes) > self.cache_size:
+                self._evict(next(iter(self._routes)))
+        return route
+
+    def _search(self, asset_in, asset_out, amount_in, max_hops):
+        # asset -> (amount, assets visited, pools used, amount after each hop)
+        best = {asset_in: (amount_in, (asset_in,), (), ())}
+        frontier = dict(best)
+        priced = set()
+        for _ in range(max_hops):
+            reached = {}
+            for asset, (amount, assets, pools, amounts) in frontier.items():
+                if asset == asset_out:
+                    continue
+                for other, key in self._neighbours.get(asset, {}).items():
+                    if other in assets:
+                        continue
+                    priced.add(key)
+                    out = self.quote_hop(key, asset, amount)
+                    if out > 0 and out > reached.get(other, (0.0,))[0] and out > best.get(other, (0.0,))[0]:
+                        reached[other] = (out, assets + (other,), pools + (key,), amounts + (out,))
+            if not reached:
+                break
+            best.update(reached)
+            frontier = reached
+
+        found = best.get(asset_out)
+        if found is None or asset_out == asset_in:
+            return None, priced
+        _, assets, pools, amounts = found
+        return Route(assets, pools, amount_in, amounts), priced
+
+    def record_route(self, route):
+        """Books every hop of a route on its pool (once its swaps are confirmed); returns the output."""
+        for asset_in, key, amount_in, amount_out in zip(route.assets, route.pools,
+                                                        (route.amount_in,) + route.amounts, route.amounts):
+            self._pools[key][1].record_swap(self._direction(key, asset_in), amount_in, amount_out)
+        return route.amount_out
+
+    # -- cache ---------------------------------------------------------------
+
+    def _evict(self, cache_key):
+        _, priced = self._routes.pop(cache_key)
+        for key in priced:
+            dependents = self._dependents.get(key)
+            if dependents is not None:
+                dependents.discard(cache_key)
+
+    def _invalidate(self, key):
+        with self._lock:
+            for cache_key in self._dependents.pop(key, ()):
+                if cache_key in self._routes:
+                    self._evict(cache_key)
+
+    def clear_cache(self):
+        with self._lock:
+            self._routes.clear()
+            self._dependents.clear()
@@ -0,0 +1,277 @@
+"""Offline replay of historical trade and liquidity events through LiquidityPool accounting.
+
+Events are streamed from CSV or Parquet, one row per event, with columns
+
+    timestamp, event, account, algo_amount, uctzar_amount
+
+where ``event`` is ``add`` (both amounts deposited), ``withdraw`` (the
+account's whole position; amounts are ignored) or ``swap`` (the non-zero
+amount is the input, so algo_amount > 0 sells ALGO for UCTZAR). Each event is
+priced against the pool's current reserves at its ``fee_percentage`` and
+booked with record_*, exactly as a confirmed on-chain operation would be, so
+fee levels and liquidity strategies can be backtested without sending
+anything to the network:
+
+    python pool_replay.py trades.csv --fee 0.003 --fee 0.01 --sample-every 1000 --out series.csv
+
+Files are read in batches and the resulting series is produced in fixed-size
+chunks, so memory stays bounded however many events a file holds. Parquet
+input and output need pyarrow.
+"""
+import argparse
+import csv
+import os
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+from liquiditypool_defi import ALGO_TO_UCTZAR, SWAP_FEE_PERCENTAGE, UCTZAR_TO_ALGO, LiquidityPool
+
+EVENT_COLUMNS = ("timestamp", "event", "account", "algo_amount", "uctzar_amount")
+SERIES_COLUMNS = ("timestamp", "events", "algo_reserves", "uctzar_reserves", "price", "lp_token_value",
+                  "fees_algo", "fees_uctzar")
+
+
+class ReplayEvent(NamedTuple):
+    timestamp: object
+    event: str
+    account: str
+    algo_amount: float
+    uctzar_amount: float
+
+
+class SeriesChunk(NamedTuple):
+    """One chunk of the replay time series, one element per sample."""
+    timestamp: np.ndarray
+    events: np.ndarray  # Events replayed up to and including the sample
+    algo_reserves: np.ndarray
+    uctzar_reserves: np.ndarray
+    price: np.ndarray  # UCTZAR per ALGO
+    lp_token_value: np.ndarray  # Value of one liquidity token in UCTZAR at that price
+    fees_algo: np.ndarray  # Cumulative fees kept by the pool
+    fees_uctzar: np.ndarray
+
+    def __len__(self):
+        return len(self.events)
+
+
+# -- reading ------------------------------------------------------------------
+
+def read_csv(path) -> Iterator[ReplayEvent]:
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [header.index(name) for name in EVENT_COLUMNS]
+        t, e, a, x, y = columns
+        for row in reader:
+            yield ReplayEvent(row[t], row[e], row[a], float(row[x] or 0), float(row[y] or 0))
+
+
+def _pyarrow_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet replay files need pyarrow (pip install pyarrow)") from exc
+    return pq
+
+
+def read_parquet(path, batch_rows=65_536) -> Iterator[ReplayEvent]:
+    pq = _pyarrow_parquet()
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=list(EVENT_COLUMNS)):
+        columns = [batch.column(name).to_pylist() for name in EVENT_COLUMNS]
+        for timestamp, event, account, algo_amount, uctzar_amount in zip(*columns):
+            yield ReplayEvent(timestamp, event, account, algo_amount or 0.0, uctzar_amount or 0.0)
+
+
+def read_events(path, batch_rows=65_536) -> Iterator[ReplayEvent]:
+    """Streams events from a .csv or .parquet file."""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        return read_parquet(path, batch_rows)
+    return read_csv(path)
+
+
+# -- replay -------------------------------------------------------------------
+
+class PoolReplay:
+    """Books a stream of events on a pool and samples its state every ``sample_every`` events.
+
+    Swaps the pool could not fill (empty reserves, or an output above the
+    reserves) and withdrawals by accounts without a position are counted in
+    ``rejected`` and otherwise skipped, as the on-chain methods would.
+    """
+
+    def __init__(self, pool, sample_every=1, chunk_rows=65_536):
+        self.pool = pool
+        self.sample_every = sample_every
+        self.chunk_rows = chunk_rows
+        self.events = 0
+        self.swaps = 0
+        self.adds = 0
+        self.withdrawals = 0
+        self.rejected = 0
+        self.fees_algo = 0.0
+        self.fees_uctzar = 0.0
+
+    def apply(self, event):
+        """Books one event; returns False if it was rejected."""
+        pool = self.pool
+        kind = event.event
+        if kind == "swap":
+            if event.algo_amount > 0:
+                direction, amount_in, reserve_out = ALGO_TO_UCTZAR, event.algo_amount, pool.uctzar_reserves
+            else:
+                direction, amount_in, reserve_out = UCTZAR_TO_ALGO, event.uctzar_amount, pool.algo_reserves
+            if amount_in <= 0 or pool.algo_reserves <= 0 or pool.uctzar_reserves <= 0:
+                return False
+            amount_out, fee = pool.quote_swap(direction, amount_in)
+            if amount_out > reserve_out:
+                return False
+            pool.record_swap(direction, amount_in, amount_out)
+            if direction == ALGO_TO_UCTZAR:
+                self.fees_algo += fee
+            else:
+                self.fees_uctzar += fee
+            self.swaps += 1
+        elif kind == "add":
+            pool.record_add_liquidity(event.account, event.algo_amount, event.uctzar_amount)
+            self.adds += 1
+        elif kind == "withdraw":
+            liquidity_tokens, algo_amount, uctzar_amount = pool.calculate_withdrawal(event.account)
+            if not liquidity_tokens:
+                return False
+            pool.record_withdrawal(event.account, liquidity_tokens, algo_amount, uctzar_amount)
+            self.withdrawals += 1
+        else:
+            raise ValueError(f"Unknown event type: {kind}")
+        return True
+
+    def run(self, events: Iterable[ReplayEvent]) -> Iterator[SeriesChunk]:
+        """Replays ``events`` and yields the sampled series in chunks of up to ``chunk_rows`` samples."""
+        rows = self.chunk_rows
+        timestamps = np.empty(rows, dtype=object)
+        values = np.empty((len(SERIES_COLUMNS) - 1, rows), dtype=np.float64)
+        filled = 0
+        pool = self.pool
+        sample_every = self.sample_every
+        for event in events:
+            self.events += 1
+            if not self.apply(event):
+                self.rejected += 1
+            if self.events % sample_every:
+                continue
+            algo, uctzar = pool.algo_reserves, pool.uctzar_reserves
+            price = uctzar / algo if algo > 0 else 0.0
+            tokens = pool.total_liquidity_tokens
+            timestamps[filled] = event.timestamp
+            values[:, filled] = (self.events, algo, uctzar, price,
+                                 (algo * price + uctzar) / tokens if tokens else 0.0,
+                                 self.fees_algo, self.fees_uctzar)
+            filled += 1
+            if filled == rows:
+                yield self._chunk(timestamps, values, filled)
+                filled = 0
+        if filled:
+            yield self._chunk(timestamps, values, filled)
+
+    @staticmethod
+    def _chunk(timestamps, values, filled):
+        events, *columns = values[:, :filled].copy()
+        return SeriesChunk(timestamps[:filled].copy(), events.astype(np.int64), *columns)
+
+    def summary(self):
+        pool = self.pool
+        return {
+            "fee_percentage": pool.fee_percentage,
+            "events": self.events,
+            "swaps": self.swaps,
+            "adds": self.adds,
+            "withdrawals": self.withdrawals,
+            "rejected": self.rejected,
+            "algo_reserves": pool.algo_reserves,
+            "uctzar_reserves": pool.uctzar_reserves,
+            "total_liquidity_tokens": pool.total_liquidity_tokens,
+            "fees_algo": self.fees_algo,
+            "fees_uctzar": self.fees_uctzar,
+        }
+
+
+def replay(path, fee_percentage=SWAP_FEE_PERCENTAGE, sample_every=1, chunk_rows=65_536, pool=None):
+    """Returns (PoolReplay, chunk iterator) for replaying a file; the replay runs as chunks are consumed."""
+    if pool is None:
+        pool = LiquidityPool(None, None, fee_percentage=fee_percentage)
+    runner = PoolReplay(pool, sample_every, chunk_rows)
+    return runner, runner.run(read_events(path))
+
+
+# -- writing ------------------------------------------------------------------
+
+def write_series(chunks: Iterable[SeriesChunk], path):
+    """Writes series chunks to CSV (or Parquet, by extension) as they arrive; returns the rows written."""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        return _write_parquet(chunks, path)
+    written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SERIES_COLUMNS)
+        for chunk in chunks:
+            writer.writerows(zip(*(column.tolist() for column in chunk)))
+            written += len(chunk)
+    return written
+
+
+def _write_parquet(chunks, path):
+    pq = _pyarrow_parquet()
+    import pyarrow as pa
+
+    written = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.table({name: column.tolist() if name == "timestamp" else column
+                              for name, column in zip(SERIES_COLUMNS, chunk)})
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def _series_path(template, fee_percentage, several):
+    if not several:
+        return template
+    root, ext = os.path.splitext(template)
+    return f"{root}_fee{fee_percentage:g}{ext}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay historical pool events offline")
+    parser.add_argument("events", help="CSV or Parquet file of events")
+    parser.add_argument("--fee", type=float, action="append", dest="fees",
+                        help=f"swap fee to backtest; repeat to compare several (default {SWAP_FEE_PERCENTAGE})")
+    parser.add_argument("--sample-every", type=int, default=1, help="events between series samples")
+    parser.add_argument("--chunk-rows", type=int, default=65_536)
+    parser.add_argument("--out", help="series output (.csv or .parquet); one file per fee when several")
+    args = parser.parse_args(argv)
+
+    fees = args.fees or [SWAP_FEE_PERCENTAGE]
+    for fee_percentage in fees:
+        runner, chunks = replay(args.events, fee_percentage, args.sample_every, args.chunk_rows)
+        if args.out:
+            path = _series_path(args.out, fee_percentage, len(fees) > 1)
+            rows = write_series(chunks, path)
+            print(f"Wrote {rows} samples to {path}")
+        else:
+            for _ in chunks:
+                pass
+        summary = runner.summary()
+        print(f"Fee {fee_percentage:g}: {summary['events']} events ({summary['swaps']} swaps, "
+              f"{summary['adds']} adds, {summary['withdrawals']} withdrawals, {summary['rejected']} rejected)")
+        print(f"  Reserves: {summary['algo_reserves']} ALGOs, {summary['uctzar_reserves']} UCTZARs; "
+              f"fees kept: {summary['fees_algo']} ALGOs, {summary['fees_uctzar']} UCTZARs")
+
+
+if __name__ == "__main__":
+    main()
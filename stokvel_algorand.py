@@ -1,17 +1,31 @@
+import argparse
 import json
 import time
 import random
-from typing import List
-from algosdk import account, mnemonic, transaction
-from algosdk.v2client import algod
+from typing import List, NamedTuple
+from algosdk import transaction
 
-# Algod Client Configuration
-algod_address = "https://testnet-api.algonode.cloud"
-algod_token = ""  # No token needed for public nodes like Algonode
-algod_client = algod.AlgodClient(algod_token, algod_address)
+from algo_keyring import Keyring
+from algod_params import SuggestedParamsCache
+from algod_transport import AlgodConfig
+from batch_submit import DEFAULT_SUBMIT_WORKERS, check_batch_mode, submit_batches
+from confirmation_tracker import ConfirmationTracker
+from instrumentation import metrics
+from multisig_approvals import PENDING, ApprovalQueue
+from stokvel_schedule import CONTRIBUTION, EventScheduler, ThirtyDayCalendar
 
+def use_client(new_client):
+    """Points the stokvel at an algod client, or a stand-in such as LocalLedger."""
+    global algod_client, params_cache, tracker
+    algod_client = new_client
+    params_cache = SuggestedParamsCache(algod_client)
+    tracker = ConfirmationTracker(algod_client)
+    tracker.add_round_listener(params_cache.observe_round)
 
-participants = [
+keyring = Keyring()  # Derives each member's key from their mnemonic once
+
+
+DEFAULT_PARTICIPANTS = [
     {
         "mnemonic": "sign upon dolphin canoe peanut fatigue cry ghost trap scene nominee amount pilot tank segment demand require october still tape gospel kidney little absent there",
         "address": "HUYZ7Z2EN4OFYAVFQ5YNMMJTGWFWL4WRV7XKOJRKR2Z5HJTPHEQLQUJV4Y"
@@ -34,24 +48,72 @@ participants = [
     }
 ]
 
-print("Stokvel Participants:")
-for i, participant in enumerate(participants, start=1):
-    print(f"Participant {i}:")
-    print(f"  Address: {participant['address']}")
-    print(f"  Mnemonic: {participant['mnemonic']}")
 
-# Create a multisig account with a 4-of-5 threshold
-msig = transaction.Multisig(1, 4, [p['address'] for p in participants])
-msig_address = msig.address()
-print(f"\nStokvel Multisig Address: {msig_address}")
+class StokvelConfig(NamedTuple):
+    algod: AlgodConfig = AlgodConfig()
+    participants: List[dict] = DEFAULT_PARTICIPANTS
+    threshold: int = 4  # Signatures the multisig needs for a payout
+
+
+# Importing does no I/O: the client and the multisig are built on first use
+config = StokvelConfig(algod=AlgodConfig.from_env())
+_LAZY_CLIENT_STATE = ("algod_client", "params_cache", "tracker")
+_LAZY_MULTISIG_STATE = ("msig", "msig_address")
+_approvals = None  # Created on first payout by approval_queue()
+
+def configure(**changes):
+    """Replaces settings (algod, participants, threshold); dependent state is rebuilt on next use."""
+    global config, _approvals
+    config = config._replace(**changes)
+    dropped = _LAZY_MULTISIG_STATE + (_LAZY_CLIENT_STATE if "algod" in changes else ())
+    for name in dropped:
+        globals().pop(name, None)
+    _approvals = None
+
+def _ensure_client():
+    if "algod_client" not in globals():
+        use_client(config.algod.client())
+
+def _ensure_multisig():
+    global msig, msig_address
+    if "msig" not in globals():
+        msig = transaction.Multisig(1, config.threshold, [p['address'] for p in config.participants])
+        msig_address = msig.address()
+
+def __getattr__(name):
+    # Keeps stokvel_algorand.algod_client, msig, participants etc. working while deferring their creation
+    if name in _LAZY_CLIENT_STATE:
+        _ensure_client()
+        return globals()[name]
+    if name in _LAZY_MULTISIG_STATE:
+        _ensure_multisig()
+        return globals()[name]
+    if name == "participants":
+        return config.participants
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def print_setup(show_mnemonics=False):
+    _ensure_multisig()
+    print("Stokvel Participants:")
+    for i, participant in enumerate(config.participants, start=1):
+        print(f"Participant {i}:")
+        print(f"  Address: {participant['address']}")
+        if show_mnemonics:
+            print(f"  Mnemonic: {participant['mnemonic']}")
+    print(f"\nStokvel Multisig Address: {msig_address}")
 
-def perform_payment_simulation_optimized(time_t: int):
+CONTRIBUTION_AMOUNT = 100_000  # Contribution amount in microAlgos
+PAYOUT_SHARE = 0.6  # Share of the fund paid out each payout day; the rest carries over
+
+def perform_payment_simulation_optimized(time_t: int, batch_mode=None):
     successful_payments = set()
     sum_amount = 0
     count_months = 1
     day = 1
     stop_simulation = False
 
+    _ensure_multisig()
+    participants = config.participants
     participants_addresses = [p['address'] for p in participants]
     participants_mnemonics = {p['address']: p['mnemonic'] for p in participants}  # Dictionary for quick lookup
 
@@ -60,15 +122,15 @@ def perform_payment_simulation_optimized(time_t: int):
         
         if day == time_t:  # Contribution day
             print(f"Day {day} of month {count_months} is contribution day.")
-            sum_amount += process_contributions(participants_mnemonics, msig_address)
+            sum_amount += process_contributions(participants_mnemonics, msig_address, batch_mode)
 
         if day == time_t + 1:  # Payout day
             print(f"Day {day} of month {count_months} is payout day.")
             recipient = select_random_unpaid_participant(participants_addresses, successful_payments)
             if recipient:
-                perform_multisig_payout_optimized(msig_address, recipient, sum_amount * 0.6)
+                perform_multisig_payout_optimized(msig_address, recipient, sum_amount * PAYOUT_SHARE)
                 successful_payments.add(recipient)
-                sum_amount *= 0.4  # Remaining amount after payout
+                sum_amount *= 1 - PAYOUT_SHARE  # Remaining amount after payout
 
         # Reset or end condition logic
         if len(successful_payments) == len(participants):
@@ -77,18 +139,135 @@ def perform_payment_simulation_optimized(time_t: int):
         # Increment and reset logic for months/days
         day, count_months = increment_day(day, count_months)
 
-def process_contributions(participants_mnemonics, msig_address):
-    amount = 100_000  # Contribution amount in microAlgos
+def perform_payment_simulation_fast_forward(time_t: int, calendar=None, cycles=None, batch_mode=None,
+                                            dry_run=False):
+    """Event-driven version of the simulation that jumps straight between contribution and payout days.
+
+    calendar defaults to the original 30-day months (see stokvel_schedule for real
+    month lengths, weekly and fortnightly calendars). With cycles set, the
+    simulation stops after that many full payout cycles instead of prompting;
+    with dry_run, contributions and payouts are only booked, not sent, so
+    multi-year schedules run in milliseconds. Returns the payout history.
+    """
+    calendar = calendar or ThirtyDayCalendar(time_t)
+    scheduler = EventScheduler()
+    scheduler.add_group(calendar)
+
+    successful_payments = set()
+    sum_amount = 0
+    completed_cycles = 0
+    history = []
+
+    _ensure_multisig()
+    participants = config.participants
+    participants_addresses = [p['address'] for p in participants]
+    participants_mnemonics = {p['address']: p['mnemonic'] for p in participants}
+
+    for event in scheduler.events():
+        if event.kind == CONTRIBUTION:
+            if dry_run:
+                sum_amount += CONTRIBUTION_AMOUNT * len(participants_mnemonics)
+            else:
+                print(f"{calendar.describe(event.day)} is contribution day.")
+                sum_amount += process_contributions(participants_mnemonics, msig_address, batch_mode)
+            continue
+
+        recipient = select_random_unpaid_participant(participants_addresses, successful_payments)
+        if recipient:
+            if not dry_run:
+                print(f"{calendar.describe(event.day)} is payout day.")
+                perform_multisig_payout_optimized(msig_address, recipient, sum_amount * PAYOUT_SHARE)
+            history.append((event.day, recipient, sum_amount * PAYOUT_SHARE))
+            successful_payments.add(recipient)
+            sum_amount *= 1 - PAYOUT_SHARE  # Remaining amount after payout
+
+        if len(successful_payments) == len(participants):
+            completed_cycles += 1
+            if cycles is None:
+                if handle_cycle_completion(successful_payments):
+                    break
+            elif completed_cycles >= cycles:
+                break
+            successful_payments.clear()
+    return history
+
+def process_contributions(participants_mnemonics, msig_address, batch_mode=None):
+    amount = CONTRIBUTION_AMOUNT
+    if batch_mode is not None:
+        results = process_contributions_batched(participants_mnemonics, msig_address, amount, batch_mode)
+        confirmed = [r for r in results.values() if r['confirmed-round']]
+        return amount * len(confirmed)
     for address, mnem in participants_mnemonics.items():
         send_transaction(mnem, msig_address, amount, note="Stokvel Contribution")
     return amount * len(participants_mnemonics)
 
+def process_contributions_batched(participants_mnemonics, msig_address, amount=CONTRIBUTION_AMOUNT,
+                                  batch_mode="atomic", wait_rounds=4, max_workers=DEFAULT_SUBMIT_WORKERS):
+    """Builds and signs every member's contribution up front, submits them together and confirms with one wait.
+
+    batch_mode is "atomic" (groups of up to MAX_GROUP_SIZE that succeed or fail together)
+    or "concurrent" (independent submissions); either way up to max_workers are sent in parallel.
+    Returns {address: {'txid', 'confirmed-round', 'error'}} for every member.
+    """
+    check_batch_mode(batch_mode)
+
+    _ensure_client()
+    op = metrics.operation(f"contributions_{batch_mode}")
+    params = params_cache.get()
+    op.lap("params")
+    members = list(participants_mnemonics.items())
+    unsigned = []
+    for address, mnem in members:
+        unsigned.append(transaction.PaymentTxn(
+            sender=keyring.add_mnemonic(mnem),
+            sp=params,
+            receiver=msig_address,
+            amt=amount,
+            note="Stokvel Contribution".encode('utf-8'),
+        ))
+    op.lap("build")
+
+    submitted = submit_batches(algod_client, tracker, keyring, unsigned, batch_mode=batch_mode,
+                               wait_rounds=wait_rounds, max_workers=max_workers, op=op)
+    op.done()
+    results = {address: result for (address, _), result in zip(members, submitted)}
+
+    for address, result in results.items():
+        if result['confirmed-round']:
+            print(f"Contribution from {address} confirmed in round {result['confirmed-round']} (txID: {result['txid']})")
+        else:
+            print(f"Contribution from {address} failed: {result['error']}")
+    return results
+
+def wait_for_confirmations(txids, wait_rounds=4):
+    """Waits once for a set of transactions, checking all still-pending txids each round."""
+    _ensure_client()
+    return tracker.wait_all(txids, wait_rounds)
+
 def select_random_unpaid_participant(participants_addresses, successful_payments):
     unpaid = [addr for addr in participants_addresses if addr not in successful_payments]
     return random.choice(unpaid) if unpaid else None
 
-def perform_multisig_payout_optimized(sender, receiver, amount):
-    params = algod_client.suggested_params()
+def approval_queue():
+    """The stokvel's payout approval queue, bound to the current client."""
+    global _approvals
+    _ensure_client()
+    _ensure_multisig()
+    if _approvals is None or _approvals.client is not algod_client:
+        _approvals = ApprovalQueue(algod_client, tracker, msig, keyring)
+    return _approvals
+
+def request_multisig_payout(sender, receiver, amount, policy=None):
+    """Opens a payout for approval without blocking.
+
+    Members approve through approval_queue() in any order; the payout is submitted
+    as soon as the 4-of-5 threshold is met. Returns a PayoutRequest whose future
+    resolves once the payout is confirmed.
+    """
+    _ensure_client()
+    for participant in config.participants:
+        keyring.add_mnemonic(participant['mnemonic'])
+    params = params_cache.get()
     payout_txn = transaction.PaymentTxn(
         sender=sender,
         sp=params,
@@ -96,28 +275,47 @@ def perform_multisig_payout_optimized(sender, receiver, amount):
         amt=int(amount),  # Convert to integer if necessary
         note="Stokvel Payout".encode('utf-8'),
     )
-    msig_payment_txn = transaction.MultisigTransaction(payout_txn, msig)
-    signed_participants = 0
-    for participant in participants:
-        if input(f"Participant {participant['address']}, do you want to sign this transaction [y/n]") == 'y':
-            signed_participants+=1
-    
-    if signed_participants>= 4:
-        for participant in participants:
-            private_key = mnemonic.to_private_key(participant['mnemonic'])
-            msig_payment_txn.sign(private_key)
+    return approval_queue().request_payout(payout_txn, policy=policy)
 
+def perform_multisig_payout_optimized(sender, receiver, amount, policy=None):
+    op = metrics.operation("multisig_payout")
     try:
-        txid = algod_client.send_transaction(msig_payment_txn)
-        print(f"Payout transaction submitted with txID: {txid}")
-        confirmed_txn = transaction.wait_for_confirmation(algod_client, txid, 4)
+        request = request_multisig_payout(sender, receiver, amount, policy)
+        op.lap("request")
+        approvals = approval_queue()
+        for participant in config.participants:
+            if request.status != PENDING:
+                break  # Threshold reached (or no longer reachable); stop prompting
+            if participant['address'] in request.approvals:
+                continue  # Already approved by the policy
+            if input(f"Participant {participant['address']}, do you want to sign this transaction [y/n]") == 'y':
+                approvals.approve(request.request_id, participant['address'])
+            else:
+                approvals.reject(request.request_id, participant['address'])
+        op.lap("approve")
+    except Exception:
+        op.failed()
+        raise
+
+    try:
+        if request.txid is not None:
+            print(f"Payout reached {request.threshold} approvals; submitted with txID: {request.txid}")
+        confirmed_txn = request.future.result()
+        op.lap("confirm")
+        op.done()
         print(f"Payout transaction confirmed in round {confirmed_txn['confirmed-round']}")
     except Exception as e:
+        op.failed()
         print(f"Error submitting payout transaction: {e}")
 
-def handle_cycle_completion(successful_payments):
-    for participant in participants:
-        if input("Do you want to continue? (y/n): ").lower() == 'n':
+def handle_cycle_completion(successful_payments, vote=None):
+    """Asks every participant whether to continue; vote(participant) -> bool replaces the prompt."""
+    for participant in config.participants:
+        if vote is not None:
+            keep_going = vote(participant)
+        else:
+            keep_going = input("Do you want to continue? (y/n): ").lower() != 'n'
+        if not keep_going:
             return True  # Stop simulation
     successful_payments.clear()
     return False
@@ -132,9 +330,11 @@ def increment_day(day, count_months):
     return day, count_months
 
 def send_transaction(mnemonic_phrase, receiver_address, amount, note=""):
-    private_key = mnemonic.to_private_key(mnemonic_phrase)
-    sender_address = account.address_from_private_key(private_key)
-    params = algod_client.suggested_params()
+    _ensure_client()
+    op = metrics.operation("stokvel_transfer")
+    sender_address = keyring.add_mnemonic(mnemonic_phrase)
+    params = params_cache.get()
+    op.lap("params")
     unsigned_txn = transaction.PaymentTxn(
         sender=sender_address,
         sp=params,
@@ -142,14 +342,40 @@ def send_transaction(mnemonic_phrase, receiver_address, amount, note=""):
         amt=amount,
         note=note.encode('utf-8'),
     )
-    signed_txn = unsigned_txn.sign(private_key)
+    signed_txn = keyring.sign(unsigned_txn)
+    op.lap("sign")
     txid = algod_client.send_transaction(signed_txn)
+    op.lap("submit")
     print(f"Transaction submitted with txID: {txid}")
     try:
-        confirmed_txn = transaction.wait_for_confirmation(algod_client, txid, 4)
+        confirmed_txn = tracker.wait(txid, 4)
+        op.lap("confirm")
+        op.done()
         print(f"Transaction confirmed in round {confirmed_txn['confirmed-round']}")
     except Exception as e:
+        op.failed()
         print(f"Error during transaction confirmation: {e}")
 
+def main(argv=None):
+    """Runs the interactive stokvel simulation against algod."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--algod-address", default=config.algod.algod_address)
+    parser.add_argument("--algod-token", default=config.algod.algod_token)
+    parser.add_argument("--contribution-day", type=int, default=15,
+                        help="day of the month members contribute; the payout is the day after")
+    parser.add_argument("--batch-mode", choices=("atomic", "concurrent"),
+                        help="submit contributions in batches instead of one by one")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="jump between contribution and payout days instead of walking every day")
+    parser.add_argument("--show-mnemonics", action="store_true")
+    args = parser.parse_args(argv)
+
+    configure(algod=AlgodConfig(args.algod_address, args.algod_token))
+    print_setup(args.show_mnemonics)
+    if args.fast_forward:
+        perform_payment_simulation_fast_forward(args.contribution_day, batch_mode=args.batch_mode)
+    else:
+        perform_payment_simulation_optimized(args.contribution_day, batch_mode=args.batch_mode)
+
 if __name__ == "__main__":
-    perform_payment_simulation_optimized(time_t=15)
+    main()
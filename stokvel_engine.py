@@ -0,0 +1,276 @@
+"""Asyncio engine that runs many independent stokvel groups from one process.
+
+Each StokvelGroup has its own members, multisig account, calendar and payout
+rules. The engine drives all of them off one EventScheduler, one algod client
+(and so one connection pool), one confirmation tracker and one approval queue:
+
+    engine = StokvelEngine()
+    for name, members in groups.items():
+        engine.add_group(StokvelGroup(name, members, weekly_calendar(), cycles=1))
+    asyncio.run(engine.run())
+
+Events are taken from the scheduler in time order, but a group's events only
+wait for that group's previous event, so a slow confirmation or a payout
+waiting for approvals holds up its own group and nobody else's. At most
+``max_concurrency`` blocking algod calls run at once, on the engine's own
+thread pool, and at most that many events are in flight. Payouts go through
+the approval queue: with the default policy every member's key in the engine's
+keyring approves at once; pass another policy and approve through
+``engine.approvals`` to collect signatures as they come in.
+
+    python stokvel_engine.py --groups 1000 --members 5 --cycles 1
+
+runs an offline demo on LocalLedger.
+"""
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from algosdk import transaction
+
+import stokvel_algorand
+from algo_keyring import Keyring
+from algod_params import SuggestedParamsCache
+from batch_submit import check_batch_mode, group_batches
+from confirmation_tracker import ConfirmationTracker
+from instrumentation import metrics
+from multisig_approvals import ApprovalQueue, auto_approve_all
+from stokvel_algorand import CONTRIBUTION_AMOUNT, PAYOUT_SHARE
+from stokvel_schedule import CONTRIBUTION, EventScheduler, ThirtyDayCalendar
+
+
+class StokvelGroup:
+    """One savings group: members ({'address', 'mnemonic'} dicts), its multisig and its payout state."""
+
+    def __init__(self, name, members: List[dict], calendar=None, threshold=None, contribution=CONTRIBUTION_AMOUNT,
+                 payout_share=PAYOUT_SHARE, cycles=1, policy=None, seed=None):
+        self.name = name
+        self.members = members
+        self.calendar = calendar or ThirtyDayCalendar(15)
+        self.threshold = threshold or max(1, len(members) - 1)
+        self.contribution = contribution
+        self.payout_share = payout_share
+        self.cycles = cycles  # Full payout cycles to run; None runs until the group is removed
+        self.policy = policy  # Approval policy for this group's payouts; the engine's if None
+        self.multisig = transaction.Multisig(1, self.threshold, [member['address'] for member in members])
+        self.address = self.multisig.address()
+        self.fund = 0  # microAlgos collected and not yet paid out
+        self.paid = set()
+        self.completed_cycles = 0
+        self.history = []  # (day, recipient, amount, confirmed round)
+        self.failures = []  # (day, kind, error)
+        self.done = False
+        self._rng = random.Random(seed)
+        self._last_event = None  # Task of the group's most recent event
+
+    def choose_recipient(self):
+        unpaid = [member['address'] for member in self.members if member['address'] not in self.paid]
+        return self._rng.choice(unpaid) if unpaid else None
+
+    def __repr__(self):
+        return f"StokvelGroup({self.name!r}, {len(self.members)} members, {self.completed_cycles} cycles done)"
+
+
+class StokvelEngine:
+    def __init__(self, client=None, max_concurrency=32, batch_mode="atomic", wait_rounds=4, policy=auto_approve_all,
+                 max_failures=3):
+        check_batch_mode(batch_mode)
+        # Read at use time, so stokvel_algorand.configure() after import is honoured
+        self.client = client if client is not None else stokvel_algorand.config.algod.client()
+        self.max_concurrency = max_concurrency
+        self.batch_mode = batch_mode
+        self.wait_rounds = wait_rounds
+        self.max_failures = max_failures  # A group whose events fail this many times is stopped
+        self.keyring = Keyring()
+        self.params_cache = SuggestedParamsCache(self.client)
+        self.tracker = ConfirmationTracker(self.client)
+        self.tracker.add_round_listener(self.params_cache.observe_round)
+        self.approvals = ApprovalQueue(self.client, self.tracker, keyring=self.keyring, policy=policy,
+                                       wait_rounds=wait_rounds)
+        self.scheduler = EventScheduler()
+        self.groups = {}
+        self.events_run = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._slots = None  # asyncio.Semaphore, created inside the running loop
+
+    # -- groups --------------------------------------------------------------
+
+    def add_group(self, group, first_period=0):
+        if group.name in self.groups:
+            raise ValueError(f"Stokvel group {group.name!r} already exists")
+        for member in group.members:
+            self.keyring.add_mnemonic(member['mnemonic'])
+        self.groups[group.name] = group
+        self.scheduler.add_group(group.calendar, group.name, first_period)
+        return group
+
+    def remove_group(self, name):
+        group = self.groups.pop(name)
+        group.done = True
+        self.scheduler.remove_group(name)
+        return group
+
+    # -- running -------------------------------------------------------------
+
+    async def _call(self, fn, *args):
+        """Runs a blocking algod call on the engine's pool, within the concurrency limit."""
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def run(self, until_day=None):
+        """Runs every group's events in time order until all groups finish (or until_day)."""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        in_flight = set()
+        for event in self.scheduler.events(until_day):
+            group = self.groups.get(event.group)
+            if group is None or group.done:
+                continue
+            while len(in_flight) >= self.max_concurrency:
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            task = asyncio.create_task(self._run_event(group, event, group._last_event))
+            group._last_event = task
+            in_flight.add(task)
+            await asyncio.sleep(0)  # Let started events make progress while the queue is drained
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def _run_event(self, group, event, previous):
+        if previous is not None:
+            await previous  # A group's events run one after another, in schedule order
+        if group.done:
+            return
+        try:
+            if event.kind == CONTRIBUTION:
+                await self._contribute(group, event)
+            else:
+                await self._payout(group, event)
+        except Exception as e:
+            group.failures.append((event.day, event.kind, str(e)))
+        self.events_run += 1
+        if len(group.failures) >= self.max_failures and not group.done:
+            self.remove_group(group.name)
+
+    def _signed_contributions(self, group, period):
+        """Builds and signs every member's contribution, batched for submission."""
+        params = self.params_cache.get()
+        note = f"Stokvel Contribution {period}".encode("utf-8")
+        txns = [transaction.PaymentTxn(sender=member['address'], sp=params, receiver=group.address,
+                                       amt=group.contribution, note=note) for member in group.members]
+        return [self.keyring.sign_many(batch) for batch in group_batches(txns, self.batch_mode)]
+
+    async def _contribute(self, group, event):
+        op = metrics.operation(f"engine_contributions_{self.batch_mode}")
+        # Building and signing is CPU work; keep it off the event loop
+        signed = await self._call(self._signed_contributions, group, event.period)
+        op.lap("sign")
+
+        async def submit(batch):
+            try:
+                await self._call(self.client.send_transactions, batch)
+            except Exception as e:
+                group.failures.append((event.day, CONTRIBUTION, str(e)))
+                return []
+            return [asyncio.wrap_future(self.tracker.track(stxn.get_txid(), wait_rounds=self.wait_rounds))
+                    for stxn in batch]
+
+        tracked = [future for futures in await asyncio.gather(*(submit(batch) for batch in signed))
+                   for future in futures]
+        op.lap("submit")
+        results = await asyncio.gather(*tracked, return_exceptions=True)
+        op.lap("confirm")
+        op.done()
+        confirmed = sum(1 for result in results if not isinstance(result, BaseException))
+        if confirmed < len(results):
+            group.failures.append((event.day, CONTRIBUTION, f"{len(results) - confirmed} contributions not confirmed"))
+        group.fund += group.contribution * confirmed
+
+    async def _payout(self, group, event):
+        recipient = group.choose_recipient()
+        if recipient is None:
+            return
+        op = metrics.operation("engine_payout")
+        amount = int(group.fund * group.payout_share)
+        # With an approving policy the request is signed and submitted right away
+        request = await self._call(self._request_payout, group, recipient, amount, event.period)
+        op.lap("request")
+        info = await asyncio.wrap_future(request.future)
+        op.lap("confirm")
+        op.done()
+
+        group.fund -= amount
+        group.paid.add(recipient)
+        group.history.append((event.day, recipient, amount, info.get('confirmed-round')))
+        if len(group.paid) == len(group.members):
+            group.completed_cycles += 1
+            group.paid.clear()
+            if group.cycles is not None and group.completed_cycles >= group.cycles:
+                self.remove_group(group.name)
+
+    def _request_payout(self, group, recipient, amount, period):
+        txn = transaction.PaymentTxn(sender=group.address, sp=self.params_cache.get(), receiver=recipient,
+                                     amt=amount, note=f"Stokvel Payout {period}".encode("utf-8"))
+        return self.approvals.request_payout(txn, group.multisig, group.policy)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "active_groups": len(self.groups),
+            "events_run": self.events_run,
+            "scheduled": len(self.scheduler),
+            "payouts_pending_approval": self.approvals.pending_count(),
+        }
+
+
+def main(argv=None):
+    """Runs many stokvel groups concurrently on an offline LocalLedger."""
+    from algosdk import account, mnemonic
+
+    from local_ledger import LocalLedger
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--members", type=int, default=5)
+    parser.add_argument("--cycles", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--batch-mode", choices=("atomic", "concurrent"), default="atomic")
+    parser.add_argument("--block-interval", type=float, default=0.0, help="seconds per LocalLedger round")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    ledger = LocalLedger(block_interval=args.block_interval)
+    engine = StokvelEngine(ledger, max_concurrency=args.max_concurrency, batch_mode=args.batch_mode)
+    rng = random.Random(args.seed)
+    groups = []
+    for g in range(args.groups):
+        members = []
+        for _ in range(args.members):
+            private_key, address = account.generate_account()
+            ledger.fund(address, 10_000_000)
+            members.append({'address': address, 'mnemonic': mnemonic.from_private_key(private_key)})
+        group = StokvelGroup(f"group-{g}", members, ThirtyDayCalendar(rng.randint(1, 28)),
+                             cycles=args.cycles, seed=rng.random())
+        ledger.fund(group.address, 1_000_000)  # Minimum balance plus payout fees
+        groups.append(engine.add_group(group))
+
+    start = time.perf_counter()
+    asyncio.run(engine.run())
+    elapsed = time.perf_counter() - start
+    engine.close()
+
+    payouts = sum(len(group.history) for group in groups)
+    failed = [group for group in groups if group.failures]
+    print(f"Ran {engine.events_run} events for {len(groups)} groups in {elapsed:.2f}s "
+          f"({payouts} payouts, {ledger.transactions_applied} transactions).")
+    for group in failed[:10]:
+        print(f"  {group.name}: {group.failures[0]}")
+    if len(failed) > 10:
+        print(f"  ... and {len(failed) - 10} more groups with failures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Offline Monte Carlo simulation of stokvel payout order and fund dynamics.
+
+Applies the same rules as stokvel_algorand (fixed contribution per member per
+period, PAYOUT_SHARE of the fund paid to a random not-yet-paid member, the rest
+carried over) to many independent stokvels at once with NumPy, so group rules
+can be studied before going on chain:
+
+    python stokvel_montecarlo.py --members 5 --cycles 2 --simulations 200000
+"""
+import argparse
+from typing import NamedTuple
+
+import numpy as np
+
+from stokvel_algorand import CONTRIBUTION_AMOUNT, PAYOUT_SHARE
+
+
+class MonteCarloResult(NamedTuple):
+    recipients: np.ndarray  # (simulations, periods) member index paid in each period
+    payouts: np.ndarray  # (simulations, periods) amount paid in each period
+    fund: np.ndarray  # (simulations, periods + 1) fund carried over after each period
+    member_payouts: np.ndarray  # (simulations, members) total received by each member
+    member_contributions: np.ndarray  # (simulations, members) total paid in by each member
+
+
+def simulate_stokvel(members=5, cycles=1, simulations=100_000, contribution=CONTRIBUTION_AMOUNT,
+                     payout_share=PAYOUT_SHARE, contribution_probability=1.0, initial_fund=0.0, seed=None):
+    """Simulates many stokvels side by side; each cycle pays every member exactly once.
+
+    contribution_probability below 1 makes each member miss a given period's
+    contribution at random, which is what makes the fund trajectory stochastic.
+    """
+    rng = np.random.default_rng(seed)
+    periods = cycles * members
+
+    # A random permutation per cycle is the same as repeated random draws among unpaid members
+    recipients = rng.random((simulations, cycles, members)).argsort(axis=-1).astype(np.int32)
+    recipients = recipients.reshape(simulations, periods)
+
+    if contribution_probability < 1.0:
+        paid_in = rng.random((simulations, periods, members)) < contribution_probability
+        inflow = paid_in.sum(axis=2) * float(contribution)
+        member_contributions = paid_in.sum(axis=1) * float(contribution)
+    else:
+        inflow = np.full((simulations, periods), float(contribution) * members)
+        member_contributions = np.full((simulations, members), float(contribution) * periods)
+
+    fund = np.empty((simulations, periods + 1))
+    fund[:, 0] = initial_fund
+    payouts = np.empty((simulations, periods))
+    for period in range(periods):
+        pot = fund[:, period] + inflow[:, period]
+        payouts[:, period] = pot * payout_share
+        fund[:, period + 1] = pot - payouts[:, period]
+
+    # Scatter each period's payout to its recipient in one pass
+    slots = recipients + (np.arange(simulations) * members)[:, None]
+    member_payouts = np.bincount(slots.ravel(), weights=payouts.ravel(),
+                                 minlength=simulations * members).reshape(simulations, members)
+    return MonteCarloResult(recipients, payouts, fund, member_payouts, member_contributions)
+
+
+def summarize(result, percentiles=(5, 50, 95)):
+    """Per-member and per-payout-position statistics of a simulation result."""
+    simulations, members = result.member_payouts.shape
+    net = result.member_payouts - result.member_contributions
+    by_position = result.payouts.reshape(simulations, -1, members)
+    return {
+        "member_payout_mean": result.member_payouts.mean(axis=0),
+        "member_payout_std": result.member_payouts.std(axis=0),
+        "member_net_percentiles": {p: np.percentile(net, p, axis=0) for p in percentiles},
+        "position_payout_mean": by_position.mean(axis=(0, 1)),
+        "fund_mean": result.fund.mean(axis=0),
+        "fund_percentiles": {p: np.percentile(result.fund, p, axis=0) for p in percentiles},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of stokvel payouts")
+    parser.add_argument("--members", type=int, default=5)
+    parser.add_argument("--cycles", type=int, default=1)
+    parser.add_argument("--simulations", type=int, default=100_000)
+    parser.add_argument("--payout-share", type=float, default=PAYOUT_SHARE)
+    parser.add_argument("--contribution-probability", type=float, default=1.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    result = simulate_stokvel(args.members, args.cycles, args.simulations,
+                              payout_share=args.payout_share,
+                              contribution_probability=args.contribution_probability, seed=args.seed)
+    summary = summarize(result)
+    print("Expected payout by position in the payout order (microAlgos):")
+    for position, amount in enumerate(summary["position_payout_mean"], start=1):
+        print(f"  Position {position}: {amount:,.0f}")
+    print("Net result per member (payouts - contributions), 5th/50th/95th percentile:")
+    for member in range(args.members):
+        p5, p50, p95 = (summary["member_net_percentiles"][p][member] for p in (5, 50, 95))
+        print(f"  Member {member + 1}: {p5:,.0f} / {p50:,.0f} / {p95:,.0f}")
+    print(f"Fund left after the last period: {summary['fund_mean'][-1]:,.0f} on average")
+
+
+if __name__ == "__main__":
+    main()
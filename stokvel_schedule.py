@@ -0,0 +1,121 @@
+import calendar
+import datetime
+import heapq
+import itertools
+from typing import Any, NamedTuple
+
+CONTRIBUTION = "contribution"
+PAYOUT = "payout"
+
+
+class StokvelEvent(NamedTuple):
+    day: int  # Day ordinal on the calendar's timeline
+    kind: str  # CONTRIBUTION or PAYOUT
+    period: int  # Index of the contribution period the event belongs to
+    group: Any = None  # Lets one scheduler drive several stokvels
+
+
+class ThirtyDayCalendar:
+    """The original simulation calendar: 30-day months, 12 months a year."""
+
+    def __init__(self, time_t):
+        self.time_t = time_t
+
+    def contribution_day(self, period):
+        return period * 30 + self.time_t
+
+    def describe(self, day):
+        month = (day - 1) // 30 % 12 + 1
+        return f"day {(day - 1) % 30 + 1} of month {month}"
+
+
+class MonthlyCalendar:
+    """Real month lengths; contributions on day ``time_t`` of each month (clamped to month end)."""
+
+    def __init__(self, time_t, start=None):
+        self.time_t = time_t
+        self.start = start or datetime.date.today().replace(day=1)
+
+    def contribution_day(self, period):
+        month_index = self.start.month - 1 + period
+        year, month = self.start.year + month_index // 12, month_index % 12 + 1
+        day = min(self.time_t, calendar.monthrange(year, month)[1])
+        return datetime.date(year, month, day).toordinal()
+
+    def describe(self, day):
+        return datetime.date.fromordinal(day).isoformat()
+
+
+class IntervalCalendar:
+    """Fixed-length periods, e.g. weekly (7) or fortnightly (14) stokvels.
+
+    ``time_t`` is the day within the period (1-based) on which members contribute.
+    """
+
+    def __init__(self, period_days, time_t=1, start=None):
+        self.period_days = period_days
+        self.time_t = time_t
+        self.start = start or datetime.date.today()
+
+    def contribution_day(self, period):
+        return self.start.toordinal() + period * self.period_days + self.time_t - 1
+
+    def describe(self, day):
+        return datetime.date.fromordinal(day).isoformat()
+
+
+def weekly_calendar(time_t=1, start=None):
+    return IntervalCalendar(7, time_t, start)
+
+
+def fortnightly_calendar(time_t=1, start=None):
+    return IntervalCalendar(14, time_t, start)
+
+
+class EventScheduler:
+    """Priority queue of stokvel events that jumps straight from one event to the next.
+
+    Each registered group contributes on its calendar's contribution days and is
+    paid out the day after; a group's next period is only scheduled once its
+    current contribution is popped, so the queue stays as small as the number
+    of groups regardless of how far ahead the simulation runs.
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._sequence = itertools.count()  # Breaks ties in insertion order
+        self._calendars = {}
+
+    def add_group(self, calendar, group=None, first_period=0):
+        self._calendars[group] = calendar
+        self._push(StokvelEvent(calendar.contribution_day(first_period), CONTRIBUTION, first_period, group))
+
+    def remove_group(self, group=None):
+        """Stops scheduling new periods for a group; already queued events are dropped."""
+        self._calendars.pop(group, None)
+        self._queue = [item for item in self._queue if item[2].group != group]
+        heapq.heapify(self._queue)
+
+    def _push(self, event):
+        heapq.heappush(self._queue, (event.day, next(self._sequence), event))
+
+    def __len__(self):
+        return len(self._queue)
+
+    def peek_day(self):
+        return self._queue[0][0] if self._queue else None
+
+    def pop(self):
+        """Returns the next event in time order and schedules whatever follows it."""
+        _, _, event = heapq.heappop(self._queue)
+        if event.kind == CONTRIBUTION:
+            calendar = self._calendars[event.group]
+            self._push(StokvelEvent(event.day + 1, PAYOUT, event.period, event.group))
+            next_period = event.period + 1
+            self._push(StokvelEvent(calendar.contribution_day(next_period), CONTRIBUTION, next_period, event.group))
+        return event
+
+    def events(self, until_day=None):
+        """Yields events in order, stopping before ``until_day`` if given."""
+        while self._queue and (until_day is None or self._queue[0][0] < until_day):
+            yield self.pop()
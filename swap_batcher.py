@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import Future
+
+
+class SwapBatcher:
+    """Collects swap orders over a short window and settles them as one netted batch.
+
+    The first order of a batch starts a timer; when it fires (or ``max_orders``
+    orders are waiting) every collected order is settled together through
+    ``LiquidityPool.execute_swap_batch``. Batches settle one at a time, so each
+    clears against the reserves left by the previous one.
+    """
+
+    def __init__(self, pool, window=0.5, max_orders=64):
+        self.pool = pool
+        self.window = window
+        self.max_orders = max_orders
+        self.batches_settled = 0
+        self._orders = []
+        self._futures = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self._settle_lock = threading.Lock()
+
+    def submit(self, trader_private_key, trader_address, direction, amount):
+        """Queues an order; the returned Future resolves to its fill (see execute_swap_batch)."""
+        future = Future()
+        with self._lock:
+            self._orders.append((trader_private_key, trader_address, direction, amount))
+            self._futures.append(future)
+            full = len(self._orders) >= self.max_orders
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return future
+
+    def flush(self):
+        """Settles every queued order now."""
+        with self._lock:
+            orders, futures = self._orders, self._futures
+            self._orders, self._futures = [], []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not orders:
+            return
+        with self._settle_lock:
+            try:
+                results = self.pool.execute_swap_batch(orders)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                return
+            self.batches_settled += 1
+        for future, result in zip(futures, results):
+            if result['error'] is None:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result['error']))
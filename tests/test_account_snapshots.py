@@ -0,0 +1,94 @@
+import threading
+
+from algosdk import account, transaction
+
+from account_snapshots import AccountSnapshotCache
+from local_ledger import LocalLedger
+
+
+class CountingLedger(LocalLedger):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.fetched = []
+        self.status_calls = 0
+        self._fetched_lock = threading.Lock()
+
+    def account_info(self, address, **kwargs):
+        with self._fetched_lock:
+            self.fetched.append(address)
+        return super().account_info(address, **kwargs)
+
+    def status(self, **kwargs):
+        self.status_calls += 1
+        return super().status(**kwargs)
+
+
+def funded_accounts(ledger, count):
+    addresses = [account.generate_account()[1] for _ in range(count)]
+    for i, address in enumerate(addresses):
+        ledger.fund(address, 1_000_000 + i)
+    return addresses
+
+
+def test_repeated_checks_within_a_round_are_free():
+    ledger = CountingLedger()
+    addresses = funded_accounts(ledger, 50)
+    cache = AccountSnapshotCache(ledger, max_workers=8, status_ttl=60)
+    balances = cache.algo_balances(addresses + addresses[:5])
+    assert balances == {address: 1_000_000 + i for i, address in enumerate(addresses)}
+    assert sorted(ledger.fetched) == sorted(addresses)
+
+    for _ in range(3):
+        assert cache.algo_balances(addresses) == balances
+    assert len(ledger.fetched) == 50 and ledger.status_calls == 1
+    assert (cache.hits, cache.misses) == (150, 50)
+
+
+def test_a_new_round_refetches():
+    ledger = CountingLedger()
+    addresses = funded_accounts(ledger, 3)
+    cache = AccountSnapshotCache(ledger, status_ttl=60)
+    cache.snapshot(addresses)
+    ledger.fund(addresses[0], 5)
+    ledger.advance()
+    assert cache.get(addresses[0]).amount == 1_000_000  # status() is not asked again within status_ttl
+
+    cache.observe_round(ledger.status()["last-round"])  # e.g. from the confirmation tracker
+    assert cache.get(addresses[0]).amount == 1_000_005
+    assert len(ledger.fetched) == 4
+
+    expired = AccountSnapshotCache(ledger, status_ttl=0)
+    expired.get(addresses[1])
+    ledger.advance()
+    expired.get(addresses[1])
+    assert ledger.fetched[-2:] == [addresses[1]] * 2
+
+
+def test_invalidate_drops_only_the_given_accounts():
+    ledger = CountingLedger()
+    addresses = funded_accounts(ledger, 3)
+    cache = AccountSnapshotCache(ledger, status_ttl=60)
+    cache.snapshot(addresses)
+    cache.invalidate(addresses[:1])
+    cache.snapshot(addresses)
+    assert ledger.fetched[3:] == addresses[:1]
+    cache.invalidate()
+    cache.snapshot(addresses)
+    assert len(ledger.fetched) == 7
+
+
+def test_asset_holdings_are_indexed_by_id():
+    ledger = LocalLedger()
+    creator_key, creator = account.generate_account()
+    holder, outsider = funded_accounts(ledger, 2)
+    ledger.fund(creator, 10_000_000)
+    create = transaction.AssetConfigTxn(creator, ledger.suggested_params(), total=1_000, decimals=2,
+                                        default_frozen=False, unit_name="T", asset_name="Test",
+                                        manager=creator, reserve=creator, strict_empty_address_check=False)
+    txid = ledger.send_transaction(create.sign(creator_key))
+    asset_id = ledger.pending_transaction_info(txid)["asset-index"]
+
+    cache = AccountSnapshotCache(ledger)
+    assert cache.asset_balances([creator, holder], asset_id) == {creator: 1_000, holder: None}
+    assert cache.get(outsider).assets == {}
+    assert cache.get(creator).asset_amount(asset_id + 1) is None
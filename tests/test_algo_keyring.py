@@ -0,0 +1,72 @@
+import pytest
+from algosdk import account, error, mnemonic, transaction
+
+import algo_keyring
+from algo_keyring import Keyring
+
+PARAMS = transaction.SuggestedParams(fee=1000, first=1, last=1001, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+                                     gen="testnet-v1.0", flat_fee=True)
+
+
+def payment(sender, receiver, amount=1_000):
+    return transaction.PaymentTxn(sender, PARAMS, receiver, amount)
+
+
+def test_signatures_match_algosdk():
+    private_key, address = account.generate_account()
+    keyring = Keyring.from_private_keys([private_key])
+    txn = payment(address, address)
+    assert keyring.sign(txn).dictify() == txn.sign(private_key).dictify()
+    assert keyring.sign(txn, private_key).authorizing_address is None
+
+
+def test_mnemonic_is_derived_once(monkeypatch):
+    private_key, address = account.generate_account()
+    phrase = mnemonic.from_private_key(private_key)
+    derived = []
+    to_private_key = algo_keyring.mnemonic.to_private_key
+    monkeypatch.setattr(algo_keyring.mnemonic, "to_private_key", lambda words: derived.append(words) or
+                        to_private_key(words))
+    keyring = Keyring()
+    assert [keyring.add_mnemonic(phrase) for _ in range(3)] == [address] * 3
+    assert keyring.add_private_key(private_key) == address
+    assert derived == [phrase]
+    assert address in keyring and len(keyring) == 1 and keyring.private_key(address) == private_key
+
+
+def test_rekeyed_signer_and_unknown_address():
+    sender_key, sender = account.generate_account()
+    signer_key, signer = account.generate_account()
+    keyring = Keyring.from_private_keys([signer_key])
+    signed = keyring.sign(payment(sender, signer), signer)
+    assert signed.authorizing_address == signer
+    assert signed.signature == payment(sender, signer).sign(signer_key).signature
+    with pytest.raises(error.InvalidSecretKeyError):
+        keyring.sign(payment(sender, signer))
+
+
+def test_multisig_signatures_match_algosdk():
+    accounts = [account.generate_account() for _ in range(3)]
+    msig = transaction.Multisig(1, 2, [address for _, address in accounts])
+    txn = payment(msig.address(), accounts[0][1])
+    expected = transaction.MultisigTransaction(txn, msig.get_multisig_account())
+    for private_key, _ in accounts[:2]:
+        expected.sign(private_key)
+
+    keyring = Keyring.from_private_keys([private_key for private_key, _ in accounts])
+    signed = keyring.sign_multisig(transaction.MultisigTransaction(txn, msig.get_multisig_account()),
+                                   [address for _, address in accounts[:2]])
+    assert signed.dictify() == expected.dictify()
+    outsider = account.generate_account()
+    keyring.add_private_key(outsider[0])
+    with pytest.raises(error.InvalidSecretKeyError):
+        keyring.sign_multisig(transaction.MultisigTransaction(txn, msig.get_multisig_account()), [outsider[1]])
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_sign_many_matches_one_at_a_time(processes):
+    accounts = [account.generate_account() for _ in range(4)]
+    keyring = Keyring.from_private_keys([private_key for private_key, _ in accounts])
+    txns = [payment(accounts[i % 4][1], accounts[0][1], i + 1) for i in range(40)]
+    signed = keyring.sign_many(txns, processes=processes)
+    assert [s.dictify() for s in signed] == [keyring.sign(txn).dictify() for txn in txns]
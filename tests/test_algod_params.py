@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+from algosdk import account, transaction
+
+from algod_params import SuggestedParamsCache
+from local_ledger import LocalLedger
+
+
+class CountingLedger(LocalLedger):
+    def __init__(self, fee=0, **kwargs):
+        super().__init__(**kwargs)
+        self.fetches = 0
+        self.fee = fee
+
+    def suggested_params(self, **kwargs):
+        self.fetches += 1
+        params = super().suggested_params(**kwargs)
+        params.fee = self.fee
+        return params
+
+
+@pytest.mark.parametrize("fee", [0, 5])
+def test_params_give_the_fee_algosdk_would(fee):
+    ledger = CountingLedger(fee)
+    params = SuggestedParamsCache(ledger).get()
+    sender = account.generate_account()[1]
+    cached = transaction.PaymentTxn(sender, params, sender, 1, note=b"x" * 200)
+    fresh = transaction.PaymentTxn(sender, ledger.suggested_params(), sender, 1, note=b"x" * 200)
+    assert cached.fee == fresh.fee >= params.min_fee
+    assert params.flat_fee == (fee == 0)
+
+
+def test_params_reused_within_the_validity_window():
+    ledger = CountingLedger()
+    ledger.advance(10)
+    cache = SuggestedParamsCache(ledger, validity_rounds=100)
+    params = [cache.get() for _ in range(20)]
+    assert ledger.fetches == 1 and cache.stats()["hits"] == 19
+    assert all((p.first, p.last) == (params[0].first, params[0].first + 100) for p in params)
+
+    cache.observe_round(params[0].first + 50)  # e.g. a confirmation seen by the tracker
+    later = cache.get()
+    assert (later.first, later.last) == (params[0].first + 50, params[0].first + 150)
+    assert ledger.fetches == 1
+
+
+def test_params_refetched_when_the_window_runs_out():
+    ledger = CountingLedger()
+    cache = SuggestedParamsCache(ledger, refresh_margin=100)
+    base = cache.get()
+    fetched_last = base.first + ledger.validity_rounds
+
+    cache.observe_round(fetched_last - 50)  # Inside the refresh margin: served, refreshed in the background
+    assert cache.get().first == fetched_last - 50
+    for _ in range(200):
+        if cache.background_refreshes:
+            break
+        threading.Event().wait(0.01)
+    assert cache.background_refreshes == 1 and ledger.fetches == 2
+
+    cache.invalidate()
+    cache.get()
+    assert ledger.fetches == 3 and cache.stats()["misses"] == 2
+
+    cache.observe_round(cache.current_round() + 10 * ledger.validity_rounds)  # Past the window: fetched at once
+    cache.get()
+    assert ledger.fetches == 4
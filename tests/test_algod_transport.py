@@ -0,0 +1,82 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from algosdk import account, error, transaction
+
+from algo_keyring import Keyring
+from algod_transport import PooledAlgodClient
+
+
+class FlakyAlgod(BaseHTTPRequestHandler):
+    """Takes every submission, but drops the connection before answering the first one."""
+    protocol_version = "HTTP/1.1"
+    submissions = []
+    answer_first = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.submissions.append(self.path)
+        if len(self.submissions) == 1 and not self.answer_first:
+            self.close_connection = True
+            self.connection.close()
+            return
+        body = json.dumps({"message": "TransactionPool.Remember: transaction already in ledger: X"}).encode()
+        self.send_response(400)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def algod():
+    FlakyAlgod.submissions = []
+    FlakyAlgod.answer_first = False
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyAlgod)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield PooledAlgodClient("token", f"http://127.0.0.1:{server.server_port}", backoff=0)
+    server.shutdown()
+
+
+def signed_payment():
+    private_key, address = account.generate_account()
+    params = transaction.SuggestedParams(1000, 1, 1000, "A" * 44, flat_fee=True)
+    return Keyring().sign(transaction.PaymentTxn(address, params, address, 0), private_key)
+
+
+def test_submission_retried_after_dropped_connection_returns_its_txid(algod):
+    stxn = signed_payment()
+    assert algod.send_transaction(stxn) == stxn.get_txid()
+    assert len(FlakyAlgod.submissions) == 2
+
+
+def test_duplicate_on_first_submission_is_still_an_error(algod):
+    FlakyAlgod.answer_first = True
+    with pytest.raises(error.AlgodHTTPError):
+        algod.send_transaction(signed_payment())
+
+
+def test_other_posts_not_resent_after_dropped_connection(algod):
+    with pytest.raises(error.AlgodHTTPError):
+        algod.algod_request("POST", "/teal/compile", data=b"int 1")
+    assert len(FlakyAlgod.submissions) == 1
+
+
+def test_client_timeout_applies_unless_a_request_sets_one(algod, monkeypatch):
+    algod.timeout = 2
+    timeouts = []
+    connection = algod._connection
+
+    def recording_connection(timeout):
+        timeouts.append(timeout)
+        return connection(timeout)
+
+    monkeypatch.setattr(algod, "_connection", recording_connection)
+    for kwargs in ({}, {"timeout": 7}, {"timeout": 30}):
+        with pytest.raises(error.AlgodHTTPError):  # The stand-in node answers no GETs
+            algod.status(**kwargs)
+    assert timeouts == [2, 7, 30]
@@ -0,0 +1,39 @@
+import pytest
+from algosdk import account, transaction
+
+from batch_submit import MAX_GROUP_SIZE, group_batches
+
+PARAMS = transaction.SuggestedParams(fee=1000, first=1, last=1001, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+                                     gen="testnet-v1.0", flat_fee=True)
+
+
+def payments(count):
+    sender = account.generate_account()[1]
+    return [transaction.PaymentTxn(sender, PARAMS, sender, i + 1) for i in range(count)]
+
+
+@pytest.mark.parametrize("count, sizes", [(1, [1]), (16, [16]), (17, [16, 1]), (33, [16, 16, 1]), (40, [16, 16, 8])])
+def test_atomic_groups_stop_at_the_group_limit(count, sizes):
+    txns = payments(count)
+    batches = group_batches(txns, "atomic")
+    assert MAX_GROUP_SIZE == 16
+    assert [len(batch) for batch in batches] == sizes
+    assert [txn for batch in batches for txn in batch] == txns
+    for batch in batches:
+        group_ids = {txn.group for txn in batch}
+        assert len(group_ids) == 1
+        # A lone transaction needs no group id; a group's id covers exactly its members
+        expected = None if len(batch) == 1 else transaction.calculate_group_id(
+            [transaction.PaymentTxn(t.sender, PARAMS, t.receiver, t.amt) for t in batch])
+        assert group_ids == {expected}
+
+
+def test_concurrent_batches_are_single_transactions():
+    txns = payments(20)
+    assert group_batches(txns, "concurrent") == [[txn] for txn in txns]
+    assert all(txn.group is None for txn in txns)
+
+
+def test_unknown_batch_mode():
+    with pytest.raises(ValueError):
+        group_batches(payments(2), "parallel")
@@ -0,0 +1,74 @@
+import pytest
+from algosdk import error
+from algosdk.account import generate_account
+from algosdk.transaction import AssetTransferTxn
+
+import liquiditypool_defi as pool_module
+from local_ledger import LocalLedger
+
+
+@pytest.fixture
+def ledger():
+    ledger = LocalLedger()
+    pool_module.use_client(ledger)
+    return ledger
+
+
+def make_accounts(ledger, count, unfunded=()):
+    accounts = [generate_account() for _ in range(count)]
+    for i, (_, address) in enumerate(accounts):
+        if i not in unfunded:
+            ledger.fund(address, 1_000_000)
+    return accounts
+
+
+def holdings(ledger, address, asset_id):
+    return {asset['asset-id']: asset['amount'] for asset in ledger.account_info(address)['assets']}.get(asset_id)
+
+
+@pytest.mark.parametrize("batch_mode", ["concurrent", "atomic"])
+def test_onboarding_takes_a_few_rounds(ledger, batch_mode, capsys):
+    creator_key, creator = make_accounts(ledger, 1)[0]
+    accounts = make_accounts(ledger, 40)
+    start = ledger.status()["last-round"]
+    asset_id, status = pool_module.bootstrap_uctzar(creator_key, creator, accounts,
+                                                    {address: 10 for _, address in accounts}, batch_mode=batch_mode)
+    assert ledger.status()["last-round"] - start <= 4  # Creation, every opt-in, every distribution
+    assert all(result['error'] is None and result['attempts'] == 2 for result in status.values())
+    assert all(holdings(ledger, address, asset_id) == 1_000 for _, address in accounts)
+    assert "Bootstrapped 40 of 40 accounts" in capsys.readouterr().out
+
+
+def test_rerun_tops_up_without_paying_twice(ledger, capsys):
+    creator_key, creator = make_accounts(ledger, 1)[0]
+    accounts = make_accounts(ledger, 5, unfunded={2})
+    targets = {address: 10 for _, address in accounts}
+    asset_id, status = pool_module.bootstrap_uctzar(creator_key, creator, accounts, targets)
+    stuck = accounts[2][1]
+    assert status[stuck]['error'] and status[stuck]['attempts'] == 3 and not status[stuck]['opted-in']
+    assert sum(result['error'] is None for result in status.values()) == 4
+
+    ledger.fund(stuck, 1_000_000)
+    applied = ledger.transactions_applied
+    _, status = pool_module.bootstrap_uctzar(creator_key, creator, accounts, targets, asset_id=asset_id)
+    assert all(result['error'] is None for result in status.values())
+    assert ledger.transactions_applied - applied == 2  # The missing opt-in and its distribution
+    assert all(holdings(ledger, address, asset_id) == 1_000 for _, address in accounts)
+
+    targets[accounts[0][1]] = 12.5
+    _, status = pool_module.bootstrap_uctzar(creator_key, creator, accounts, targets, asset_id=asset_id)
+    assert holdings(ledger, accounts[0][1], asset_id) == 1_250
+    assert ledger.transactions_applied - applied == 3
+
+
+def test_distribution_lease_blocks_a_second_payment(ledger, capsys):
+    creator_key, creator = make_accounts(ledger, 1)[0]
+    (recipient_key, recipient), = make_accounts(ledger, 1)
+    asset_id, _ = pool_module.bootstrap_uctzar(creator_key, creator, [(recipient_key, recipient)], {recipient: 10})
+
+    # e.g. a retry from another process that did not see the first distribution confirm
+    duplicate = AssetTransferTxn(creator, ledger.suggested_params(), recipient, 1_000, asset_id,
+                                 note=b"retry", lease=pool_module._distribution_lease(asset_id, recipient, 10))
+    with pytest.raises(error.AlgodHTTPError, match="overlapping lease"):
+        ledger.send_transaction(duplicate.sign(creator_key))
+    assert holdings(ledger, recipient, asset_id) == 1_000
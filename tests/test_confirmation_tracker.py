@@ -0,0 +1,48 @@
+import pytest
+
+from confirmation_tracker import ConfirmationTracker
+
+
+class FlakyClient:
+    """Confirms every txid after a round, failing the first few lookups with a dropped connection."""
+
+    def __init__(self, failures=2):
+        self.round = 1
+        self.failures = failures
+
+    def status(self):
+        return {'last-round': self.round}
+
+    def status_after_block(self, round_number):
+        self.round = round_number + 1
+        return {'last-round': self.round}
+
+    def pending_transaction_info(self, txid):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionResetError("connection reset by peer")
+        return {'confirmed-round': self.round}
+
+
+def test_transient_errors_and_failing_listener_do_not_stop_tracking():
+    tracker = ConfirmationTracker(FlakyClient(), default_wait_rounds=10)
+
+    def broken(round_number):
+        raise ValueError("listener bug")
+
+    tracker.add_round_listener(broken)
+    assert tracker.wait("TX1", wait_rounds=10)['confirmed-round'] > 0
+    assert tracker.wait("TX2", wait_rounds=10)['confirmed-round'] > 0
+
+
+def test_waiters_fail_and_tracker_restarts_if_the_loop_dies():
+    client = FlakyClient(failures=0)
+    client.pending_transaction_info = lambda txid: {}
+    client.status_after_block = lambda round_number: "not a status"
+    tracker = ConfirmationTracker(client)
+    with pytest.raises(RuntimeError):
+        tracker.wait("TX1")
+    assert tracker.pending_count() == 0
+
+    client.pending_transaction_info = lambda txid: {'confirmed-round': 5}
+    assert tracker.wait("TX2")['confirmed-round'] == 5
@@ -0,0 +1,89 @@
+import pytest
+from algosdk import account, error, mnemonic
+
+import benchmarks
+import liquiditypool_defi as pool_module
+import stokvel_algorand
+from instrumentation import metrics
+from local_ledger import LocalLedger
+
+
+@pytest.fixture
+def recording():
+    enabled = metrics.enabled
+    metrics.enable()
+    metrics.reset()
+    yield metrics
+    metrics.enable(enabled)
+    metrics.reset()
+
+
+def test_asa_setup_records_stages_and_errors(recording, monkeypatch, capsys):
+    ledger = LocalLedger()
+    pool_module.use_client(ledger)
+    creator_key, creator = account.generate_account()
+    holder_key, holder = account.generate_account()
+    with pytest.raises(error.AlgodHTTPError):
+        pool_module.create_uctzar_asa(creator_key, creator)  # Nothing to pay the fee with
+    assert recording.snapshot()["counters"] == {"create_uctzar_asa.errors": 1}
+
+    ledger.fund(creator, 10_000_000)
+    ledger.fund(holder, 1_000_000)
+    asset_id = pool_module.create_uctzar_asa(creator_key, creator)
+    monkeypatch.setattr(pool_module, "uctzar_id", asset_id, raising=False)
+    pool_module.opt_in_to_asa(holder_key, holder, asset_id)
+    pool_module.distribute_uctzar(creator_key, creator, holder, 1)
+    histograms = recording.snapshot()["histograms"]
+    for name in ("create_uctzar_asa", "opt_in_to_asa", "distribute_uctzar"):
+        assert histograms[name]["count"] == 1
+        assert {f"{name}.{stage}" for stage in ("params", "sign", "submit", "confirm")} <= set(histograms)
+
+    with pytest.raises(error.AlgodHTTPError):
+        pool_module.distribute_uctzar(creator_key, creator, account.generate_account()[1], 1)  # Not opted in
+    assert recording.snapshot()["counters"] == {"create_uctzar_asa.errors": 1, "distribute_uctzar.errors": 1}
+    assert recording.snapshot()["histograms"]["distribute_uctzar"]["count"] == 1
+
+
+@pytest.fixture
+def stokvel(monkeypatch):
+    ledger = LocalLedger()
+    original = stokvel_algorand.config
+    members = []
+    for _ in range(3):
+        private_key, address = account.generate_account()
+        members.append({'address': address, 'mnemonic': mnemonic.from_private_key(private_key)})
+    stokvel_algorand.use_client(ledger)
+    stokvel_algorand.configure(participants=members, threshold=2)
+    monkeypatch.setattr("builtins.input", lambda prompt: "y")
+    yield ledger
+    stokvel_algorand.configure(**original._asdict())
+
+
+def test_multisig_payout_records_stages_and_errors(recording, stokvel, monkeypatch, capsys):
+    receiver = account.generate_account()[1]
+    stokvel.fund(stokvel_algorand.msig_address, 1_000_000)
+    stokvel_algorand.perform_multisig_payout_optimized(stokvel_algorand.msig_address, receiver, 200_000)
+    histograms = recording.snapshot()["histograms"]
+    assert histograms["multisig_payout"]["count"] == 1
+    assert {"multisig_payout.request", "multisig_payout.approve", "multisig_payout.confirm"} <= set(histograms)
+
+    stokvel_algorand.perform_multisig_payout_optimized(stokvel_algorand.msig_address, receiver, 5_000_000)
+    assert "Error submitting payout transaction" in capsys.readouterr().out  # Overdrawn; reported, not raised
+    assert recording.snapshot()["counters"] == {"multisig_payout.errors": 1}
+
+    def fail():
+        raise ConnectionError("node down")
+
+    monkeypatch.setattr(stokvel_algorand.params_cache, "get", fail)
+    with pytest.raises(ConnectionError):
+        stokvel_algorand.perform_multisig_payout_optimized(stokvel_algorand.msig_address, receiver, 1)
+    assert recording.snapshot()["counters"] == {"multisig_payout.errors": 2}
+    assert recording.snapshot()["histograms"]["multisig_payout"]["count"] == 1
+
+
+def test_benchmarks_leave_env_enabled_metrics_on(recording, tmp_path, capsys):
+    benchmarks.main(["--only", "no-such-benchmark"])
+    assert metrics.enabled
+    metrics.enable(False)
+    benchmarks.main(["--only", "no-such-benchmark", "--stage-metrics", str(tmp_path / "stages.json")])
+    assert metrics.enabled and (tmp_path / "stages.json").exists()
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+
+from algosdk import account, mnemonic, transaction
+
+import algod_transport
+import liquiditypool_defi
+import stokvel_algorand
+from algod_transport import AlgodConfig
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_CHECK = """
+import socket
+import algod_transport
+
+def no_io(*args, **kwargs):
+    raise AssertionError("network I/O at import")
+
+socket.socket.connect = socket.create_connection = no_io
+import liquiditypool_defi
+import stokvel_algorand
+
+assert not algod_transport._clients
+assert "algod_client" not in vars(stokvel_algorand) and "msig" not in vars(stokvel_algorand)
+assert "client" not in vars(liquiditypool_defi)
+"""
+
+
+def test_import_does_no_io_and_prints_nothing():
+    result = subprocess.run([sys.executable, "-c", IMPORT_CHECK], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ""
+
+
+def test_config_from_env():
+    assert AlgodConfig.from_env({}) == AlgodConfig()
+    assert AlgodConfig.from_env({"ALGOD_ADDRESS": "http://node:4001", "ALGOD_TOKEN": "t"}) == AlgodConfig(
+        "http://node:4001", "t")
+
+
+def test_stokvel_state_follows_configure():
+    original = stokvel_algorand.config
+    node = AlgodConfig("http://stokvel-node.invalid:4001", "token")
+    members = []
+    for _ in range(3):
+        private_key, address = account.generate_account()
+        members.append({'address': address, 'mnemonic': mnemonic.from_private_key(private_key)})
+    try:
+        stokvel_algorand.configure(algod=node, participants=members, threshold=2)
+        assert stokvel_algorand.algod_client is algod_transport.get_client("token", node.algod_address)
+        assert stokvel_algorand.params_cache.client is stokvel_algorand.algod_client
+        assert stokvel_algorand.participants == members
+        assert stokvel_algorand.msig_address == transaction.Multisig(
+            1, 2, [member['address'] for member in members]).address()
+
+        client = stokvel_algorand.algod_client
+        stokvel_algorand.configure(threshold=3)  # Only the multisig depends on the members
+        assert stokvel_algorand.algod_client is client
+        assert stokvel_algorand.msig.threshold == 3
+    finally:
+        stokvel_algorand.configure(**original._asdict())
+    assert "algod_client" not in vars(stokvel_algorand) and "msig" not in vars(stokvel_algorand)
+
+
+def test_pool_client_follows_configure():
+    original = liquiditypool_defi.config
+    node = AlgodConfig("http://pool-node.invalid:4001")
+    try:
+        liquiditypool_defi.configure(node)
+        assert liquiditypool_defi.client is algod_transport.get_client("", node.algod_address)
+        assert liquiditypool_defi.snapshots.client is liquiditypool_defi.client
+    finally:
+        liquiditypool_defi.configure(original)
+    assert "client" not in vars(liquiditypool_defi)
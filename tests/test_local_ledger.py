@@ -0,0 +1,55 @@
+import pytest
+from algosdk import account, error, transaction
+
+from algo_keyring import Keyring
+from local_ledger import LocalLedger
+
+keyring = Keyring()
+
+
+@pytest.fixture
+def ledger():
+    return LocalLedger()
+
+
+def funded(ledger):
+    private_key, address = account.generate_account()
+    ledger.fund(address, 10_000_000)
+    return private_key, address
+
+
+def payment(ledger, sender, **kwargs):
+    return transaction.PaymentTxn(sender, ledger.suggested_params(), sender, 0, **kwargs)
+
+
+def test_rekeyed_account_needs_its_new_key(ledger):
+    key, address = funded(ledger)
+    new_key, new_address = funded(ledger)
+    ledger.send_transaction(keyring.sign(payment(ledger, address, rekey_to=new_address), key))
+    assert ledger.account_info(address)["auth-addr"] == new_address
+
+    with pytest.raises(error.AlgodHTTPError, match="authorized by"):
+        ledger.send_transaction(keyring.sign(payment(ledger, address, note=b"old key"), key))
+    ledger.send_transaction(keyring.sign(payment(ledger, address, rekey_to=address), new_key))
+    assert "auth-addr" not in ledger.account_info(address)
+    ledger.send_transaction(keyring.sign(payment(ledger, address, note=b"own key again"), key))
+
+
+def test_signing_with_an_unrelated_key_is_rejected(ledger):
+    _, address = funded(ledger)
+    other_key, _ = funded(ledger)
+    with pytest.raises(error.AlgodHTTPError, match="authorized by"):
+        ledger.send_transaction(keyring.sign(payment(ledger, address), other_key))
+
+
+def test_lease_cannot_be_reused_until_it_expires(ledger):
+    key, address = funded(ledger)
+    lease = b"L" * 32
+    first = payment(ledger, address, lease=lease)
+    first.last_valid_round = first.first_valid_round + 2
+    ledger.send_transaction(keyring.sign(first, key))
+    with pytest.raises(error.AlgodHTTPError, match="overlapping lease"):
+        ledger.send_transaction(keyring.sign(payment(ledger, address, lease=lease, note=b"again"), key))
+
+    ledger.advance(3)
+    ledger.send_transaction(keyring.sign(payment(ledger, address, lease=lease, note=b"later"), key))
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+from algosdk import encoding
+
+from lp_ledger import KEY_WIDTH, LPTokenLedger, _hash, _hash_many, _key
+from pool_journal import open_pool
+
+# Keys ending in zero bytes are the awkward case for numpy's S dtype
+KEYS = [os.urandom(KEY_WIDTH) for _ in range(200)] + [b"\x01" + b"\0" * 31, b"\0" * KEY_WIDTH, b"\xff" * KEY_WIDTH]
+ADDRESSES = [encoding.encode_address(key) for key in KEYS]
+
+
+def test_keys_match_algosdk_and_hashes_agree():
+    keys = [_key(address) for address in ADDRESSES]
+    assert [key.ljust(KEY_WIDTH, b"\0") for key in keys] == KEYS
+    assert _hash_many(np.array(keys, dtype=f"S{KEY_WIDTH}")).tolist() == [_hash(key) for key in keys]
+
+
+@pytest.mark.parametrize("address", ["", ADDRESSES[0][:-1] + ("A" if ADDRESSES[0][-1] != "A" else "B"),
+                                     ADDRESSES[0].lower(), None])
+def test_invalid_addresses_rejected(address):
+    with pytest.raises(ValueError):
+        LPTokenLedger()[address] = 1
+
+
+def test_provider_ids_that_are_not_addresses():
+    ids = ["alice", "PROVIDER1", "account-" + "9" * 50, "ünï"]
+    ledger = LPTokenLedger()
+    for tokens, provider in enumerate(ids + ADDRESSES[:3], 1):
+        ledger.add(provider, tokens)
+    assert list(ledger) == ids + ADDRESSES[:3]
+    assert ledger["alice"] == 1 and "bob" not in ledger
+    assert dict(ledger.copy()) == dict(ledger) == dict(LPTokenLedger.from_arrays(list(ledger), list(ledger.values())))
+
+
+def test_memory_per_provider():
+    for count in (1_000, 1_025, 50_000):
+        ledger = LPTokenLedger.from_arrays([f"p{i}" for i in range(count)], np.ones(count))
+        ledger.add("one more", 1)
+        assert ledger.nbytes / len(ledger) < 80
+
+
+def test_incremental_and_bulk_ledgers_agree():
+    ledger = LPTokenLedger()
+    for tokens, address in enumerate(ADDRESSES, 1):
+        ledger.add(address, tokens)
+    bulk = LPTokenLedger.from_arrays(ADDRESSES, np.arange(1, len(ADDRESSES) + 1))
+    assert list(ledger) == list(bulk) == ADDRESSES
+    assert dict(ledger) == dict(bulk) == dict(LPTokenLedger.from_arrays(*bulk.arrays()))
+    del ledger[ADDRESSES[-1]]
+    assert ADDRESSES[-1] not in ledger and len(ledger) == len(ADDRESSES) - 1
+
+
+def test_snapshot_and_journal_recovery(tmp_path):
+    pool = open_pool(str(tmp_path), None, None, snapshot_every=50)
+    for i, address in enumerate(ADDRESSES[:100] + [f"account-{i}" for i in range(20)] + ADDRESSES[100:]):
+        pool.record_add_liquidity(address, 1.0 + i, 2.0)
+    pool.record_withdrawal(ADDRESSES[3], pool.liquidity_providers[ADDRESSES[3]], 1.0, 1.0)
+    pool.journal.close()
+
+    recovered = open_pool(str(tmp_path), None, None)
+    assert dict(recovered.liquidity_providers) == dict(pool.liquidity_providers)
+    assert recovered.total_liquidity_tokens == pool.total_liquidity_tokens
+    assert (recovered.algo_reserves, recovered.uctzar_reserves) == pytest.approx(
+        (pool.algo_reserves, pool.uctzar_reserves))
+
+
+def test_add_many_matches_one_add_at_a_time():
+    rng = np.random.default_rng(3)
+    providers = ADDRESSES[:50] + ["alice", "bob"]
+    ledger, expected = (LPTokenLedger.from_arrays(ADDRESSES[:10], np.arange(10)) for _ in range(2))
+    del ledger[ADDRESSES[4]], expected[ADDRESSES[4]]  # Revived by the batch
+    batch = [providers[i] for i in rng.integers(0, len(providers), 500)] + [ADDRESSES[4]]
+    tokens = rng.integers(-5, 100, len(batch))
+    for provider, amount in zip(batch, tokens.tolist()):
+        expected.add(provider, amount)
+    ledger.add_many(batch, tokens)
+    assert list(ledger.items()) == list(expected.items())
+    with pytest.raises(ValueError):
+        ledger.add_many([ADDRESSES[0][:-1] + ("A" if ADDRESSES[0][-1] != "A" else "B")], [1])
+
+
+def test_recovery_from_snapshot_and_tail(tmp_path):
+    pool = open_pool(str(tmp_path), None, None, snapshot_every=100)
+    rng = np.random.default_rng(5)
+    providers = ADDRESSES[:40] + [f"account-{i}" for i in range(10)]
+    for i in range(250):
+        provider = providers[int(rng.integers(len(providers)))]
+        if i % 5 == 4 and pool.liquidity_providers.get(provider):
+            pool.record_withdrawal(provider, pool.liquidity_providers[provider], 0.5, 0.5)
+        elif i % 2:
+            pool.record_swap(i % 4 == 1, 0.25, 0.2)
+        else:
+            pool.record_add_liquidity(provider, 1.0 + i, 2.0)
+    for provider in ADDRESSES[100:110] + ["late"]:  # First seen after the last snapshot
+        pool.record_add_liquidity(provider, 3.0, 3.0)
+    pool.journal.close()
+
+    recovered = open_pool(str(tmp_path), None, None)
+    assert 0 < recovered.journal.records - recovered.journal._snapshot_records < 100
+    assert list(recovered.liquidity_providers.items()) == list(pool.liquidity_providers.items())
+    assert recovered.total_liquidity_tokens == pool.total_liquidity_tokens
+    assert (recovered.algo_reserves, recovered.uctzar_reserves) == (pool.algo_reserves, pool.uctzar_reserves)
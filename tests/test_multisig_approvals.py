@@ -0,0 +1,46 @@
+import pytest
+from algosdk import account, error, transaction
+
+from algo_keyring import Keyring
+from confirmation_tracker import ConfirmationTracker
+from local_ledger import LocalLedger
+from multisig_approvals import CONFIRMED, REJECTED, ApprovalQueue
+
+
+@pytest.fixture
+def queue():
+    ledger = LocalLedger()
+    keyring = Keyring()
+    members = [keyring.add_private_key(account.generate_account()[0]) for _ in range(3)]
+    multisig = transaction.Multisig(1, 2, members)
+    ledger.fund(multisig.address(), 10_000_000)
+    return ApprovalQueue(ledger, ConfirmationTracker(ledger), multisig, keyring), ledger, members
+
+
+def payout(queue, ledger, members, amount=1_000_000):
+    txn = transaction.PaymentTxn(queue.multisig.address(), ledger.suggested_params(), members[0], amount)
+    return queue.request_payout(txn)
+
+
+def test_submitted_requests_leave_the_queue(queue):
+    queue, ledger, members = queue
+    request = payout(queue, ledger, members)
+    assert queue.pending_count() == 1
+    queue.approve(request.request_id, members[0])
+    queue.approve(request.request_id, members[1])
+    assert queue.pending_count() == 0 and queue.pending() == []
+    assert request.future.result()['confirmed-round'] > 0
+    assert request.status == CONFIRMED
+    assert queue.approve(request.request_id, members[2]) is None  # Late approvals are ignored
+
+
+def test_rejected_requests_leave_the_queue(queue):
+    queue, ledger, members = queue
+    request = payout(queue, ledger, members)
+    queue.reject(request.request_id, members[0])
+    assert queue.pending_count() == 1
+    queue.reject(request.request_id, members[1])
+    assert queue.pending_count() == 0 and request.status == REJECTED
+    with pytest.raises(error.TransactionRejectedError):
+        request.future.result()
+    assert queue.reject(request.request_id, members[2]) is None
@@ -0,0 +1,89 @@
+import pytest
+from algosdk import error
+from algosdk.account import generate_account
+
+import liquiditypool_defi as pool_module
+from liquiditypool_defi import ALGO_TO_UCTZAR, UCTZAR_TO_ALGO, LiquidityPool
+from local_ledger import LocalLedger
+from pool_indexer import PoolIndexer
+
+
+@pytest.fixture
+def traded_pool(monkeypatch, capsys):
+    """A pool on a LocalLedger after deposits, swaps and a withdrawal, all confirmed on chain."""
+    ledger = LocalLedger()
+    pool_module.use_client(ledger)
+    pool_key, pool_address = generate_account()
+    providers = [generate_account() for _ in range(3)]
+    ledger.fund(pool_address, 10_000_000)
+    for _, address in providers:
+        ledger.fund(address, 1_000_000_000)
+    creator_key, creator = providers[0]
+    asset_id, _ = pool_module.bootstrap_uctzar(creator_key, creator, [(pool_key, pool_address)] + providers[1:],
+                                               {address: 1_000 for _, address in providers[1:]})
+    monkeypatch.setattr(pool_module, "uctzar_id", asset_id, raising=False)
+    pool = LiquidityPool(pool_address, pool_key)
+    for key, address in providers:
+        pool.add_liquidity(key, address, 100, 200)
+    pool.swap_algo_for_uctzar(*providers[1], 10)
+    pool.swap_uctzar_for_algo(*providers[2], 30)
+    pool.execute_swap_batch([(providers[1][0], providers[1][1], UCTZAR_TO_ALGO, 5.0),
+                             (providers[2][0], providers[2][1], ALGO_TO_UCTZAR, 2.0)])
+    pool.withdraw_liquidity(*providers[2])
+    return ledger, pool, asset_id
+
+
+def test_index_matches_the_pool_it_follows(traded_pool, tmp_path):
+    ledger, pool, asset_id = traded_pool
+    state_path = str(tmp_path / "index.json")
+    indexer = PoolIndexer(ledger, pool.liquidity_pool_address, asset_id, state_path, batch_rounds=3)
+    assert indexer.catch_up() == ledger.status()["last-round"]
+    # The chain moves whole base units, the pool's own books keep every float
+    assert indexer.reserves() == pytest.approx((pool.algo_reserves, pool.uctzar_reserves), abs=0.05)
+    assert indexer.lp_balances() == {address: tokens for address, tokens in pool.liquidity_providers.items()
+                                     if tokens}
+
+    resumed = PoolIndexer(ledger, pool.liquidity_pool_address, asset_id, state_path)
+    assert resumed.catch_up() == 0
+    assert resumed.lp_balances() == indexer.lp_balances()
+
+
+def test_reconcile_corrects_drift(traded_pool):
+    ledger, pool, asset_id = traded_pool
+    indexer = PoolIndexer(ledger, pool.liquidity_pool_address, asset_id)
+    indexer.catch_up()
+    provider = next(address for address, tokens in pool.liquidity_providers.items() if tokens)
+    pool.algo_reserves += 1
+    pool.liquidity_providers.add(provider, 5)
+
+    drift = indexer.reconcile(pool)
+    assert drift["algo_reserves"] == pytest.approx(1, abs=0.05)
+    assert drift["providers"] == [provider]
+    assert (pool.algo_reserves, pool.uctzar_reserves) == indexer.reserves()
+    assert dict(pool.liquidity_providers) == dict(indexer.index.liquidity_providers)
+    assert indexer.reconcile(pool)["providers"] == []
+
+
+class DownNode:
+    def status(self, **kwargs):
+        raise error.AlgodHTTPError("connection refused")
+
+
+class RecordingStop:
+    """Stands in for a threading.Event; records each wait and stops after ``limit`` of them."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.waits = []
+
+    def is_set(self):
+        return len(self.waits) >= self.limit
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+
+
+def test_follow_backs_off_while_algod_is_down(capsys):
+    stop = RecordingStop(6)
+    PoolIndexer(DownNode(), "POOL", 1).follow(stop, backoff=0.5, max_backoff=4)
+    assert stop.waits == [0.5, 1, 2, 4, 4, 4]
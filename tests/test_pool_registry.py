@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from liquiditypool_defi import LiquidityPool, constant_product_output
+from pool_registry import ALGO, PoolRegistry
+
+USD, EUR, ZAR, GBP = 1, 2, 3, 4
+
+
+@pytest.fixture
+def registry():
+    """A thin direct ALGO/ZAR pool, a deep ALGO -> USD -> ZAR path and an unconnected EUR/GBP pool."""
+    registry = PoolRegistry(fee_percentage=0.003)
+    registry.create_pool(ALGO, ZAR, 10, 200)
+    registry.create_pool(ALGO, USD, 1_000, 2_000)
+    registry.create_pool(USD, ZAR, 2_000, 40_000)
+    registry.create_pool(EUR, GBP, 500, 450)
+    return registry
+
+
+def test_best_route_takes_the_deeper_path(registry):
+    route = registry.best_route(ALGO, ZAR, 5)
+    assert route.assets == (ALGO, USD, ZAR)
+    usd = constant_product_output(5, 1_000, 2_000, 0.003)[0]
+    assert route.amounts == pytest.approx((usd, constant_product_output(usd, 2_000, 40_000, 0.003)[0]))
+    assert route.amount_out > registry.quote_hop((ALGO, ZAR), ALGO, 5)
+    assert registry.best_route(ALGO, ZAR, 5, max_hops=1).assets == (ALGO, ZAR)
+    assert registry.best_route(ZAR, 99, 5) is None
+
+
+def test_hops_are_quoted_at_each_pools_fee(registry):
+    # A path through two deep pools that would win at the registry's fee, but charges 50% a hop
+    for asset_a, asset_b, reserve_a, reserve_b in ((USD, 5, 1e6, 1e6), (5, ZAR, 1e6, 2e7)):
+        pool = LiquidityPool(None, None, fee_percentage=0.5)
+        pool.algo_reserves, pool.uctzar_reserves = reserve_a, reserve_b
+        registry.add_pool(asset_a, asset_b, pool)
+    assert registry.quote_hop((USD, 5), USD, 10) == pytest.approx(constant_product_output(10, 1e6, 1e6, 0.5)[0])
+    assert registry.best_route(ALGO, ZAR, 5).assets == (ALGO, USD, ZAR)
+
+
+def test_cached_routes_dropped_only_for_changed_pools(registry):
+    registry.best_route(ALGO, ZAR, 5)
+    registry.best_route(EUR, GBP, 5)
+    registry.best_route(ALGO, ZAR, 5)
+    assert (registry.hits, registry.misses) == (1, 2)
+
+    registry.get(EUR, GBP).record_swap(0, 1, 1)  # Only the EUR/GBP route priced this pool
+    registry.best_route(ALGO, ZAR, 5)
+    assert (registry.hits, registry.misses) == (2, 2)
+    registry.best_route(EUR, GBP, 5)
+    assert (registry.hits, registry.misses) == (2, 3)
+
+    before = registry.best_route(ALGO, ZAR, 5)
+    swap = registry.get(USD, ZAR).reserve_swap(0, 100)
+    after = registry.best_route(ALGO, ZAR, 5)
+    assert (registry.hits, registry.misses) == (3, 4)
+    assert after.amount_out < before.amount_out  # Priced after the pending swap
+    registry.get(USD, ZAR).release(swap)
+    assert registry.best_route(ALGO, ZAR, 5) == before
+
+
+def test_cache_consistent_under_concurrent_bookings(registry):
+    pool = registry.get(USD, ZAR)
+    stop = threading.Event()
+
+    def book():
+        while not stop.is_set():
+            pool.release(pool.reserve_swap(0, 1))
+
+    threads = [threading.Thread(target=book) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    try:
+        for i in range(2_000):
+            registry.best_route(ALGO, ZAR, 1 + i % 7)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    # Nothing stale was left cached: every route matches a fresh search
+    for i in range(7):
+        assert registry.best_route(ALGO, ZAR, 1 + i) == registry._search(ALGO, ZAR, 1 + i, registry.max_hops)[0]
@@ -0,0 +1,121 @@
+import csv
+import random
+
+import pytest
+
+from pool_replay import EVENT_COLUMNS, SERIES_COLUMNS, replay, write_series
+
+FEE = 0.003
+ACCOUNTS = ["alice", "bob", "carol", "dave", "erin"]
+
+
+def make_events(count=2_000, seed=7):
+    rng = random.Random(seed)
+    events = [(0, "add", "alice", 1_000.0, 2_000.0)]
+    for t in range(1, count):
+        kind = rng.choices(["swap", "add", "withdraw"], [8, 2, 1])[0]
+        account = rng.choice(ACCOUNTS)
+        if kind == "swap":
+            amount = round(rng.uniform(0.1, 50.0), 2)
+            algo_amount, uctzar_amount = (amount, 0.0) if rng.random() < 0.5 else (0.0, amount)
+        elif kind == "add":
+            algo_amount, uctzar_amount = round(rng.uniform(1, 100), 2), round(rng.uniform(1, 200), 2)
+        else:
+            algo_amount = uctzar_amount = 0.0
+        events.append((t, kind, account, algo_amount, uctzar_amount))
+    return events
+
+
+def reference_replay(events, fee_percentage=FEE):
+    """The same accounting with plain floats and a dict of providers."""
+    algo, uctzar, total, providers, rejected = 0.0, 0.0, 0, {}, 0
+    for _, kind, account, algo_amount, uctzar_amount in events:
+        if kind == "swap":
+            algo_in = algo_amount > 0
+            amount_in = algo_amount if algo_in else uctzar_amount
+            reserve_in, reserve_out = (algo, uctzar) if algo_in else (uctzar, algo)
+            if amount_in <= 0 or algo <= 0 or uctzar <= 0:
+                rejected += 1
+                continue
+            fee = amount_in * fee_percentage
+            amount_out = reserve_out - reserve_in * reserve_out / (reserve_in + amount_in - fee)
+            if amount_out > reserve_out:
+                rejected += 1
+                continue
+            if algo_in:
+                algo, uctzar = algo + amount_in, uctzar - amount_out
+            else:
+                algo, uctzar = algo - amount_out, uctzar + amount_in
+        elif kind == "add":
+            if total == 0:
+                tokens = int((algo_amount + uctzar_amount) * 1000)
+            else:
+                tokens = int((algo_amount + uctzar_amount) / (algo + uctzar) * total)
+            total += tokens
+            algo, uctzar = algo + algo_amount, uctzar + uctzar_amount
+            providers[account] = providers.get(account, 0) + tokens
+        else:
+            tokens = providers.get(account, 0)
+            if not tokens:
+                rejected += 1
+                continue
+            share = tokens / total
+            algo, uctzar = algo - algo * share, uctzar - uctzar * share
+            total -= tokens
+            providers[account] = 0
+    return algo, uctzar, total, providers, rejected
+
+
+def write_csv(path, events):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EVENT_COLUMNS)
+        writer.writerows(events)
+
+
+def check_against_reference(runner, events):
+    algo, uctzar, total, providers, rejected = reference_replay(events)
+    pool = runner.pool
+    assert (pool.algo_reserves, pool.uctzar_reserves) == pytest.approx((algo, uctzar))
+    assert pool.total_liquidity_tokens == total
+    assert dict(pool.liquidity_providers) == providers
+    assert runner.rejected == rejected
+    assert runner.events == len(events)
+
+
+def test_csv_replay_with_account_ids(tmp_path):
+    events = make_events()
+    path = tmp_path / "events.csv"
+    write_csv(path, events)
+    runner, chunks = replay(str(path), FEE, sample_every=10, chunk_rows=64)
+    chunks = list(chunks)
+    assert all(len(chunk) == 64 for chunk in chunks[:-1])
+    assert sum(len(chunk) for chunk in chunks) == len(events) // 10
+    assert chunks[-1].events[-1] == len(events)
+    check_against_reference(runner, events)
+
+
+def test_series_written_as_it_is_replayed(tmp_path):
+    events = make_events(500)
+    path = tmp_path / "events.csv"
+    write_csv(path, events)
+    runner, chunks = replay(str(path), FEE, sample_every=5, chunk_rows=16)
+    out = tmp_path / "series.csv"
+    assert write_series(chunks, str(out)) == 100
+    with open(out, newline="") as f:
+        rows = list(csv.reader(f))
+    assert tuple(rows[0]) == SERIES_COLUMNS and len(rows) == 101
+    assert float(rows[-1][2]) == pytest.approx(runner.pool.algo_reserves)
+
+
+def test_parquet_replay_with_account_ids(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    events = make_events()
+    path = tmp_path / "events.parquet"
+    pq.write_table(pa.table({name: list(column) for name, column in zip(EVENT_COLUMNS, zip(*events))}), path)
+    runner, chunks = replay(str(path), FEE, sample_every=1_000)
+    for _ in chunks:
+        pass
+    check_against_reference(runner, events)
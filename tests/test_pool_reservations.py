@@ -0,0 +1,231 @@
+import pytest
+from algosdk.account import generate_account
+
+import liquiditypool_defi as pool_module
+from liquiditypool_defi import ALGO_TO_UCTZAR, UCTZAR_TO_ALGO, LiquidityPool
+from instrumentation import metrics
+from local_ledger import LocalLedger
+
+A, B, C = (generate_account()[1] for _ in range(3))
+
+
+def seeded_pool(*deposits):
+    """A pool holding confirmed deposits of (provider, algo, uctzar)."""
+    pool = LiquidityPool(None, None)
+    for provider, algo_amount, uctzar_amount in deposits:
+        pool.record_add_liquidity(provider, algo_amount, uctzar_amount)
+    return pool
+
+
+def assert_settled(pool):
+    assert pool.pending_count() == 0
+    assert pool.effective_reserves() == (pool.algo_reserves, pool.uctzar_reserves)
+
+
+def test_withdrawal_is_not_paid_from_pending_deposit():
+    pool = seeded_pool((A, 100, 100), (C, 100, 100))
+    deposit = pool.reserve_add(B, 100, 100)
+    withdrawal = pool.reserve_withdrawal(A)
+    assert (-withdrawal.algo_delta, -withdrawal.uctzar_delta) == (100, 100)
+
+    pool.confirm(withdrawal)
+    assert pool.confirm(deposit) > 0
+    assert (pool.algo_reserves, pool.uctzar_reserves) == (200, 200)
+    assert_settled(pool)
+
+
+def test_withdrawal_excludes_pending_swap_input():
+    pool = seeded_pool((A, 100, 100))
+    swap = pool.reserve_swap(ALGO_TO_UCTZAR, 10)
+    withdrawal = pool.reserve_withdrawal(A)
+    assert -withdrawal.algo_delta == 100
+    assert -withdrawal.uctzar_delta == pytest.approx(100 - swap.amount_out, abs=0.01)
+    pool.release(swap)
+    pool.release(withdrawal)
+    assert_settled(pool)
+
+
+def test_deposit_during_pending_withdrawal_keeps_new_tokens():
+    pool = seeded_pool((A, 100, 100), (C, 100, 100))
+    withdrawal = pool.reserve_withdrawal(A)
+    deposit = pool.reserve_add(A, 10, 10)
+    issued = pool.confirm(deposit)
+    pool.confirm(withdrawal)
+    assert pool.liquidity_providers.get(A) == issued
+    assert pool.total_liquidity_tokens == pool.liquidity_providers.get(C) + issued
+    assert_settled(pool)
+
+
+def test_second_withdrawal_refused_while_first_pending():
+    pool = seeded_pool((A, 100, 100))
+    withdrawal = pool.reserve_withdrawal(A)
+    assert pool.reserve_withdrawal(A) is None
+    pool.release(withdrawal)
+    assert pool.reserve_withdrawal(A) is not None
+
+
+class FullJournal:
+    """Stands in for a PoolJournal whose appends fail until it is given room."""
+
+    def __init__(self):
+        self.full = True
+        self.records = []
+
+    def _append(self, *record):
+        if self.full:
+            raise OSError("journal full")
+        self.records.append(record)
+
+    append_add = append_swap = append_withdraw = _append
+
+
+def pool_state(pool):
+    return (pool.algo_reserves, pool.uctzar_reserves, pool.total_liquidity_tokens,
+            dict(pool.liquidity_providers.items()))
+
+
+@pytest.mark.parametrize("reserve", [
+    lambda pool: pool.reserve_swap(UCTZAR_TO_ALGO, 10),
+    lambda pool: pool.reserve_add(B, 10, 10),
+    lambda pool: pool.reserve_withdrawal(A),
+])
+def test_confirm_that_fails_to_book_stays_pending(reserve):
+    pool = seeded_pool((A, 100, 100), (C, 100, 100))
+    reservation = reserve(pool)
+    before = pool_state(pool)
+    pool.journal = FullJournal()
+    with pytest.raises(OSError):
+        pool.confirm(reservation)
+    assert pool_state(pool) == before
+    assert pool.pending_count() == 1
+
+    pool.journal.full = False
+    pool.confirm(reservation)
+    assert len(pool.journal.records) == 1
+    booked = pool_state(pool)
+    assert booked != before
+    assert_settled(pool)
+    pool.release(reservation)
+    assert pool_state(pool) == booked
+
+
+def test_confirm_is_booked_when_a_listener_fails():
+    pool = seeded_pool((A, 100, 100))
+    swap = pool.reserve_swap(UCTZAR_TO_ALGO, 10)
+    failing = [True]
+
+    def broken(changed):
+        if failing[0]:
+            raise RuntimeError("listener bug")
+
+    pool.add_reserves_listener(broken)
+    with pytest.raises(RuntimeError):
+        pool.confirm(swap)
+    assert (pool.algo_reserves, pool.uctzar_reserves) == (100 - swap.amount_out, 110)
+    failing[0] = False
+    pool.release(swap)
+    assert (pool.algo_reserves, pool.uctzar_reserves) == (100 - swap.amount_out, 110)
+    assert_settled(pool)
+
+
+@pytest.fixture
+def ledger_pool(monkeypatch):
+    ledger = LocalLedger()
+    monkeypatch.setattr(pool_module, "uctzar_id", 1, raising=False)
+    pool_module.use_client(ledger)
+    pool_private_key, pool_address = generate_account()
+    pool = LiquidityPool(pool_address, pool_private_key)
+    pool.record_add_liquidity(pool_address, 100, 200)
+    traders = [generate_account() for _ in range(12)]
+    orders = [(key, address, i % 2, 1.0) for i, (key, address) in enumerate(traders)]
+    return pool, orders
+
+
+def test_swap_batch_releases_reservations_when_signing_fails(ledger_pool, monkeypatch):
+    pool, orders = ledger_pool
+
+    def fail(*args):
+        raise ValueError("bad key")
+
+    monkeypatch.setattr(pool_module.keyring, "sign_many", fail)
+    results = pool.execute_swap_batch(orders)
+    assert all(result['error'] and result['txid'] is None for result in results)
+    assert_settled(pool)
+
+
+def test_swap_batch_releases_reservations_when_params_fail(ledger_pool, monkeypatch):
+    pool, orders = ledger_pool
+
+    def fail():
+        raise ConnectionError("node down")
+
+    monkeypatch.setattr(pool_module.params_cache, "get", fail)
+    metrics.enable()
+    metrics.reset()
+    try:
+        with pytest.raises(ConnectionError):
+            pool.execute_swap_batch(orders)
+        assert metrics.snapshot()["counters"] == {"execute_swap_batch.errors": 1}
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+    assert_settled(pool)
+
+
+def uctzar_pool(monkeypatch, sellers, buyers):
+    """A pool on a LocalLedger with UCTZAR bootstrapped; sellers hold 1 ALGO, buyers 10 ALGOs and 20 UCTZAR."""
+    ledger = LocalLedger()
+    pool_module.use_client(ledger)
+    creator_key, creator = generate_account()
+    pool_key, pool_address = generate_account()
+    ledger.fund(creator, 1_000_000_000)
+    ledger.fund(pool_address, 10_000_000)
+    for _, address in sellers:
+        ledger.fund(address, 1_000_000)
+    for _, address in buyers:
+        ledger.fund(address, 10_000_000)
+    asset_id, _ = pool_module.bootstrap_uctzar(creator_key, creator, [(pool_key, pool_address)] + sellers + buyers,
+                                               {address: 20 for _, address in buyers})
+    monkeypatch.setattr(pool_module, "uctzar_id", asset_id, raising=False)
+    pool = LiquidityPool(pool_address, pool_key)
+    pool.add_liquidity(creator_key, creator, 100, 200)
+    return pool
+
+
+def test_failed_swap_group_does_not_drain_pool(monkeypatch, capsys):
+    sellers = [generate_account() for _ in range(8)]  # Can't pay for their ALGOs; their group fails
+    buyers = [generate_account() for _ in range(8)]
+    pool = uctzar_pool(monkeypatch, sellers, buyers)
+    k = pool.algo_reserves * pool.uctzar_reserves
+
+    orders = ([(key, address, ALGO_TO_UCTZAR, 5.0) for key, address in sellers]
+              + [(key, address, UCTZAR_TO_ALGO, 10.0) for key, address in buyers])
+    results = pool.execute_swap_batch(orders)
+    assert all(result['error'] for result in results[:8])
+    assert not any(result['error'] for result in results[8:])
+    assert pool.algo_reserves * pool.uctzar_reserves >= k
+    assert_settled(pool)
+
+
+def test_settled_swap_batch_that_fails_to_book_is_not_rolled_back(monkeypatch, capsys):
+    buyers = [generate_account() for _ in range(8)]
+    pool = uctzar_pool(monkeypatch, [], buyers)
+    before = pool_state(pool)
+    pool.journal = FullJournal()
+    with pytest.raises(OSError):
+        pool.execute_swap_batch([(key, address, UCTZAR_TO_ALGO, 10.0) for key, address in buyers])
+    # Paid out on chain: not booked, but still held so it is never paid twice
+    assert pool_state(pool) == before
+    assert pool.pending_count() == 8
+    assert pool.effective_reserves()[1] == pool.uctzar_reserves + 80
+
+
+def test_pending_swap_invalidates_cached_routes():
+    pool = seeded_pool((A, 100, 100))
+    changes = []
+    pool.add_reserves_listener(changes.append)
+    swap = pool.reserve_swap(UCTZAR_TO_ALGO, 10)
+    assert len(changes) == 1
+    pool.release(swap)
+    pool.release(swap)
+    assert len(changes) == 2
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from liquiditypool_defi import ALGO_TO_UCTZAR, UCTZAR_TO_ALGO, LiquidityPool
+
+
+@pytest.fixture
+def pool():
+    pool = LiquidityPool(None, None, fee_percentage=0.003)
+    pool.algo_reserves, pool.uctzar_reserves = 1_000.0, 2_000.0
+    return pool
+
+
+def test_vectorized_quotes_match_single_swaps(pool):
+    rng = np.random.default_rng(0)
+    amounts = rng.uniform(0.01, 500, 1_000)
+    directions = rng.integers(0, 2, 1_000)
+    quote = pool.quote_swaps(amounts, directions)
+    expected = [pool.quote_swap(int(direction), float(amount)) for amount, direction in zip(amounts, directions)]
+    assert quote.amount_out == pytest.approx([amount_out for amount_out, _ in expected])
+    assert quote.fee == pytest.approx([fee for _, fee in expected])
+
+    # The post-trade reserves are what booking each swap on its own would leave
+    i = 7
+    pool.record_swap(int(directions[i]), amounts[i], quote.amount_out[i])
+    assert (pool.algo_reserves, pool.uctzar_reserves) == pytest.approx(
+        (quote.algo_reserves[i], quote.uctzar_reserves[i]))
+
+
+def test_single_direction_broadcasts_and_price_impact_grows_with_size(pool):
+    quote = pool.quote_swaps([1, 10, 100, 1_000], UCTZAR_TO_ALGO)
+    assert np.all(np.diff(quote.price_impact) > 0)
+    assert quote.price_impact[0] == pytest.approx(1 * 0.997 / (2_000 + 0.997))
+    assert np.all(quote.amount_out < pool.algo_reserves)
+    assert np.all(quote.uctzar_reserves == 2_000 + np.array([1, 10, 100, 1_000]))
+
+
+def test_fee_override_and_pending_reserves(pool):
+    free = pool.quote_swaps([10.0], ALGO_TO_UCTZAR, fee_percentage=0.0)
+    assert free.fee[0] == 0 and free.amount_out[0] == pytest.approx(2_000 - 2_000_000 / 1_010)
+    swap = pool.reserve_swap(ALGO_TO_UCTZAR, 100)
+    assert pool.quote_swaps([10.0]).amount_out[0] == pytest.approx(pool.quote_swap(ALGO_TO_UCTZAR, 10.0)[0])
+    assert pool.quote_swaps([10.0]).amount_out[0] < free.amount_out[0]
+    pool.release(swap)
@@ -0,0 +1,58 @@
+import pytest
+from algosdk import account, mnemonic
+
+import stokvel_algorand
+from local_ledger import LocalLedger
+
+
+def make_members(ledger, count, unfunded=()):
+    members = []
+    for i in range(count):
+        private_key, address = account.generate_account()
+        if i not in unfunded:
+            ledger.fund(address, 10_000_000)
+        members.append({'address': address, 'mnemonic': mnemonic.from_private_key(private_key)})
+    return members
+
+
+@pytest.fixture
+def stokvel():
+    """Points stokvel_algorand at a fresh LocalLedger, restoring its configuration afterwards."""
+    ledger = LocalLedger()
+    original = stokvel_algorand.config
+    stokvel_algorand.use_client(ledger)
+    yield ledger
+    stokvel_algorand.configure(**original._asdict())  # Drops the client and multisig built for the test
+
+
+def contribute(ledger, members, batch_mode):
+    stokvel_algorand.configure(participants=members, threshold=len(members) - 1)
+    mnemonics = {member['address']: member['mnemonic'] for member in members}
+    return stokvel_algorand.process_contributions_batched(mnemonics, stokvel_algorand.msig_address,
+                                                          batch_mode=batch_mode)
+
+
+@pytest.mark.parametrize("batch_mode", ["atomic", "concurrent"])
+def test_batched_contributions_all_confirm(stokvel, batch_mode, capsys):
+    members = make_members(stokvel, 20)
+    results = contribute(stokvel, members, batch_mode)
+    assert list(results) == [member['address'] for member in members]
+    assert all(result['confirmed-round'] and result['error'] is None for result in results.values())
+    fund = stokvel.account_info(stokvel_algorand.msig_address)['amount']
+    assert fund == 20 * stokvel_algorand.CONTRIBUTION_AMOUNT
+    if batch_mode == "atomic":
+        assert len({stokvel.pending_transaction_info(r['txid'])['txn']['txn'].get('grp')
+                    for r in results.values()}) == 2  # 16 + 4
+
+
+def test_atomic_group_fails_together_and_only_its_group(stokvel, capsys):
+    members = make_members(stokvel, 20, unfunded={17})
+    results = list(contribute(stokvel, members, "atomic").values())
+    assert all(result['confirmed-round'] for result in results[:16])
+    assert all(result['error'] and not result['confirmed-round'] for result in results[16:])
+
+
+def test_concurrent_contributions_fail_one_by_one(stokvel, capsys):
+    members = make_members(stokvel, 5, unfunded={2})
+    results = list(contribute(stokvel, members, "concurrent").values())
+    assert [bool(result['confirmed-round']) for result in results] == [True, True, False, True, True]
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from algosdk import account, mnemonic
+
+import stokvel_algorand
+from local_ledger import LocalLedger
+from stokvel_engine import StokvelEngine, StokvelGroup
+from stokvel_schedule import ThirtyDayCalendar
+
+
+def make_group(ledger, name, size=3, funded=True, **options):
+    members = []
+    for _ in range(size):
+        private_key, address = account.generate_account()
+        if funded:
+            ledger.fund(address, 10_000_000)
+        members.append({'address': address, 'mnemonic': mnemonic.from_private_key(private_key)})
+    group = StokvelGroup(name, members, ThirtyDayCalendar(5), seed=1, **options)
+    ledger.fund(group.address, 1_000_000)
+    return group
+
+
+def run(engine, groups):
+    for group in groups:
+        engine.add_group(group)
+    try:
+        asyncio.run(engine.run())
+    finally:
+        engine.close()
+
+
+def test_every_member_paid_once_per_cycle():
+    ledger = LocalLedger()
+    engine = StokvelEngine(ledger, max_concurrency=4)
+    groups = [make_group(ledger, f"group-{i}") for i in range(4)]
+    run(engine, groups)
+    for group in groups:
+        assert not group.failures
+        assert sorted(recipient for _, recipient, _, _ in group.history) == sorted(
+            member['address'] for member in group.members)
+        assert all(confirmed_round for *_, confirmed_round in group.history)
+    assert engine.stats()["active_groups"] == 0
+    assert engine.stats()["payouts_pending_approval"] == 0
+
+
+def test_failing_group_is_stopped_without_holding_up_others():
+    ledger = LocalLedger()
+    engine = StokvelEngine(ledger, max_failures=2)
+    broke = make_group(ledger, "broke", funded=False, cycles=None)
+    healthy = make_group(ledger, "healthy")
+    run(engine, [broke, healthy])
+    assert len(broke.failures) == 2 and broke.done
+    assert broke.fund == 0 and all(amount == 0 for _, _, amount, _ in broke.history)
+    assert not healthy.failures and len(healthy.history) == len(healthy.members)
+
+
+def test_payouts_wait_for_approvals():
+    ledger = LocalLedger()
+    engine = StokvelEngine(ledger, policy=None)
+    group = make_group(ledger, "manual", threshold=2)
+    stop = threading.Event()
+    approved = []
+
+    def approve():
+        while not stop.is_set():
+            for request in engine.approvals.pending():
+                for member in group.members[:2]:
+                    engine.approvals.approve(request.request_id, member['address'])
+                approved.append(request.request_id)
+            stop.wait(0.01)
+
+    approver = threading.Thread(target=approve)
+    approver.start()
+    try:
+        run(engine, [group])
+    finally:
+        stop.set()
+        approver.join()
+    assert len(approved) == len(group.history) == len(group.members)
+    assert not group.failures
+
+
+def test_default_client_follows_configure(monkeypatch):
+    ledger = LocalLedger()
+    monkeypatch.setattr(stokvel_algorand, "config",
+                        stokvel_algorand.config._replace(algod=SimpleNamespace(client=lambda: ledger)))
+    engine = StokvelEngine()
+    try:
+        assert engine.client is ledger
+    finally:
+        engine.close()
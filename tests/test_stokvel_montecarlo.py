@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from stokvel_montecarlo import simulate_stokvel, summarize
+
+
+def test_same_seed_same_result():
+    first = simulate_stokvel(members=5, cycles=3, simulations=1_000, contribution_probability=0.8, seed=42)
+    again = simulate_stokvel(members=5, cycles=3, simulations=1_000, contribution_probability=0.8, seed=42)
+    other = simulate_stokvel(members=5, cycles=3, simulations=1_000, contribution_probability=0.8, seed=43)
+    for name in first._fields:
+        np.testing.assert_array_equal(getattr(first, name), getattr(again, name))
+    assert not np.array_equal(first.recipients, other.recipients)
+
+
+def test_each_cycle_pays_every_member_once():
+    result = simulate_stokvel(members=6, cycles=4, simulations=2_000, seed=1)
+    by_cycle = np.sort(result.recipients.reshape(2_000, 4, 6), axis=-1)
+    assert (by_cycle == np.arange(6)).all()
+    # Every member is about equally likely to be paid first
+    first_paid = np.bincount(result.recipients[:, 0], minlength=6) / 2_000
+    assert first_paid == pytest.approx(np.full(6, 1 / 6), abs=0.04)
+
+
+def test_fund_follows_the_on_chain_rules():
+    members, cycles, contribution, share = 4, 2, 100_000, 0.6
+    result = simulate_stokvel(members, cycles, simulations=3, contribution=contribution, payout_share=share,
+                              initial_fund=50_000, seed=0)
+    fund, expected = 50_000.0, []
+    for _ in range(members * cycles):  # The loop in perform_payment_simulation_optimized
+        fund += contribution * members
+        expected.append(fund * share)
+        fund *= 1 - share
+    for simulation in range(3):
+        assert result.payouts[simulation] == pytest.approx(expected)
+        assert result.fund[simulation, -1] == pytest.approx(fund)
+        received = np.zeros(members)
+        np.add.at(received, result.recipients[simulation], result.payouts[simulation])
+        assert result.member_payouts[simulation] == pytest.approx(received)
+
+
+def test_missed_contributions_keep_the_books_balanced():
+    result = simulate_stokvel(members=5, cycles=2, simulations=5_000, contribution_probability=0.7,
+                              initial_fund=1_000, seed=9)
+    paid_in = result.member_contributions.sum(axis=1) + 1_000
+    paid_out = result.member_payouts.sum(axis=1) + result.fund[:, -1]
+    assert paid_out == pytest.approx(paid_in)
+    assert result.member_contributions.mean() == pytest.approx(0.7 * 10 * 100_000, rel=0.02)
+    assert result.fund[:, -1].std() > 0
+
+
+def test_summary_shapes():
+    result = simulate_stokvel(members=5, cycles=2, simulations=500, seed=2)
+    summary = summarize(result)
+    assert summary["member_payout_mean"].shape == (5,)
+    assert summary["position_payout_mean"].shape == (5,)
+    assert summary["fund_mean"].shape == (11,)
+    assert set(summary["member_net_percentiles"]) == {5, 50, 95}
+    # With full contributions the fund only grows, so later positions in the payout order receive more
+    assert (np.diff(summary["position_payout_mean"]) > 0).all()
@@ -0,0 +1,79 @@
+import datetime
+import itertools
+
+import pytest
+
+import stokvel_algorand
+from stokvel_schedule import (CONTRIBUTION, PAYOUT, EventScheduler, IntervalCalendar, MonthlyCalendar,
+                              ThirtyDayCalendar, fortnightly_calendar, weekly_calendar)
+
+
+def test_thirty_day_calendar_matches_the_original_loop():
+    calendar = ThirtyDayCalendar(5)
+    assert [calendar.contribution_day(period) for period in range(3)] == [5, 35, 65]
+    assert calendar.describe(35) == "day 5 of month 2"
+    assert calendar.describe(365) == "day 5 of month 1"  # 12 months of 30 days, then the year wraps
+
+
+def test_monthly_calendar_clamps_to_the_end_of_short_months():
+    calendar = MonthlyCalendar(31, start=datetime.date(2024, 1, 1))
+    days = [calendar.describe(calendar.contribution_day(period)) for period in range(14)]
+    assert days[:4] == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+    assert days[12:] == ["2025-01-31", "2025-02-28"]
+
+
+@pytest.mark.parametrize("calendar, length", [(weekly_calendar(3, start=datetime.date(2024, 1, 1)), 7),
+                                              (fortnightly_calendar(start=datetime.date(2024, 1, 1)), 14),
+                                              (IntervalCalendar(10, 10, start=datetime.date(2024, 1, 1)), 10)])
+def test_interval_calendars_are_evenly_spaced(calendar, length):
+    days = [calendar.contribution_day(period) for period in range(5)]
+    assert days[0] == datetime.date(2024, 1, calendar.time_t).toordinal()
+    assert {later - earlier for earlier, later in zip(days, days[1:])} == {length}
+
+
+def test_scheduler_interleaves_groups_in_time_order():
+    scheduler = EventScheduler()
+    scheduler.add_group(ThirtyDayCalendar(5), "monthly")
+    scheduler.add_group(IntervalCalendar(7, start=datetime.date.fromordinal(1)), "weekly")
+    events = list(scheduler.events(until_day=40))
+    assert [event.day for event in events] == sorted(event.day for event in events)
+    assert [(event.day, event.kind, event.period) for event in events if event.group == "monthly"] == [
+        (5, CONTRIBUTION, 0), (6, PAYOUT, 0), (35, CONTRIBUTION, 1), (36, PAYOUT, 1)]
+    assert [event.day for event in events if event.group == "weekly" and event.kind == CONTRIBUTION] == [
+        1, 8, 15, 22, 29, 36]
+    assert scheduler.peek_day() >= 40
+    assert len(scheduler) == 2  # Only each group's next contribution is queued
+
+
+def test_removed_group_stops_being_scheduled():
+    scheduler = EventScheduler()
+    scheduler.add_group(ThirtyDayCalendar(1), "a")
+    scheduler.add_group(ThirtyDayCalendar(10), "b")
+    first = list(itertools.islice(scheduler.events(), 3))
+    assert [(event.group, event.kind) for event in first] == [("a", CONTRIBUTION), ("a", PAYOUT), ("b", CONTRIBUTION)]
+    scheduler.remove_group("b")
+    assert {event.group for event in scheduler.events(until_day=200)} == {"a"}
+
+
+@pytest.fixture
+def five_members():
+    original = stokvel_algorand.config
+    stokvel_algorand.configure(**original._replace(participants=stokvel_algorand.DEFAULT_PARTICIPANTS)._asdict())
+    yield stokvel_algorand.DEFAULT_PARTICIPANTS
+    stokvel_algorand.configure(**original._asdict())
+
+
+def test_fast_forward_dry_run_pays_everyone_once_per_cycle(five_members, capsys):
+    stokvel_algorand.random.seed(3)
+    history = stokvel_algorand.perform_payment_simulation_fast_forward(5, cycles=20, dry_run=True)
+    assert capsys.readouterr().out == ""
+    assert "algod_client" not in vars(stokvel_algorand)  # Nothing was sent
+    assert len(history) == 20 * len(five_members)
+    addresses = sorted(member['address'] for member in five_members)
+    for cycle in range(20):
+        assert sorted(recipient for _, recipient, _ in history[cycle * 5:cycle * 5 + 5]) == addresses
+    assert [day for day, _, _ in history[:3]] == [6, 36, 66]
+    contributed = stokvel_algorand.CONTRIBUTION_AMOUNT * len(five_members)
+    share = stokvel_algorand.PAYOUT_SHARE
+    assert history[0][2] == pytest.approx(contributed * share)
+    assert history[1][2] == pytest.approx((contributed * (1 - share) + contributed) * share)